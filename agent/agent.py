@@ -2,34 +2,30 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from db import get_db1
+from ratelimit import RateLimiter, per_minute, per_second
 from pydantic import BaseModel
 import random
 import string
 import mysql.connector
-import boto3
-import os
-from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import logging
 from typing import Optional
 import bcrypt
-
-logging.basicConfig(level=logging.DEBUG)
-
-load_dotenv()
+from settings import get_settings
 
 # Security configurations
-SECRET_KEY = os.getenv("SECRET_KEY", "your-very-secure-secret-key")
+SECRET_KEY = get_settings().secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days in minutes
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+login_limiter = RateLimiter("agentlogin", per_ip=per_minute(10), per_account=per_minute(5),
+                            per_route=per_second(10, burst=20))
+
 class Token(BaseModel):
     token: str  # Changed from access_token to token
     token_type: str
@@ -61,12 +57,18 @@ async def get_current_agent(token: str = Depends(oauth2_scheme)):
         
         # Verify token against database
         db = get_db1()
+        if db is None:
+            raise HTTPException(status_code=500, detail="Database connection failed")
         cursor = db.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT * FROM agent WHERE id = %s AND token = %s AND token_expiry > %s",
-            (agent_id, token, datetime.utcnow())
-        )
-        agent = cursor.fetchone()
+        try:
+            cursor.execute(
+                "SELECT * FROM agent WHERE id = %s AND token = %s AND token_expiry > %s",
+                (agent_id, token, datetime.utcnow())
+            )
+            agent = cursor.fetchone()
+        finally:
+            cursor.close()
+            db.close()
         if not agent:
             raise credentials_exception
             
@@ -89,6 +91,7 @@ def store_token_in_db(agent_id: int, token: str):
         raise e
     finally:
         cursor.close()
+        db.close()
 
 def invalidate_token(agent_id: int):
     db = get_db1()
@@ -104,6 +107,7 @@ def invalidate_token(agent_id: int):
         raise e
     finally:
         cursor.close()
+        db.close()
 
 class AgentRegistration(BaseModel):
     name: str
@@ -227,10 +231,15 @@ async def register_agent(agent: AgentRegistration):
         db.rollback()
         logger.error(f"Unexpected error during registration: {str(e)}")
         raise HTTPException(status_code=500, detail="Registration failed due to unexpected error")
+    finally:
+        cursor.close()
+        db.close()
 
 
-@router.post("/agentlogin", response_model=Token)
+@router.post("/agentlogin", response_model=Token, dependencies=[Depends(login_limiter)])
 async def login_agent(login_data: AgentLogin):
+    if login_data.email or login_data.mobile_number:
+        login_limiter.check_account(login_data.email or format_mobile_number(login_data.mobile_number))
     db = get_db1()
     if db is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -286,15 +295,10 @@ async def login_agent(login_data: AgentLogin):
         raise HTTPException(status_code=500, detail="Login failed")
     finally:
         cursor.close()
+        db.close()
 
 @router.post("/agent-send-otp")
 async def send_otp(otp_request: SendOTPRequest):
-    db = get_db1()
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = db.cursor(dictionary=True)
-    
     # Generate OTP
     otp = HARDCODED_OTP  # Use hardcoded OTP for testing
     otp_expiry = datetime.now() + timedelta(minutes=5)
@@ -332,55 +336,57 @@ async def otp_login(login_request: OTPLoginRequest):
     
     cursor = db.cursor(dictionary=True)
     
-    # Find agent by email or mobile
-    if login_request.email:
-        cursor.execute("SELECT * FROM agent WHERE email = %s", (login_request.email,))
-    elif login_request.mobile_number:
-        formatted_mobile = format_mobile_number(login_request.mobile_number)
-        cursor.execute("SELECT * FROM agent WHERE mobile_number = %s", (formatted_mobile,))
-    else:
-        raise HTTPException(status_code=400, detail="Either email or mobile number is required")
+    try:
+        # Find agent by email or mobile
+        if login_request.email:
+            cursor.execute("SELECT * FROM agent WHERE email = %s", (login_request.email,))
+        elif login_request.mobile_number:
+            formatted_mobile = format_mobile_number(login_request.mobile_number)
+            cursor.execute("SELECT * FROM agent WHERE mobile_number = %s", (formatted_mobile,))
+        else:
+            raise HTTPException(status_code=400, detail="Either email or mobile number is required")
     
-    agent = cursor.fetchone()
-    if not agent:
-        raise HTTPException(status_code=404, detail="Agent not found")
+        agent = cursor.fetchone()
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agent not found")
     
-    # Check OTP
-    if not agent['otp_code'] or agent['otp_code'] != login_request.otp:
-        raise HTTPException(status_code=401, detail="Invalid OTP")
+        # Check OTP
+        if not agent['otp_code'] or agent['otp_code'] != login_request.otp:
+            raise HTTPException(status_code=401, detail="Invalid OTP")
     
-    # Check if OTP is expired
-    if agent['otp_created_at'] and agent['otp_created_at'] < datetime.now():
-        raise HTTPException(status_code=401, detail="OTP expired")
+        # Check if OTP is expired
+        if agent['otp_created_at'] and agent['otp_created_at'] < datetime.now():
+            raise HTTPException(status_code=401, detail="OTP expired")
     
-    # Clear OTP after successful verification
-    try:
-        # Generate and store token
-        token = create_access_token(str(agent['id']))
-        store_token_in_db(agent['id'], token)
+        # Clear OTP after successful verification
+        try:
+            # Generate and store token
+            token = create_access_token(str(agent['id']))
+            store_token_in_db(agent['id'], token)
 
-        cursor.execute(
-            "UPDATE agent SET otp_code = NULL, otp_created_at = NULL WHERE id = %s",
-            (agent['id'],)
-        )
-        db.commit()
+            cursor.execute(
+                "UPDATE agent SET otp_code = NULL, otp_created_at = NULL WHERE id = %s",
+                (agent['id'],)
+            )
+            db.commit()
         
-        return {
-            "message": "Login successful",
-            "access_token": token,
-            "token_type": "bearer",
-            "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-            "agent_id": agent['id'],
-            "agent_name": agent['name'],
-            "email": agent['email'],
-            "mobile_number": agent['mobile_number']
-        }
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to login with OTP: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to login with OTP")
+            return {
+                "message": "Login successful",
+                "access_token": token,
+                "token_type": "bearer",
+                "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+                "agent_id": agent['id'],
+                "agent_name": agent['name'],
+                "email": agent['email'],
+                "mobile_number": agent['mobile_number']
+            }
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to login with OTP: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to login with OTP")
     finally:
         cursor.close()
+        db.close()
     
 @router.post("/logout")
 async def logout(current_agent: dict = Depends(get_current_agent)):
@@ -404,4 +410,5 @@ async def get_agents():
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to fetch agents")
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+        db.close()
@@ -0,0 +1,269 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, HTTPException, Query
+from mysql.connector import Error
+from db import execute_read_query, get_db1
+from jobs import job
+from responses import FastJSONResponse
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Schema: migrations/0008_sales_rollups.sql
+
+DEFAULT_RANGE_DAYS = 30
+MAX_HOURLY_RANGE_DAYS = 31
+UNKNOWN_CITY = "Unknown"
+
+
+def record_paid_order(cursor, order_id: int, paid_at: datetime):
+    """
+    Add a newly paid order to the rollups. Call inside the transaction that
+    marks it paid, and only when that update changed the row, so each order
+    is counted exactly once.
+    """
+    cursor.execute(
+        """
+        SELECT o.total_amount, ua.city, ua.state
+        FROM orders o
+        LEFT JOIN user_addresses ua ON ua.id = o.shipping_address_id
+        WHERE o.order_id = %s
+        """,
+        (order_id,)
+    )
+    order = cursor.fetchone()
+    cursor.execute(
+        "SELECT product_id, quantity, price_at_purchase FROM order_items WHERE order_id = %s ORDER BY product_id",
+        (order_id,)
+    )
+    items = cursor.fetchall()
+
+    day = paid_at.date()
+    bucket = paid_at.replace(minute=0, second=0, microsecond=0)
+    units = sum(item['quantity'] for item in items)
+
+    if items:
+        cursor.executemany(
+            """
+            INSERT INTO product_sales_daily (day, product_id, units, revenue) VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE units = units + VALUES(units), revenue = revenue + VALUES(revenue)
+            """,
+            [(day, item['product_id'], item['quantity'], item['quantity'] * item['price_at_purchase'])
+             for item in items]
+        )
+    cursor.execute(
+        """
+        INSERT INTO sales_hourly (bucket, orders, units, revenue) VALUES (%s, 1, %s, %s)
+        ON DUPLICATE KEY UPDATE orders = orders + 1, units = units + VALUES(units), revenue = revenue + VALUES(revenue)
+        """,
+        (bucket, units, order['total_amount'])
+    )
+    cursor.execute(
+        """
+        INSERT INTO sales_daily (day, orders, units, revenue) VALUES (%s, 1, %s, %s)
+        ON DUPLICATE KEY UPDATE orders = orders + 1, units = units + VALUES(units), revenue = revenue + VALUES(revenue)
+        """,
+        (day, units, order['total_amount'])
+    )
+    cursor.execute(
+        """
+        INSERT INTO city_sales_daily (day, city, state, orders, revenue) VALUES (%s, %s, %s, 1, %s)
+        ON DUPLICATE KEY UPDATE orders = orders + 1, revenue = revenue + VALUES(revenue)
+        """,
+        (day, order['city'] or UNKNOWN_CITY, order['state'] or UNKNOWN_CITY, order['total_amount'])
+    )
+
+
+# Paid orders in [%s, %s) by payment time, hot and archived. Archival moves an
+# order with its items, so archived orders join archived items. The filter sits
+# in each branch, so every statement takes (start, end, start, end).
+_PAID_ORDERS = "o.status = 'Paid' AND o.payment_date >= %s AND o.payment_date < %s"
+_ALL_PAID_ORDERS = f"""(
+    SELECT o.order_id, o.payment_date, o.total_amount, o.shipping_address_id,
+        (SELECT COALESCE(SUM(oi.quantity), 0) FROM order_items oi WHERE oi.order_id = o.order_id) AS units
+    FROM orders o WHERE {_PAID_ORDERS}
+    UNION ALL
+    SELECT o.order_id, o.payment_date, o.total_amount, o.shipping_address_id,
+        (SELECT COALESCE(SUM(oi.quantity), 0) FROM order_items_archive oi WHERE oi.order_id = o.order_id) AS units
+    FROM orders_archive o WHERE {_PAID_ORDERS}
+)"""
+_ALL_PAID_ITEMS = f"""(
+    SELECT o.payment_date, oi.product_id, oi.quantity, oi.price_at_purchase
+    FROM orders o JOIN order_items oi ON oi.order_id = o.order_id
+    WHERE {_PAID_ORDERS}
+    UNION ALL
+    SELECT o.payment_date, oi.product_id, oi.quantity, oi.price_at_purchase
+    FROM orders_archive o JOIN order_items_archive oi ON oi.order_id = o.order_id
+    WHERE {_PAID_ORDERS}
+)"""
+
+_REBUILD_STATEMENTS = (
+    ("sales_hourly", "bucket", f"""
+        INSERT INTO sales_hourly (bucket, orders, units, revenue)
+        SELECT
+            TIMESTAMP(DATE(o.payment_date), MAKETIME(HOUR(o.payment_date), 0, 0)) AS bucket,
+            COUNT(*), SUM(o.units), SUM(o.total_amount)
+        FROM {_ALL_PAID_ORDERS} o
+        GROUP BY bucket
+    """),
+    ("sales_daily", "day", f"""
+        INSERT INTO sales_daily (day, orders, units, revenue)
+        SELECT DATE(o.payment_date) AS day, COUNT(*), SUM(o.units), SUM(o.total_amount)
+        FROM {_ALL_PAID_ORDERS} o
+        GROUP BY day
+    """),
+    ("product_sales_daily", "day", f"""
+        INSERT INTO product_sales_daily (day, product_id, units, revenue)
+        SELECT DATE(i.payment_date), i.product_id, SUM(i.quantity), SUM(i.quantity * i.price_at_purchase)
+        FROM {_ALL_PAID_ITEMS} i
+        GROUP BY DATE(i.payment_date), i.product_id
+    """),
+    ("city_sales_daily", "day", f"""
+        INSERT INTO city_sales_daily (day, city, state, orders, revenue)
+        SELECT
+            DATE(o.payment_date),
+            COALESCE(ua.city, '{UNKNOWN_CITY}'),
+            COALESCE(ua.state, '{UNKNOWN_CITY}'),
+            COUNT(*),
+            SUM(o.total_amount)
+        FROM {_ALL_PAID_ORDERS} o
+        LEFT JOIN user_addresses ua ON ua.id = o.shipping_address_id
+        GROUP BY DATE(o.payment_date), COALESCE(ua.city, '{UNKNOWN_CITY}'), COALESCE(ua.state, '{UNKNOWN_CITY}')
+    """),
+)
+
+
+def rebuild_rollups(date_from: date, date_to: date):
+    """
+    Recompute the rollups for whole days in [date_from, date_to] from the
+    raw orders, archived ones included: the initial load, or a repair after
+    a manual data fix.
+    """
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    connection = get_db1()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction()
+        for table, key, insert in _REBUILD_STATEMENTS:
+            cursor.execute(f"DELETE FROM {table} WHERE {key} >= %s AND {key} < %s", (start, end))
+            cursor.execute(insert, (start, end, start, end))
+        connection.commit()
+        logger.info(f"Rebuilt sales rollups for {date_from} to {date_to}")
+    except Error as e:
+        connection.rollback()
+        logger.error(f"Rollup rebuild failed: {e}")
+        raise
+    finally:
+        cursor.close()
+        connection.close()
+
+
+@job("analytics.rebuild_rollups", lease_seconds=3600)
+def rebuild_rollups_job(date_from: str, date_to: str):
+    """Job payloads are JSON, so the dates arrive as ISO strings"""
+    rebuild_rollups(date.fromisoformat(date_from), date.fromisoformat(date_to))
+
+
+def _date_range(date_from: Optional[date], date_to: Optional[date], max_days: Optional[int] = None):
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to is before date_from")
+    if max_days and (date_to - date_from).days >= max_days:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {max_days} days")
+    return date_from, date_to
+
+
+# Dashboards poll the same ranges; identical concurrent reads share one query
+_rollup_reads = SingleFlight("analytics")
+
+
+async def _rollup_rows(query, params):
+    rows = await _rollup_reads.do((query, params), execute_read_query, query, params)
+    if rows is None:
+        raise HTTPException(status_code=500, detail="Failed to load analytics")
+    return rows
+
+
+@router.get("/analytics/sales")
+async def get_sales(
+    granularity: str = Query("day", regex="^(hour|day)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """Orders, units and revenue per hour or day, with range totals"""
+    if granularity == "hour":
+        date_from, date_to = _date_range(date_from, date_to, MAX_HOURLY_RANGE_DAYS)
+        rows = await _rollup_rows(
+            "SELECT bucket AS period, orders, units, revenue FROM sales_hourly "
+            "WHERE bucket >= %s AND bucket < %s ORDER BY bucket",
+            (date_from, date_to + timedelta(days=1))
+        )
+    else:
+        date_from, date_to = _date_range(date_from, date_to)
+        rows = await _rollup_rows(
+            "SELECT day AS period, orders, units, revenue FROM sales_daily "
+            "WHERE day BETWEEN %s AND %s ORDER BY day",
+            (date_from, date_to)
+        )
+    totals = {
+        "orders": sum(row['orders'] for row in rows),
+        "units": sum(row['units'] for row in rows),
+        "revenue": sum(row['revenue'] for row in rows),
+    }
+    return FastJSONResponse({
+        "granularity": granularity,
+        "date_from": date_from,
+        "date_to": date_to,
+        "totals": totals,
+        "series": rows
+    })
+
+@router.get("/analytics/top-products")
+async def get_top_products(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    order_by: str = Query("revenue", regex="^(revenue|units)$"),
+    limit: int = Query(10, ge=1, le=100)
+):
+    date_from, date_to = _date_range(date_from, date_to)
+    rows = await _rollup_rows(
+        f"""
+        SELECT s.product_id, p.name, SUM(s.units) AS units, SUM(s.revenue) AS revenue
+        FROM product_sales_daily s
+        LEFT JOIN products p ON p.id = s.product_id
+        WHERE s.day BETWEEN %s AND %s
+        GROUP BY s.product_id, p.name
+        ORDER BY {order_by} DESC
+        LIMIT %s
+        """,
+        (date_from, date_to, limit)
+    )
+    return FastJSONResponse({"date_from": date_from, "date_to": date_to, "products": rows})
+
+@router.get("/analytics/cities")
+async def get_city_sales(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=500)
+):
+    date_from, date_to = _date_range(date_from, date_to)
+    rows = await _rollup_rows(
+        """
+        SELECT city, state, SUM(orders) AS orders, SUM(revenue) AS revenue
+        FROM city_sales_daily
+        WHERE day BETWEEN %s AND %s
+        GROUP BY city, state
+        ORDER BY revenue DESC
+        LIMIT %s
+        """,
+        (date_from, date_to, limit)
+    )
+    return FastJSONResponse({"date_from": date_from, "date_to": date_to, "cities": rows})
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+import logging
+import time
+
+from fastapi import APIRouter, Depends, Query
+from mysql.connector import Error
+from db import get_db1
+from jobs import enqueue, job, require_admin, schedule
+from settings import get_settings
+import order_status
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Schema: migrations/0009_order_archive.sql
+
+ARCHIVE_AFTER_DAYS = get_settings().archive_after_days
+ARCHIVE_BATCH_SIZE = 500
+# Bounds for on-demand runs: recent orders stay hot, batches stay short
+MIN_ARCHIVE_AFTER_DAYS = 30
+MAX_ARCHIVE_BATCH_SIZE = 5000
+# Pause between batches so replicas keep up and row locks are released
+ARCHIVE_BATCH_PAUSE_SECONDS = 0.2
+
+# Child tables first on delete, parents first on copy
+_ARCHIVED_TABLES = (
+    ("orders", "orders_archive"),
+    ("order_items", "order_items_archive"),
+    ("order_status_history", "order_status_history_archive"),
+)
+
+
+def _archive_batch(cursor, cutoff: datetime, batch_size: int) -> int:
+    cursor.execute(
+        """
+        SELECT order_id FROM orders
+        WHERE order_status = %s AND order_date < %s
+        ORDER BY order_id
+        LIMIT %s
+        FOR UPDATE
+        """,
+        (order_status.DELIVERED, cutoff, batch_size)
+    )
+    order_ids = [row[0] for row in cursor.fetchall()]
+    if not order_ids:
+        return 0
+
+    placeholders = ','.join(['%s'] * len(order_ids))
+    for hot, cold in _ARCHIVED_TABLES:
+        # archived_at is the archive tables' last column
+        cursor.execute(
+            f"INSERT INTO {cold} SELECT t.*, CURRENT_TIMESTAMP FROM {hot} t WHERE t.order_id IN ({placeholders})",
+            order_ids
+        )
+    for hot, _ in reversed(_ARCHIVED_TABLES):
+        cursor.execute(f"DELETE FROM {hot} WHERE order_id IN ({placeholders})", order_ids)
+    return len(order_ids)
+
+
+@job("orders.archive", lease_seconds=3600)
+def archive_delivered_orders(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """
+    Move delivered orders placed more than `older_than_days` ago, with their
+    items and status history, into the archive tables. Each batch is one
+    transaction, so an interrupted run leaves every order either hot or
+    archived, never both.
+    """
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    stats = {"archived": 0, "batches": 0}
+    connection = get_db1()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+    cursor = connection.cursor()
+    try:
+        while True:
+            connection.start_transaction()
+            try:
+                moved = _archive_batch(cursor, cutoff, batch_size)
+                connection.commit()
+            except Error:
+                connection.rollback()
+                raise
+            if not moved:
+                break
+            stats["archived"] += moved
+            stats["batches"] += 1
+            if moved < batch_size:
+                break
+            time.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+        logger.info(f"Archived delivered orders older than {cutoff:%Y-%m-%d}: {stats}")
+        return stats
+    except Error as e:
+        logger.error(f"Order archival failed after {stats['archived']} orders: {e}")
+        raise
+    finally:
+        cursor.close()
+        connection.close()
+
+
+schedule("orders.archive", 24 * 3600)
+
+
+@router.post("/orders/archive", dependencies=[Depends(require_admin)])
+async def start_archival(
+    older_than_days: int = Query(ARCHIVE_AFTER_DAYS, ge=MIN_ARCHIVE_AFTER_DAYS),
+    batch_size: int = Query(ARCHIVE_BATCH_SIZE, ge=1, le=MAX_ARCHIVE_BATCH_SIZE)
+):
+    """Queue an archival run now instead of waiting for the daily one"""
+    job_id = enqueue("orders.archive", {"older_than_days": older_than_days, "batch_size": batch_size})
+    return {"message": "Archival queued", "job_id": job_id}
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: building dispatch listings with per-row address
+formatting in Python vs. shipping the address snapshot stored on orders.
+
+Run from the repo root:
+    python benchmarks/bench_address_format.py --rows 10000
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from orders import format_address  # noqa: E402
+
+CITIES = ["Bengaluru", "Hyderabad", "Chennai", "Pune", "Mumbai", "Delhi"]
+STATES = ["Karnataka", "Telangana", "Tamil Nadu", "Maharashtra", "Delhi"]
+
+
+def component_rows(n):
+    """Rows as the old listings fetched them: address components per order"""
+    rng = random.Random(42)
+    return [
+        {
+            "id": i,
+            "description": f"Order #{i}",
+            "mainImageUrl": f"https://cdn.example.com/p/{rng.randint(1, 5000)}.jpg",
+            "product_name": f"Product {rng.randint(1, 5000)}",
+            "line1": f"{rng.randint(1, 999)}, {rng.randint(1, 40)}th Cross, Ward {rng.randint(1, 200)}",
+            "city": rng.choice(CITIES),
+            "state": rng.choice(STATES),
+            "pincode": str(rng.randint(500001, 600100)),
+            "assigned_agent_id": None,
+        }
+        for i in range(n, 0, -1)
+    ]
+
+
+def snapshot_rows(rows):
+    """Rows as the listings fetch them now: the snapshot string only"""
+    return [
+        {
+            "id": r["id"],
+            "description": r["description"],
+            "mainImageUrl": r["mainImageUrl"],
+            "product_name": r["product_name"],
+            "address": format_address(r),
+            "assigned_agent_id": None,
+        }
+        for r in rows
+    ]
+
+
+def legacy_listing(rows):
+    out = [dict(r) for r in rows]  # fresh dicts, as a cursor would return
+    for order in out:
+        order["address"] = f"{order.get('line1', '')}, {order.get('city', '')}, {order.get('state', '')} {order.get('pincode', '')}"
+    return json.dumps({"orders": out}, default=str).encode()
+
+
+def snapshot_listing(rows):
+    out = [dict(r) for r in rows]
+    return json.dumps({"orders": out}, default=str).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    legacy = component_rows(args.rows)
+    snap = snapshot_rows(legacy)
+
+    results = {}
+    for name, fn, data in (("python-format", legacy_listing, legacy), ("snapshot", snapshot_listing, snap)):
+        timings = timeit.repeat(lambda: fn(data), number=1, repeat=args.repeat)
+        results[name] = (min(timings), len(fn(data)))
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    for name, (best, size) in results.items():
+        print(f"  {name:14s} {best * 1000:8.2f} ms  {size / 1024:9.1f} KiB")
+    base_t, base_b = results["python-format"]
+    snap_t, snap_b = results["snapshot"]
+    print(f"  cpu saved {100 * (1 - snap_t / base_t):.1f}%, payload saved {100 * (1 - snap_b / base_b):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
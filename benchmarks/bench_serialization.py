@@ -0,0 +1,115 @@
+"""
+Micro-benchmark: FastAPI's default response path (jsonable_encoder +
+json.dumps) vs. FastJSONResponse (orjson), and identity vs. gzip vs. brotli
+bytes on the wire, for product and order-history shaped rows.
+
+Run from the repo root:
+    python benchmarks/bench_serialization.py --rows 5000
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from compression import BROTLI_QUALITY, GZIP_LEVEL, brotli  # noqa: E402
+from responses import dumps  # noqa: E402
+
+CATEGORIES = ["grocery", "dairy", "bakery", "household", "personal-care"]
+
+
+def product_rows(n):
+    rng = random.Random(42)
+    return [
+        {
+            "id": i,
+            "name": f"Product {i}",
+            "description": f"Fresh {rng.choice(CATEGORIES)} item number {i}, pack of {rng.randint(1, 12)}",
+            "price": round(rng.uniform(10, 2000), 2),
+            "stock": rng.randint(0, 500),
+            "category": rng.choice(CATEGORIES),
+            "imageUrls": json.dumps([f"https://cdn.example.com/p/{i}/{k}.jpg" for k in range(3)]),
+            "mainImageUrl": f"https://cdn.example.com/p/{i}/0.jpg",
+            "demanded": rng.random() < 0.1,
+            "keywords": ",".join(rng.sample(CATEGORIES, 2)),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def order_rows(n):
+    """Order history rows as MySQL returns them: Decimal totals, datetimes"""
+    rng = random.Random(7)
+    now = datetime(2024, 1, 1)
+    return [
+        {
+            "order_id": i,
+            "user_id": 1,
+            "user_order_number": i,
+            "order_date": now - timedelta(hours=i),
+            "payment_date": now - timedelta(hours=i, minutes=-5),
+            "total_amount": Decimal(f"{rng.uniform(50, 5000):.2f}"),
+            "status": "Paid",
+            "razorpay_order_id": f"order_{rng.getrandbits(48):012x}",
+            "razorpay_payment_id": f"pay_{rng.getrandbits(48):012x}",
+            "shipping_address_id": rng.randint(1, 3),
+            "order_status": rng.randint(1, 4),
+            "items": [
+                {
+                    "product_id": rng.randint(1, 5000),
+                    "quantity": rng.randint(1, 4),
+                    "price": Decimal(f"{rng.uniform(10, 2000):.2f}"),
+                    "name": f"Product {rng.randint(1, 5000)}",
+                    "mainImageUrl": f"https://cdn.example.com/p/{rng.randint(1, 5000)}/0.jpg",
+                }
+                for _ in range(rng.randint(1, 4))
+            ],
+        }
+        for i in range(n, 0, -1)
+    ]
+
+
+def default_path(rows):
+    # What FastAPI does for a returned dict/list without a Response
+    return json.dumps(jsonable_encoder(rows), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(rows):
+    return dumps(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for label, rows in (("products", product_rows(args.rows)), ("order history", order_rows(args.rows))):
+        print(f"{label}: {args.rows} rows, best of {args.repeat}")
+        timings = {}
+        for name, fn in (("default", default_path), ("orjson", fast_path)):
+            timings[name] = min(timeit.repeat(lambda: fn(rows), number=1, repeat=args.repeat))
+            print(f"  serialize {name:8s} {timings[name] * 1000:8.2f} ms")
+        print(f"  cpu saved {100 * (1 - timings['orjson'] / timings['default']):.1f}%")
+
+        body = fast_path(rows)
+        encoders = [("identity", lambda b: b), ("gzip", lambda b: gzip.compress(b, compresslevel=GZIP_LEVEL))]
+        if brotli is not None:
+            encoders.append(("br", lambda b: brotli.compress(b, quality=BROTLI_QUALITY)))
+        for name, encode in encoders:
+            best = min(timeit.repeat(lambda: encode(body), number=1, repeat=args.repeat))
+            size = len(encode(body))
+            print(f"  {name:8s} {size / 1024:9.1f} KiB  {100 * size / len(body):5.1f}%  {best * 1000:8.2f} ms")
+        if brotli is None:
+            print("  (brotli not installed, skipped)")
+
+
+if __name__ == "__main__":
+    main()
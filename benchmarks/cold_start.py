@@ -0,0 +1,50 @@
+"""
+Measure cold-start time: a fresh interpreter importing the app and running
+its startup hooks, as a serverless runtime or a new worker would.
+
+    python benchmarks/cold_start.py --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+asyncio.run(startup())
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start timing")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    imports, startups = [], []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(out)
+        imports.append(result["import"])
+        startups.append(result["startup"])
+
+    for name, values in (("import", imports), ("startup hooks", startups)):
+        print(f"{name:14s} median {statistics.median(values) * 1000:8.1f} ms  "
+              f"max {max(values) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Drive a realistic request mix against the API and report throughput and
+p50/p95/p99 latency per endpoint.
+
+In-process (default) the FastAPI app is called through httpx's ASGI
+transport with Razorpay stubbed out, so only MySQL needs to be running:
+
+    python benchmarks/seed.py --scale 1 --truncate
+    python benchmarks/loadtest.py --duration 30 --concurrency 32 --save results.json
+    python benchmarks/loadtest.py --baseline results.json --tolerance 0.15
+
+Use --base-url to target a running server instead (Razorpay is then
+whatever that server is configured with). Requires httpx.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Weighted scenario mix: (name, weight)
+MIX = [
+    ("browse", 45),
+    ("search", 20),
+    ("add_to_cart", 15),
+    ("checkout", 5),
+    ("dispatch", 15),
+]
+
+
+class FakeRazorpayClient:
+    """Stand-in for razorpay.Client: no network, always succeeds"""
+
+    _ids = itertools.count(1)
+
+    class _Order:
+        def create(self, data=None, **kwargs):
+            n = next(FakeRazorpayClient._ids)
+            return {"id": f"order_bench_{n}", "amount": (data or {}).get("amount"),
+                    "currency": (data or {}).get("currency", "INR"), "status": "created"}
+
+    class _Payment:
+        def fetch(self, payment_id):
+            return {"id": payment_id, "status": "captured"}
+
+    class _Utility:
+        def verify_payment_signature(self, params):
+            return True
+
+    def __init__(self):
+        self.order = self._Order()
+        self.payment = self._Payment()
+        self.utility = self._Utility()
+
+
+def stub_razorpay():
+    import payments
+    # get_razorpay_client() returns the cached client when one is set
+    payments._razorpay_client = FakeRazorpayClient()
+
+
+def id_ranges():
+    """Id ranges of the seeded data, so generated requests hit real rows"""
+    from db import execute_query
+    def bounds(table, column="id"):
+        row = execute_query(f"SELECT MIN({column}) AS lo, MAX({column}) AS hi FROM {table}")[0]
+        return (row["lo"] or 1, row["hi"] or 1)
+    return {
+        "users": bounds("users"),
+        "products": bounds("products"),
+        "agents": bounds("agent"),
+        "categories": [r["category"] for r in execute_query("SELECT DISTINCT category FROM products") or []],
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, endpoint, elapsed, ok):
+        self.samples.setdefault(endpoint, []).append(elapsed)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, wall_time):
+        out = {}
+        for endpoint, values in sorted(self.samples.items()):
+            values.sort()
+            def pct(p):
+                return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000
+            out[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "rps": round(len(values) / wall_time, 2),
+                "p50_ms": round(pct(50), 2),
+                "p95_ms": round(pct(95), 2),
+                "p99_ms": round(pct(99), 2),
+            }
+        return out
+
+
+async def timed(client, recorder, endpoint, method, url, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 500
+    except httpx.HTTPError:
+        ok = False
+    recorder.add(endpoint, time.perf_counter() - start, ok)
+
+
+async def run_scenario(name, client, recorder, rng, ranges):
+    user_id = rng.randint(*ranges["users"])
+    product_id = rng.randint(*ranges["products"])
+    if name == "browse":
+        await timed(client, recorder, "GET /demanded-products", "GET", "/demanded-products")
+        await timed(client, recorder, "GET /products/{id}", "GET", f"/products/{product_id}")
+        if ranges["categories"]:
+            await timed(client, recorder, "GET /products?category", "GET", "/products",
+                        params={"category": rng.choice(ranges["categories"])})
+    elif name == "search":
+        await timed(client, recorder, "GET /products?keywords", "GET", "/products",
+                    params={"keywords": rng.choice(["organic", "premium,smart", "wireless", "eco,mini"])})
+    elif name == "add_to_cart":
+        await timed(client, recorder, "POST /cart", "POST", "/cart",
+                    json={"user_id": user_id, "id": product_id, "quantity": 1})
+        await timed(client, recorder, "GET /cart/{user_id}", "GET", f"/cart/{user_id}")
+    elif name == "checkout":
+        await timed(client, recorder, "GET /user/addresses/{user_id}", "GET", f"/user/addresses/{user_id}")
+        await timed(client, recorder, "POST /orders/public", "POST", "/orders/public",
+                    json={"user_id": user_id, "shipping_address_id": user_id,
+                          "items": [{"product_id": product_id, "quantity": 1}]})
+        await timed(client, recorder, "GET /orders/user/{user_id}", "GET", f"/orders/user/{user_id}")
+    elif name == "dispatch":
+        agent_id = rng.randint(*ranges["agents"])
+        await timed(client, recorder, "GET /orders/all", "GET", "/orders/all")
+        await timed(client, recorder, "GET /orders/agent/order-list/{id}", "GET",
+                    f"/orders/agent/order-list/{agent_id}")
+        await timed(client, recorder, "GET /orders/agent/map/{id}", "GET", f"/orders/agent/map/{agent_id}")
+
+
+async def worker(client, recorder, deadline, seed, ranges):
+    rng = random.Random(seed)
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    while time.perf_counter() < deadline:
+        await run_scenario(rng.choices(names, weights)[0], client, recorder, rng, ranges)
+
+
+async def run(args):
+    ranges = id_ranges()
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30)
+    else:
+        stub_razorpay()
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+
+    recorder = Recorder()
+    async with client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            worker(client, recorder, deadline, args.seed + i, ranges) for i in range(args.concurrency)
+        ))
+        wall_time = time.perf_counter() - start
+    return recorder.report(wall_time), wall_time
+
+
+def compare(results, baseline, tolerance):
+    """Endpoints whose p95 got worse than baseline by more than `tolerance`"""
+    regressions = []
+    for endpoint, stats in results.items():
+        base = baseline.get(endpoint)
+        if base and base["p95_ms"] > 0 and stats["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append((endpoint, base["p95_ms"], stats["p95_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a saved results file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p95 slowdown (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    results, wall_time = asyncio.run(run(args))
+    total = sum(s["requests"] for s in results.values())
+    print(f"{total} requests in {wall_time:.1f}s ({total / wall_time:.1f} req/s), concurrency {args.concurrency}")
+    print(f"{'endpoint':40s} {'reqs':>7s} {'err':>5s} {'rps':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for endpoint, s in results.items():
+        print(f"{endpoint:40s} {s['requests']:7d} {s['errors']:5d} {s['rps']:8.1f} "
+              f"{s['p50_ms']:8.2f} {s['p95_ms']:8.2f} {s['p99_ms']:8.2f}")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for endpoint, before, after in regressions:
+            print(f"REGRESSION {endpoint}: p95 {before:.2f}ms -> {after:.2f}ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Check read-replica routing against a running app backed by two MySQL
+instances (a primary and a replica replicating from it), e.g.
+
+    DB_HOST=127.0.0.1 DB_PORT=3306 DB_REPLICA_HOST=127.0.0.1 DB_REPLICA_PORT=3307 \\
+        uvicorn main:app --port 8001
+    python benchmarks/replica_check.py --base-url http://127.0.0.1:8001 --user-id 1 --product-id 1
+
+Reads a cart (expect the replica), adds to it and reads it again (expect the
+primary: read-your-writes), then reports which database served each read
+from the db_reads_total counters.
+"""
+import argparse
+import re
+
+import httpx
+
+READS = re.compile(r'^db_reads_total\{target="(\w+)",reason="(\w+)"\} ([\d.]+)$', re.M)
+
+
+def read_counters(client):
+    text = client.get("/metrics").text
+    return {(target, reason): float(value) for target, reason, value in READS.findall(text)}
+
+
+def routed(client, before):
+    after = read_counters(client)
+    return {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-replica routing check")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--product-id", type=int, required=True)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.base_url, timeout=10) as client:
+        before = read_counters(client)
+        client.get(f"/cart/{args.user_id}").raise_for_status()
+        print(f"cold read:        {routed(client, before)}")
+
+        client.post("/cart", json={"user_id": args.user_id, "id": args.product_id, "quantity": 1}).raise_for_status()
+        before = read_counters(client)
+        client.get(f"/cart/{args.user_id}").raise_for_status()
+        print(f"read after write: {routed(client, before)}")
+
+        before = read_counters(client)
+        client.get("/products")
+        print(f"catalog read:     {routed(client, before)}")
+
+
+if __name__ == "__main__":
+    main()
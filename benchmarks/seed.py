@@ -0,0 +1,166 @@
+"""
+Seed the configured MySQL database (DB_* env vars) with synthetic data for
+benchmarks: users, agents, products, addresses, carts, favorites and orders.
+
+    python benchmarks/seed.py --scale 1 --truncate
+
+--scale 1 is 1k users, 2k products and 10k orders; other sizes scale linearly.
+Only run this against a throwaway database.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import get_db1  # noqa: E402
+
+BATCH = 1000
+CATEGORIES = ["electronics", "fashion", "grocery", "home", "toys", "books", "beauty", "sports"]
+WORDS = ["organic", "premium", "classic", "wireless", "cotton", "steel", "smart", "eco", "mini", "pro"]
+CITIES = [
+    ("Bengaluru", "Karnataka", 560001), ("Hyderabad", "Telangana", 500001),
+    ("Chennai", "Tamil Nadu", 600001), ("Pune", "Maharashtra", 411001),
+    ("Mumbai", "Maharashtra", 400001), ("New Delhi", "Delhi", 110001),
+]
+# bcrypt of "benchmark" so seeded users can log in
+PASSWORD_HASH = "$2b$12$lzm/5nebKw5ZUql4iphesOvQf/77EW.NjVZnEBRPJfpueQk4C6dvO"
+
+TABLES = ["order_items", "orders", "favorites", "cart", "user_addresses", "products", "agent", "users"]
+
+
+def batched(cursor, connection, sql, rows):
+    for i in range(0, len(rows), BATCH):
+        cursor.executemany(sql, rows[i:i + BATCH])
+        connection.commit()
+
+
+def seed(scale: float, truncate: bool, seed_value: int):
+    rng = random.Random(seed_value)
+    n_users = int(1000 * scale)
+    n_agents = max(1, int(20 * scale))
+    n_products = int(2000 * scale)
+    n_orders = int(10000 * scale)
+
+    connection = get_db1()
+    if connection is None:
+        sys.exit("Database connection failed; check DB_* environment variables")
+    cursor = connection.cursor()
+    started = time.perf_counter()
+    try:
+        if truncate:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in TABLES:
+                cursor.execute(f"TRUNCATE TABLE {table}")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+            connection.commit()
+
+        now = datetime.now()
+        batched(cursor, connection,
+            "INSERT INTO users (id, name, email, mobile_number, password, created_at, is_verified) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [(i, f"User {i}", f"user{i}@bench.local", f"+9190000{i:05d}", PASSWORD_HASH, now, True)
+             for i in range(1, n_users + 1)])
+        batched(cursor, connection,
+            "INSERT INTO agent (id, name, email, mobile_number, password, created_at, is_verified) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [(i, f"Agent {i}", f"agent{i}@bench.local", f"+9180000{i:05d}", PASSWORD_HASH, now, True)
+             for i in range(1, n_agents + 1)])
+
+        products = []
+        for i in range(1, n_products + 1):
+            words = rng.sample(WORDS, 2)
+            products.append((
+                i, f"{words[0].title()} {words[1]} item {i}", "Synthetic benchmark product",
+                round(rng.uniform(20, 5000), 2), rng.randint(50, 5000), rng.choice(CATEGORIES),
+                json.dumps([f"https://cdn.bench.local/p/{i}/{k}.jpg" for k in range(3)]),
+                f"https://cdn.bench.local/p/{i}/0.jpg", rng.random() < 0.01, ",".join(words), "active",
+            ))
+        batched(cursor, connection,
+            "INSERT INTO products (id, name, description, price, stock, category, imageUrls, "
+            "mainImageUrl, demanded, keywords, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            products)
+        prices = {p[0]: p[3] for p in products}
+        names = {p[0]: (p[1], p[7]) for p in products}
+
+        addresses = []
+        for user_id in range(1, n_users + 1):
+            city, state, pincode = rng.choice(CITIES)
+            addresses.append((
+                user_id, user_id, f"User {user_id}", f"+9190000{user_id:05d}", str(pincode + rng.randint(0, 90)),
+                f"{rng.randint(1, 999)}, {rng.randint(1, 40)}th Cross", None, city, state, "India", 1,
+                None if rng.random() < 0.3 else 12.9 + rng.random(),
+                None if rng.random() < 0.3 else 77.5 + rng.random(),
+            ))
+        batched(cursor, connection,
+            "INSERT INTO user_addresses (id, user_id, full_name, mobile_number, pincode, line1, landmark, "
+            "city, state, country, is_default, lat, lon) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            addresses)
+        address_by_user = {a[1]: a for a in addresses}
+
+        carts, favorites = [], []
+        for user_id in range(1, n_users + 1):
+            for product_id in rng.sample(range(1, n_products + 1), rng.randint(0, 5)):
+                carts.append((user_id, product_id, rng.randint(1, 3)))
+            for product_id in rng.sample(range(1, n_products + 1), rng.randint(0, 8)):
+                favorites.append((user_id, product_id))
+        batched(cursor, connection, "INSERT INTO cart (user_id, id, quantity) VALUES (%s, %s, %s)", carts)
+        batched(cursor, connection, "INSERT INTO favorites (user_id, product_id) VALUES (%s, %s)", favorites)
+
+        orders, items = [], []
+        order_numbers = {}
+        for order_id in range(1, n_orders + 1):
+            user_id = rng.randint(1, n_users)
+            order_numbers[user_id] = order_numbers.get(user_id, 0) + 1
+            line = sorted(rng.sample(range(1, n_products + 1), rng.randint(1, 4)))
+            quantities = [rng.randint(1, 3) for _ in line]
+            total = round(sum(prices[p] * q for p, q in zip(line, quantities)), 2)
+            status_code = rng.choices([1, 2, 3], weights=[2, 1, 7])[0]
+            agent_id = rng.randint(1, n_agents) if status_code > 1 else None
+            address = address_by_user[user_id]
+            order_date = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            orders.append((
+                order_id, user_id, order_numbers[user_id], order_date,
+                order_date if status_code > 1 else None, total,
+                "Paid" if status_code > 1 else "Created", f"order_bench_{order_id}", address[0], status_code,
+                names[line[0]][0], names[line[0]][1], len(line),
+                f"{address[5]}, {address[7]}, {address[8]} {address[4]}", agent_id,
+            ))
+            for product_id, quantity in zip(line, quantities):
+                items.append((order_id, product_id, quantity, prices[product_id], agent_id))
+        batched(cursor, connection,
+            "INSERT INTO orders (order_id, user_id, user_order_number, order_date, payment_date, total_amount, "
+            "status, razorpay_order_id, shipping_address_id, order_status, summary_product_name, "
+            "summary_image_url, item_count, address_snapshot, assigned_agent_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            orders)
+        batched(cursor, connection,
+            "INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase, assigned_agent_id) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            items)
+    finally:
+        cursor.close()
+        connection.close()
+
+    print(
+        f"Seeded {n_users} users, {n_agents} agents, {n_products} products, {len(carts)} cart rows, "
+        f"{len(favorites)} favorites, {n_orders} orders / {len(items)} items "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic benchmark data")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--truncate", action="store_true", help="empty the tables first")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+    seed(args.scale, args.truncate, args.seed)
+
+
+if __name__ == "__main__":
+    main()
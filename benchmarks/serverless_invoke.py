@@ -0,0 +1,79 @@
+"""
+Local harness for the Lambda entry point (serverless.handler): performs the
+container init once, then replays API Gateway HTTP API (v2) events through
+the handler the way the Lambda runtime loop does, reporting cold vs warm
+latency and checking that the DB pool and caches survive across invocations.
+
+    python benchmarks/serverless_invoke.py --invocations 50 --path /demanded-products
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeContext:
+    function_name = "ecommerce-backend-local"
+    memory_limit_in_mb = 512
+    aws_request_id = "local"
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+def http_api_event(method, path, query="", body=None):
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": {"host": "localhost", "content-type": "application/json", "accept-encoding": "gzip"},
+        "requestContext": {
+            "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "harness"},
+            "requestId": "local",
+            "stage": "$default",
+        },
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Lambda invocation loop")
+    parser.add_argument("--invocations", type=int, default=20)
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--query", default="")
+    args = parser.parse_args()
+
+    init_start = time.perf_counter()
+    import serverless
+    import db
+    init_time = time.perf_counter() - init_start
+    pool = db._pool
+
+    context = FakeContext()
+    event = http_api_event(args.method, args.path, args.query)
+    latencies, statuses = [], {}
+    for _ in range(args.invocations):
+        start = time.perf_counter()
+        response = serverless.handler(event, context)
+        latencies.append(time.perf_counter() - start)
+        statuses[response["statusCode"]] = statuses.get(response["statusCode"], 0) + 1
+
+    print(f"init (cold start)     {init_time * 1000:8.1f} ms")
+    print(f"first invocation      {latencies[0] * 1000:8.1f} ms")
+    if len(latencies) > 1:
+        warm = latencies[1:]
+        print(f"warm invocations      median {statistics.median(warm) * 1000:.2f} ms, max {max(warm) * 1000:.2f} ms")
+    print(f"status codes          {statuses}")
+    reused = pool is not None and db._pool is pool
+    print(f"DB pool reused        {reused if pool is not None else 'no pool (database unreachable)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,11 @@
 from typing import List
 from fastapi import APIRouter, Body, HTTPException
 from pydantic import BaseModel
-from db import execute_query
+from db import execute_query, execute_read_query, in_list, mark_written
 
 router = APIRouter()
 
-# Add this function to create the cart table
-# def create_cart_table():
-#     create_table_query = """
-#     CREATE TABLE IF NOT EXISTS cart (
-#         user_id INT NOT NULL,
-#         id INT NOT NULL,
-#         quantity INT NOT NULL,
-#         PRIMARY KEY (user_id, id)
-#     );
-#     """
-#     execute_query(create_table_query)
-
-# # Call the function to create the cart table
-# create_cart_table()
+# Schema: migrations/0001_base_schema.sql
 
 class CartItem(BaseModel):
     user_id: int
@@ -49,6 +36,7 @@ async def add_to_cart(item: CartItem):
         """
         update_params = (item.quantity, item.user_id, item.id)
         execute_query(update_query, update_params)
+        mark_written(f"user:{item.user_id}")
         return {"message": "Item quantity updated in cart"}
     else:
         # If item doesn't exist, insert new record
@@ -58,12 +46,13 @@ async def add_to_cart(item: CartItem):
         """
         insert_params = (item.user_id, item.id, item.quantity)
         execute_query(insert_query, insert_params)
+        mark_written(f"user:{item.user_id}")
         return {"message": "Item added to cart"}
     
 @router.get("/cart/{user_id}")
 async def get_cart(user_id: int):
     query = "SELECT * FROM cart WHERE user_id = %s"
-    result = execute_query(query, (user_id,))
+    result = execute_read_query(query, (user_id,), sticky_key=f"user:{user_id}")
     if not result:
         return []
     return result
@@ -76,12 +65,13 @@ async def clear_selected_cart_items(
     if not item_ids:
         return {"message": "No items to clear"}
     
-    # Create placeholders for SQL IN clause
-    placeholders = ','.join(['%s'] * len(item_ids))
+    # Padded IN list: a handful of statement texts cover every selection size
+    placeholders, id_params = in_list(item_ids)
     query = f"DELETE FROM cart WHERE user_id = %s AND id IN ({placeholders})"
     
     # Execute query with parameters
-    execute_query(query, [user_id] + item_ids)
+    execute_query(query, [user_id] + id_params)
+    mark_written(f"user:{user_id}")
     
     return {"message": f"Cleared {len(item_ids)} items from cart"}
 
@@ -105,4 +95,5 @@ async def update_cart_item(
     """
     update_params = (item_update.quantity, user_id, product_id)
     execute_query(update_query, update_params)
+    mark_written(f"user:{user_id}")
     return {"message": "Item quantity updated"}
\ No newline at end of file
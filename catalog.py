@@ -0,0 +1,207 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, List, Optional, Tuple
+import logging
+import threading
+import time
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from mysql.connector import Error
+from db import get_read_db
+from metrics import registry
+from responses import FastJSONResponse
+from settings import get_settings
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Single-row counter bumped in the same transaction as every catalog write.
+# Schema: migrations/0004_catalog_version.sql
+
+CATALOG_POLL_SECONDS = get_settings().catalog_poll_seconds
+CACHE_CONTROL = (
+    f"public, max-age={get_settings().catalog_max_age}, "
+    f"stale-while-revalidate={get_settings().catalog_stale_while_revalidate}"
+)
+# The poller has stalled (e.g. a frozen serverless container): refresh inline
+STALE_AFTER_SECONDS = CATALOG_POLL_SECONDS * 3
+
+_version: Optional[int] = None
+_updated_at: Optional[datetime] = None
+_refreshed_at = float("-inf")
+_refresh_lock = threading.Lock()
+_stop = threading.Event()
+_poller: Optional[threading.Thread] = None
+_listeners: List[Callable[[], None]] = []
+# Stale refreshes from concurrent requests share one read
+_stale_refreshes = SingleFlight("catalog_version")
+
+registry.counter("catalog_conditional_requests_total", "Catalog GETs by conditional outcome")
+
+
+def bump_catalog_version(cursor):
+    """Call inside the transaction that changes products"""
+    cursor.execute(
+        "UPDATE catalog_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1"
+    )
+
+
+def on_catalog_change(callback: Callable[[], None]):
+    """Call `callback` from the refreshing thread whenever a new catalog version is seen"""
+    _listeners.append(callback)
+
+
+def refresh_catalog_version():
+    """
+    Read the counter from the same database catalog reads go to, so a
+    version is never newer than the rows it is attached to.
+    """
+    if _read_catalog_version():
+        for callback in _listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Catalog change listener failed: {str(e)}")
+
+
+def _read_catalog_version() -> bool:
+    """Refresh the in-memory version; True when it changed"""
+    global _version, _updated_at, _refreshed_at
+    with _refresh_lock:
+        connection = get_read_db()
+        if connection is None:
+            return False
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT version, updated_at FROM catalog_version WHERE id = 1")
+            row = cursor.fetchone()
+        except Error as e:
+            logger.warning(f"Catalog version unavailable, serving without validators: {e}")
+            row = None
+        finally:
+            cursor.close()
+            connection.close()
+        _refreshed_at = time.monotonic()
+        if row is None:
+            _version = _updated_at = None
+            return False
+        changed = row["version"] != _version
+        if changed:
+            logger.info(f"Catalog version {_version} -> {row['version']}")
+        _version = row["version"]
+        _updated_at = row["updated_at"]
+        return changed
+
+
+def _poll():
+    while not _stop.wait(CATALOG_POLL_SECONDS):
+        try:
+            refresh_catalog_version()
+        except Exception as e:
+            logger.warning(f"Catalog version poll failed: {str(e)}")
+
+
+def start_catalog_poller():
+    global _poller
+    if _poller is None or not _poller.is_alive():
+        _stop.clear()
+        try:
+            refresh_catalog_version()
+        except Exception as e:
+            logger.warning(f"Catalog version load failed: {str(e)}")
+        _poller = threading.Thread(target=_poll, name="catalog-version", daemon=True)
+        _poller.start()
+
+
+def stop_catalog_poller():
+    _stop.set()
+
+
+async def catalog_validators() -> Optional[Tuple[str, Optional[str]]]:
+    """
+    (ETag, Last-Modified) for the current catalog, or None while it is
+    unknown. Memory only while the poller runs; if it has stalled, the
+    refresh and the change listeners run in the threadpool, off the loop.
+    """
+    if time.monotonic() - _refreshed_at > STALE_AFTER_SECONDS:
+        await _stale_refreshes.do("version", refresh_catalog_version)
+    return validators_for(_version, _updated_at)
+
+
+def validators_for(version: Optional[int], updated_at: Optional[datetime]) -> Optional[Tuple[str, Optional[str]]]:
+    """(ETag, Last-Modified) for a catalog_version row"""
+    if version is None:
+        return None
+    # TIMESTAMP columns come back naive in the session time zone; the server runs in UTC
+    last_modified = format_datetime(updated_at.replace(tzinfo=timezone.utc), usegmt=True) if updated_at else None
+    # Weak: the compression middleware may re-encode the body
+    return f'W/"catalog-{version}"', last_modified
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _not_modified_since(if_modified_since: str, last_modified: Optional[str]) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return parsedate_to_datetime(last_modified) <= since
+
+
+def _cache_headers(validators) -> dict:
+    etag, last_modified = validators
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+def not_modified(request: Request, validators) -> Optional[Response]:
+    """
+    A 304 if the client's copy is current, decided from the in-memory
+    catalog version without touching MySQL; None otherwise.
+    """
+    if validators is None:
+        return None
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, validators[0])
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = if_modified_since is not None and _not_modified_since(if_modified_since, validators[1])
+    registry.inc("catalog_conditional_requests_total", (("result", "not_modified" if fresh else "full"),))
+    if fresh:
+        return Response(status_code=304, headers=_cache_headers(validators))
+    return None
+
+
+def catalog_response(content, validators) -> Response:
+    """
+    JSON response carrying the catalog validators and CDN cache headers.
+    Take `validators` before reading the rows, so a version bump racing the
+    read can only make the ETag older than the content, never newer.
+    """
+    headers = _cache_headers(validators) if validators else None
+    return FastJSONResponse(content, headers=headers)
+
+
+def catalog_bytes_response(body: bytes, validators) -> Response:
+    """catalog_response for a body that is already serialized JSON"""
+    headers = _cache_headers(validators) if validators else None
+    return Response(body, media_type="application/json", headers=headers)
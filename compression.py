@@ -0,0 +1,135 @@
+import gzip
+import io
+
+from starlette.datastructures import Headers, MutableHeaders
+from settings import get_settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSION_MIN_SIZE = get_settings().compression_min_size
+# Dynamic responses: favour speed over the last few percent of ratio
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+# Already compressed or not worth the CPU
+SKIP_CONTENT_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "text/event-stream")
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick br over gzip when the client accepts it and brotli is installed"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _GzipStream:
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.file = gzip.GzipFile(mode="wb", fileobj=self.buffer, compresslevel=GZIP_LEVEL)
+
+    def _drain(self) -> bytes:
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def compress(self, data: bytes) -> bytes:
+        self.file.write(data)
+        self.file.flush()
+        return self._drain()
+
+    def finish(self) -> bytes:
+        self.file.close()
+        return self._drain()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Plain ASGI middleware compressing response bodies of at least
+    `minimum_size` bytes with brotli or gzip, per Accept-Encoding. Streaming
+    responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        stream = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, stream, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    or content_type.startswith(SKIP_CONTENT_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                stream = _BrotliStream() if encoding == "br" else _GzipStream()
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": stream.compress(body), "more_body": True})
+                    return
+                compressed = stream.compress(body) + stream.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            chunk = stream.compress(body)
+            if not more_body:
+                chunk += stream.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,33 +1,577 @@
 import mysql.connector
-from mysql.connector import Error
-import os
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
+from collections import OrderedDict
+from fastapi import HTTPException
+from typing import List, Optional, Sequence, Tuple
+import logging
+import threading
+import time
+from cache import TTLCache
+from metrics import current_request_stats, record_db_time, registry
+from settings import get_settings
+from query_trace import fingerprint, record_query
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedCursor:
+    """Cursor proxy that reports execute/fetch time to the request metrics"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = self._cursor.execute(operation, params, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            record_db_time(elapsed)
+            record_query(operation, params, elapsed, failed)
+
+    def executemany(self, operation, seq_params):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = self._cursor.executemany(operation, seq_params)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            record_db_time(elapsed)
+            record_query(operation, None, elapsed, failed)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchone()
+        finally:
+            record_db_time(time.perf_counter() - start, is_query=False)
+
+    def fetchmany(self, size=1):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchmany(size)
+        finally:
+            record_db_time(time.perf_counter() - start, is_query=False)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchall()
+        finally:
+            record_db_time(time.perf_counter() - start, is_query=False)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class PreparedCursor(InstrumentedCursor):
+    """
+    Cursor bound to one server-side prepared statement, owned by the
+    connection's StatementCache. Execute only its own SQL, fetch every row,
+    and don't worry about close(): the statement stays prepared for the
+    next execute_query()/execute_read_query() on the same connection.
+    """
+
+    def __init__(self, cursor, sql: str):
+        super().__init__(cursor)
+        self._sql = sql
+
+    def execute(self, operation, params=None):
+        if operation != self._sql:
+            raise ValueError("A prepared cursor only executes the statement it was prepared for")
+        # mysql.connector re-prepares unless it is handed the very same string object
+        return super().execute(self._sql, params)
+
+    def close(self):
+        pass
+
+    def deallocate(self):
+        try:
+            self._cursor.close()
+        except Error:
+            pass
+
+
+class StatementCache:
+    """
+    Prepared statements of one physical connection, least recently used
+    evicted first. A connection is used by one thread at a time, so no lock.
+    """
+
+    def __init__(self, connection_id, maxsize: int):
+        self.connection_id = connection_id
+        self.maxsize = maxsize
+        self._cursors = OrderedDict()
+
+    def cursor(self, connection, sql: str, dictionary: bool) -> PreparedCursor:
+        key = (sql, dictionary)
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+            registry.inc("db_statement_cache_total", (("result", "hit"),))
+            return cursor
+        registry.inc("db_statement_cache_total", (("result", "miss"),))
+        cursor = PreparedCursor(connection.cursor(prepared=True, dictionary=dictionary), sql)
+        self._cursors[key] = cursor
+        while len(self._cursors) > self.maxsize:
+            _, evicted = self._cursors.popitem(last=False)
+            evicted.deallocate()
+        return cursor
+
+    def __len__(self):
+        return len(self._cursors)
+
+
+class InstrumentedConnection:
+    """
+    Connection proxy handing out instrumented cursors.
+
+    The pools don't reset sessions themselves, because a reset deallocates
+    every prepared statement. close() resets the session instead, unless
+    the checkout was made reset-safe: execute_query()/execute_read_query()
+    run one statement through their own cursor, so they can't leave
+    variables, temporary tables or locks behind, and a rollback is enough.
+    Only those checkouts keep the prepared statements for the next one.
+    """
+
+    def __init__(self, connection, on_close=None):
+        self._connection = connection
+        self._reset_safe = False
+        # Frees an overflow slot once the connection is closed
+        self._on_close = on_close
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def prepared_cursor(self, sql: str, dictionary: bool = False):
+        """
+        A cursor whose statement is prepared once per physical connection and
+        reused across reset-safe checkouts, so MySQL parses it once instead
+        of per call. Plain cursor when the cache is disabled or the checkout
+        may carry session state.
+        """
+        if STATEMENT_CACHE_SIZE <= 0 or not self._reset_safe:
+            return self.cursor(dictionary=dictionary)
+        # Pooled connections are handed out in a fresh wrapper each time
+        physical = getattr(self._connection, "_cnx", self._connection)
+        cache = getattr(physical, "_statement_cache", None)
+        if cache is None or cache.connection_id != physical.connection_id:
+            # New connection, or the pool reconnected it and the server forgot its statements
+            cache = StatementCache(physical.connection_id, STATEMENT_CACHE_SIZE)
+            physical._statement_cache = cache
+        return cache.cursor(physical, sql, dictionary)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return self._connection.commit()
+        finally:
+            record_db_time(time.perf_counter() - start, is_query=False)
+            stats = current_request_stats()
+            if stats is not None:
+                stats.wrote = True
+
+    def close(self):
+        # Unpooled connections are really closed; nothing to reset
+        physical = getattr(self._connection, "_cnx", None)
+        try:
+            if self._reset_safe or physical is None:
+                # The next borrower must not inherit the snapshot or the locks
+                if self._connection.in_transaction:
+                    self._connection.rollback()
+            else:
+                # The server forgets the prepared statements along with the rest
+                physical._statement_cache = None
+                physical.reset_session()
+        except Error as e:
+            logger.warning(f"Session reset on connection release failed, dropping the connection: {e}")
+            if physical is not None:
+                # The pool reconnects it on the next checkout
+                physical._statement_cache = None
+                physical.disconnect()
+        try:
+            return self._connection.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+registry.counter("db_pool_overflow_total", "Connections opened outside the pool because it was exhausted")
+registry.counter("db_pool_saturated_total", "Checkouts refused because the pool and its overflow were exhausted")
+registry.gauge("db_pool_wait_seconds", "Smoothed time to acquire a connection from get_db1()")
+registry.counter("db_statement_cache_total", "Prepared statement lookups by hit or miss")
+
+# Prepared statements kept per physical connection; 0 disables them
+STATEMENT_CACHE_SIZE = get_settings().db_statement_cache_size
+
+# Weight of the newest sample in the smoothed acquisition time
+POOL_WAIT_SMOOTHING = 0.2
+# With no acquisitions for this long, the last average says nothing about now
+POOL_WAIT_STALE_SECONDS = 5.0
+
+_pool_wait = 0.0
+_pool_wait_at = float("-inf")
+
+# Per worker and per pool: unpooled connections opened while the pool is
+# exhausted come out of the reserved budget (settings.overflow_for)
+DB_POOL_OVERFLOW = get_settings().db_pool_overflow
+_overflow_slots = threading.BoundedSemaphore(DB_POOL_OVERFLOW) if DB_POOL_OVERFLOW > 0 else None
+_replica_overflow_slots = threading.BoundedSemaphore(DB_POOL_OVERFLOW) if DB_POOL_OVERFLOW > 0 else None
+
+
+def connection_config():
+    settings = get_settings()
+    return dict(
+        host=settings.db_host,
+        user=settings.db_user,
+        password=settings.db_pass,
+        database=settings.db_name,
+        port=settings.db_port
+    )
+
+
+def init_pool():
+    """Create the connection pool (opening all its connections); called at startup"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            start = time.perf_counter()
+            _pool = pooling.MySQLConnectionPool(
+                pool_name="ecommerce",
+                pool_size=get_settings().db_pool_size,
+                # InstrumentedConnection.close() resets sessions itself
+                pool_reset_session=False,
+                **connection_config()
+            )
+            logger.info(f"MySQL pool of {_pool.pool_size} ready in {time.perf_counter() - start:.3f}s")
+    return _pool
+
+
+def _drain_pool(pool, timeout: float):
+    deadline = time.monotonic() + timeout
+    # mysql.connector keeps idle connections in _cnx_queue
+    while pool._cnx_queue.qsize() < pool.pool_size and time.monotonic() < deadline:
+        time.sleep(0.05)
+    in_use = pool.pool_size - pool._cnx_queue.qsize()
+    if in_use:
+        logger.warning(f"Closing MySQL pool {pool.pool_name} with {in_use} connections still checked out")
+    pool._remove_connections()
+    logger.info(f"MySQL pool {pool.pool_name} closed")
+
+
+def close_pool(timeout: float = 10.0):
+    """
+    Drain the pools on shutdown: wait up to `timeout` seconds for in-flight
+    requests to hand their connections back, then close every connection.
+    """
+    global _pool, _replica_pool
+    with _pool_lock:
+        pools = [p for p in (_pool, _replica_pool) if p is not None]
+        _pool = _replica_pool = None
+    for pool in pools:
+        _drain_pool(pool, timeout)
+
+
+def _record_pool_wait(elapsed: float):
+    global _pool_wait, _pool_wait_at
+    # Unlocked: a lost update under contention only drops one sample
+    _pool_wait += POOL_WAIT_SMOOTHING * (elapsed - _pool_wait)
+    _pool_wait_at = time.monotonic()
+    registry.set_gauge("db_pool_wait_seconds", (), _pool_wait)
+
+
+def pool_wait_seconds() -> float:
+    """
+    Smoothed connection acquisition time. It climbs when the pool is
+    exhausted and requests fall back to opening connections, which is
+    when the load shedder should start turning work away.
+    """
+    if time.monotonic() - _pool_wait_at > POOL_WAIT_STALE_SECONDS:
+        return 0.0
+    return _pool_wait
+
+
+def _connect_overflow(slots, config: dict, pool: str) -> Optional[InstrumentedConnection]:
+    """
+    A one-off connection for an exhausted pool while an overflow slot is
+    free; None at the cap. Raises mysql.connector.Error if connecting fails.
+    """
+    if slots is None or not slots.acquire(blocking=False):
+        return None
+    try:
+        connection = mysql.connector.connect(**config)
+    except BaseException:
+        slots.release()
+        raise
+    registry.inc("db_pool_overflow_total", (("pool", pool),))
+    logger.warning(f"MySQL {pool} pool exhausted, opened an overflow connection")
+    return InstrumentedConnection(connection, on_close=slots.release)
+
+
+def _saturated(pool: str) -> HTTPException:
+    registry.inc("db_pool_saturated_total", (("pool", pool),))
+    logger.warning(f"MySQL {pool} pool and overflow exhausted, refusing the request")
+    return HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
+
 
 def get_db1():
-    """Establish and return a database connection"""
+    """
+    Return a pooled database connection; close() hands it back to the pool.
+    When the pool is exhausted, a capped overflow connection; past the cap,
+    raises a 503 HTTPException.
+    """
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            database=os.getenv("DB_NAME"),
-            port=int(os.getenv("DB_PORT", 56105))  # Use DB_PORT, default to 22956
-        )
+        start = time.perf_counter()
+        try:
+            connection = InstrumentedConnection(init_pool().get_connection())
+        except PoolError:
+            connection = _connect_overflow(_overflow_slots, connection_config(), "primary")
+            if connection is None:
+                raise _saturated("primary")
+        elapsed = time.perf_counter() - start
+        record_db_time(elapsed, is_query=False)
+        _record_pool_wait(elapsed)
         if connection.is_connected():
-            print("Connected to MySQL database")
             return connection
+        connection.close()
     except Error as e:
-        print(f"Error while connecting to MySQL: {e}")
+        logger.error(f"Error while connecting to MySQL: {e}")
+    return None
+
+# --- Read replica routing ---
+#
+# Read-only endpoints opt in by calling get_read_db()/execute_read_query()
+# instead of get_db1()/execute_query(). A read goes to the primary instead
+# when no replica is configured, the current request has already committed,
+# the caller's sticky key wrote recently (read-your-writes), or the replica
+# is lagging or unreachable.
+
+_replica_pool = None
+_replica_lag: Optional[float] = None
+_replica_checked_at = float("-inf")
+_lag_check_lock = threading.Lock()
+
+# Sticky key (e.g. "user:42") -> True while its writes may not have replicated.
+# Per process: with several workers, a read served by another worker relies on
+# the replica being within REPLICA_MAX_LAG_SECONDS.
+_recent_writers = TTLCache(maxsize=100000, ttl=get_settings().read_your_writes_seconds)
+
+registry.counter("db_reads_total", "Opt-in reads by serving database and reason")
+registry.gauge("db_replica_lag_seconds", "Replication delay reported by the replica")
+
+
+def replica_enabled() -> bool:
+    return bool(get_settings().db_replica_host)
+
+
+def _replica_config():
+    settings = get_settings()
+    return dict(
+        host=settings.db_replica_host,
+        user=settings.db_replica_user,
+        password=settings.db_replica_pass,
+        database=settings.db_name,
+        port=settings.db_replica_port
+    )
+
+
+def init_replica_pool():
+    global _replica_pool
+    with _pool_lock:
+        if _replica_pool is None:
+            _replica_pool = pooling.MySQLConnectionPool(
+                pool_name="ecommerce_replica",
+                pool_size=get_settings().db_pool_size,
+                # InstrumentedConnection.close() resets sessions itself
+                pool_reset_session=False,
+                **_replica_config()
+            )
+            logger.info(f"MySQL replica pool of {_replica_pool.pool_size} ready")
+    return _replica_pool
+
+
+def _mark_replica_unhealthy():
+    global _replica_lag, _replica_checked_at
+    _replica_lag = None
+    _replica_checked_at = time.monotonic()
+
+
+def _check_replica_lag() -> Optional[float]:
+    """Seconds behind the primary, or None if replication is broken or the replica is down"""
+    connection = init_replica_pool().get_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Error:
+                # MySQL < 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+    if row is None:
+        # Not replicating (e.g. a managed replica that hides its status)
+        return 0.0
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+def replica_lag() -> Optional[float]:
+    """
+    Last measured replica lag, re-checked every REPLICA_LAG_CHECK_SECONDS by
+    whichever request finds it stale; concurrent requests keep using the
+    previous value instead of waiting.
+    """
+    global _replica_lag, _replica_checked_at
+    if time.monotonic() - _replica_checked_at >= get_settings().replica_lag_check_seconds:
+        if _lag_check_lock.acquire(blocking=False):
+            try:
+                try:
+                    _replica_lag = _check_replica_lag()
+                except Error as e:
+                    logger.warning(f"Replica lag check failed, reading from primary: {e}")
+                    _replica_lag = None
+                _replica_checked_at = time.monotonic()
+                if _replica_lag is not None:
+                    registry.set_gauge("db_replica_lag_seconds", (), _replica_lag)
+            finally:
+                _lag_check_lock.release()
+    return _replica_lag
+
+
+def mark_written(sticky_key: str):
+    """Pin `sticky_key`'s reads to the primary for READ_YOUR_WRITES_SECONDS"""
+    if replica_enabled():
+        _recent_writers.set(sticky_key, True)
+
+
+def _primary_reason(sticky_key: Optional[str]) -> Optional[str]:
+    if not replica_enabled():
+        return "no_replica"
+    stats = current_request_stats()
+    if stats is not None and stats.wrote:
+        return "request_write"
+    if sticky_key is not None and _recent_writers.get(sticky_key):
+        return "read_your_writes"
+    lag = replica_lag()
+    if lag is None:
+        return "replica_unhealthy"
+    if lag > get_settings().replica_max_lag_seconds:
+        return "replica_lag"
+    return None
+
+
+def get_read_db(sticky_key: Optional[str] = None):
+    """
+    Connection for a read-only query: the replica when it is safe to read
+    from, otherwise the primary. Pass the caller's sticky key (e.g.
+    "user:42") so they see their own recent writes.
+    """
+    reason = _primary_reason(sticky_key)
+    if reason is None:
+        try:
+            start = time.perf_counter()
+            try:
+                connection = InstrumentedConnection(init_replica_pool().get_connection())
+            except PoolError:
+                connection = _connect_overflow(_replica_overflow_slots, _replica_config(), "replica")
+            record_db_time(time.perf_counter() - start, is_query=False)
+            if connection is not None:
+                registry.inc("db_reads_total", (("target", "replica"), ("reason", "ok")))
+                return connection
+            # Pool and overflow exhausted; the primary's own cap applies from here
+            reason = "replica_busy"
+        except Error as e:
+            logger.warning(f"Replica unavailable, reading from primary: {e}")
+            _mark_replica_unhealthy()
+            reason = "replica_error"
+    registry.inc("db_reads_total", (("target", "primary"), ("reason", reason)))
+    return get_db1()
+
+
+def open_stream_connection():
+    """
+    Dedicated, unpooled connection for long streaming reads (exports), so
+    they never hold one of the request pool's slots. Uses the replica when
+    it is safe to read from. Raises mysql.connector.Error on failure.
+    """
+    if _primary_reason(None) is None:
+        try:
+            return InstrumentedConnection(mysql.connector.connect(**_replica_config()))
+        except Error as e:
+            logger.warning(f"Replica unavailable for streaming, using primary: {e}")
+            _mark_replica_unhealthy()
+    return InstrumentedConnection(mysql.connector.connect(**connection_config()))
+
+
+def in_list(values: Sequence) -> Tuple[str, List]:
+    """
+    Placeholders and params for `IN (...)`, padded to the next power of two
+    by repeating the last value. Lists of 5 to 8 ids then share one
+    statement text (and one prepared statement) instead of one each;
+    the repeats don't change what matches.
+    """
+    values = list(values)
+    if not values:
+        raise ValueError("in_list needs at least one value")
+    size = 1 << (len(values) - 1).bit_length()
+    values += [values[-1]] * (size - len(values))
+    return ','.join(['%s'] * size), values
+
+
+def execute_read_query(query, params=None, sticky_key: Optional[str] = None):
+    """execute_query for SELECTs that may be served by the replica"""
+    connection = get_read_db(sticky_key)
+    if not connection:
         return None
 
+    # One statement through our own cursor: nothing for a reset to clear
+    connection._reset_safe = True
+    cursor = None
+    try:
+        cursor = connection.prepared_cursor(query, dictionary=True)
+        cursor.execute(query, params or ())
+        return cursor.fetchall()
+    except Error as e:
+        logger.error(f"Error executing read query [{fingerprint(query)}]: {e}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+        if connection.is_connected():
+            connection.close()
+
+
 def execute_query(query, params=None):
     """Execute a query and return results"""
     connection = get_db1()
     if not connection:
         return None
         
+    # One statement through our own cursor: nothing for a reset to clear
+    connection._reset_safe = True
     cursor = None
     try:
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.prepared_cursor(query, dictionary=True)
         cursor.execute(query, params or ())
         
         # Handle SELECT vs INSERT/UPDATE differently
@@ -39,11 +583,11 @@ def execute_query(query, params=None):
             
         return result
     except Error as e:
-        print(f"Error executing query: {e}")
+        logger.error(f"Error executing query [{fingerprint(query)}]: {e}")
         connection.rollback()
         return None
     finally:
         if cursor:
             cursor.close()
         if connection and connection.is_connected():
-            connection.close()
\ No newline at end of file
+            connection.close()
@@ -0,0 +1,214 @@
+"""
+Index plan and EXPLAIN check for the routers' hot queries.
+
+Each HotQuery names the index it is meant to use (migrations/ creates
+them). The check EXPLAINs every query and fails when:
+  - the planned index is missing from the table, or
+  - MySQL plans a full table or full index scan on a table whose
+    estimated rows exceed --min-rows (small lookup tables are fine).
+
+Run it against a migrated database with realistic data, e.g. after
+benchmarks/seed.py, in CI or before a release:
+
+    python explain_check.py --min-rows 1000
+"""
+from datetime import date
+from typing import NamedTuple, Optional, Tuple
+import argparse
+import sys
+
+import mysql.connector
+from mysql.connector import Error
+from db import connection_config
+from exports import build_export_query
+from orders import NEXT_USER_ORDER_NUMBER_QUERY
+import order_queries
+import order_status
+from user_addresses import ADDRESS_COLUMNS
+
+FULL_SCAN_TYPES = ("ALL", "index")
+
+
+class HotQuery(NamedTuple):
+    name: str
+    sql: str
+    params: tuple
+    # (table alias as EXPLAIN reports it, index) pairs the plan must be able to use
+    indexes: Tuple[Tuple[str, str], ...]
+    # Why a full scan is accepted, for queries no B-tree index can serve
+    scan_ok: Optional[str] = None
+
+
+def _agent_listing(fields, statuses):
+    sql, params = order_queries.build_agent_orders_query(
+        1, fields, statuses=statuses, date_from=date(2024, 1, 1), before_id=1000000
+    )
+    return sql, tuple(params)
+
+
+def _export():
+    sql, params = build_export_query(date(2024, 1, 1), date(2024, 1, 31), None)
+    return sql, tuple(params)
+
+
+HOT_QUERIES = (
+    # Catalog (upload.py)
+    HotQuery("product by id", "SELECT * FROM products WHERE id = %s", (1,), (("products", "PRIMARY"),)),
+    HotQuery("products by category", "SELECT * FROM products WHERE category = %s", ("grocery",),
+             (("products", "idx_products_category"),)),
+    HotQuery("demanded feed", "SELECT * FROM products WHERE demanded = TRUE ORDER BY id", (),
+             (("products", "idx_products_demanded"),)),
+    HotQuery("products by keyword", "SELECT * FROM products WHERE keywords LIKE %s", ("%rice%",), (),
+             scan_ok="leading-wildcard LIKE; needs a FULLTEXT index"),
+    HotQuery("catalog version", "SELECT version, updated_at FROM catalog_version WHERE id = 1", (),
+             (("catalog_version", "PRIMARY"),)),
+
+    # Cart and favorites
+    HotQuery("cart by user", "SELECT * FROM cart WHERE user_id = %s", (1,), (("cart", "PRIMARY"),)),
+    HotQuery("favorites page", """
+        SELECT f.product_id, p.name, p.price, p.mainImageUrl, p.stock, p.category
+        FROM favorites f JOIN products p ON p.id = f.product_id
+        WHERE f.user_id = %s AND f.product_id < %s
+        ORDER BY f.product_id DESC LIMIT %s
+    """, (1, 1000000, 50), (("f", "PRIMARY"), ("p", "PRIMARY"))),
+    HotQuery("favorites membership", "SELECT product_id FROM favorites WHERE user_id = %s", (1,),
+             (("favorites", "PRIMARY"),)),
+
+    # Addresses
+    HotQuery("addresses by user", f"SELECT {ADDRESS_COLUMNS} FROM user_addresses WHERE user_id = %s", (1,),
+             (("user_addresses", "idx_user_addresses_user_default"),)),
+    HotQuery("default address",
+             f"SELECT {ADDRESS_COLUMNS} FROM user_addresses WHERE user_id = %s AND is_default = 1 LIMIT 1", (1,),
+             (("user_addresses", "idx_user_addresses_user_default"),)),
+
+    # Login
+    HotQuery("user by email", "SELECT * FROM users WHERE email = %s", ("a@example.com",),
+             (("users", "idx_users_email"),)),
+    HotQuery("user by mobile", "SELECT * FROM users WHERE mobile_number = %s", ("+919999999999",),
+             (("users", "idx_users_mobile"),)),
+    HotQuery("agent by email", "SELECT * FROM agent WHERE email = %s", ("a@example.com",),
+             (("agent", "idx_agent_email"),)),
+    HotQuery("agent by mobile", "SELECT * FROM agent WHERE mobile_number = %s", ("+919999999999",),
+             (("agent", "idx_agent_mobile"),)),
+
+    # Checkout and order history (orders.py)
+    HotQuery("next user order number", NEXT_USER_ORDER_NUMBER_QUERY, (1, 1),
+             (("orders", "idx_orders_user_number"), ("orders_archive", "idx_orders_user_number"))),
+    HotQuery("order history", """
+        SELECT order_id, user_id, user_order_number, order_date, total_amount, status, order_status
+        FROM orders WHERE user_id = %s ORDER BY order_date DESC
+    """, (1,), (("orders", "idx_orders_user_date"),)),
+    HotQuery("order items", """
+        SELECT oi.product_id, oi.quantity, oi.price_at_purchase AS price, p.name, p.mainImageUrl
+        FROM order_items oi JOIN products p ON oi.product_id = p.id
+        WHERE oi.order_id = %s
+    """, (1,), (("oi", "PRIMARY"), ("p", "PRIMARY"))),
+    HotQuery("archived order history",
+             "SELECT order_id, order_date FROM orders_archive WHERE user_id = %s ORDER BY order_date DESC", (1,),
+             (("orders_archive", "idx_orders_user_date"),)),
+    HotQuery("order status history",
+             "SELECT * FROM order_status_history WHERE order_id = %s ORDER BY changed_at", (1,),
+             (("order_status_history", "idx_order_status_history_order"),)),
+
+    # Dispatch
+    HotQuery("unassigned orders", """
+        SELECT o.order_id, o.summary_image_url, o.summary_product_name, o.address_snapshot
+        FROM orders o WHERE o.assigned_agent_id IS NULL
+    """, (), (("o", "idx_orders_assigned_agent"),)),
+    HotQuery("assigned orders by agent", """
+        SELECT a.id, a.name, o.order_id, o.summary_image_url, o.summary_product_name, o.address_snapshot
+        FROM orders o JOIN agent a ON o.assigned_agent_id = a.id
+        ORDER BY a.name, o.order_id DESC
+    """, (), (("o", "idx_orders_assigned_agent"),)),
+    HotQuery("agent items", "SELECT order_id FROM order_items WHERE assigned_agent_id = %s", (1,),
+             (("order_items", "idx_order_items_assigned_agent"),)),
+    HotQuery("agent map listing", *_agent_listing(order_queries.MAP_FIELDS, [order_status.ASSIGNED]),
+             (("o", "idx_orders_assigned_agent"),)),
+    HotQuery("agent order list", *_agent_listing(order_queries.ORDER_LIST_FIELDS, None),
+             (("o", "idx_orders_agent_order"),)),
+
+    # Archival candidates (archive.py)
+    HotQuery("archivable orders", """
+        SELECT order_id FROM orders WHERE order_status = %s AND order_date < %s ORDER BY order_id LIMIT %s
+    """, (order_status.DELIVERED, date(2024, 1, 1), 500), (("orders", "idx_orders_status_date"),)),
+
+    # Background jobs (jobs.py)
+    HotQuery("next due job", """
+        SELECT id, name, payload, attempts, max_attempts FROM jobs
+        WHERE status = 'queued' AND run_at <= NOW(3) ORDER BY run_at LIMIT 1
+    """, (), (("jobs", "idx_jobs_status_run_at"),)),
+
+    # Reporting (exports.py)
+    HotQuery("order export", *_export(), (("o", "idx_orders_order_date"), ("oi", "PRIMARY"))),
+
+    # Analytics (analytics.py) reads rollups by their leading date key
+    HotQuery("daily sales", "SELECT * FROM sales_daily WHERE day BETWEEN %s AND %s",
+             (date(2024, 1, 1), date(2024, 1, 31)), (("sales_daily", "PRIMARY"),)),
+    HotQuery("top products", """
+        SELECT product_id, SUM(units), SUM(revenue) FROM product_sales_daily
+        WHERE day BETWEEN %s AND %s GROUP BY product_id
+    """, (date(2024, 1, 1), date(2024, 1, 31)), (("product_sales_daily", "PRIMARY"),)),
+)
+
+
+def check(cursor, query: HotQuery, min_rows: int):
+    """Problems found in the query's plan, and the plan rows"""
+    cursor.execute(f"EXPLAIN {query.sql}", query.params)
+    plan = cursor.fetchall()
+    problems = []
+    by_table = {row["table"]: row for row in plan}
+    for table, index in query.indexes:
+        row = by_table.get(table)
+        if row is None:
+            continue
+        usable = set(filter(None, (row["possible_keys"] or "").split(","))) | {row["key"]}
+        if index not in usable:
+            problems.append(f"{table}: index {index} not usable (possible: {row['possible_keys']})")
+    if query.scan_ok is None:
+        for row in plan:
+            if row["type"] in FULL_SCAN_TYPES and (row["rows"] or 0) >= min_rows:
+                scan = "full table scan" if row["type"] == "ALL" else "full index scan"
+                problems.append(f"{row['table']}: {scan} over ~{row['rows']} rows")
+    return problems, plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot queries and flag full scans")
+    parser.add_argument("--min-rows", type=int, default=1000,
+                        help="ignore full scans of tables estimated below this many rows")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    try:
+        connection = mysql.connector.connect(**connection_config())
+    except Error as e:
+        print(f"Cannot connect to MySQL: {e}", file=sys.stderr)
+        sys.exit(2)
+    cursor = connection.cursor(dictionary=True)
+    failures = 0
+    try:
+        for query in HOT_QUERIES:
+            try:
+                problems, plan = check(cursor, query, args.min_rows)
+            except Error as e:
+                problems, plan = [f"EXPLAIN failed: {e.msg}"], []
+            status = "FAIL" if problems else ("scan ok" if query.scan_ok else "ok")
+            print(f"{status:8s} {query.name}")
+            for problem in problems:
+                print(f"           {problem}")
+            if query.scan_ok and not problems:
+                print(f"           ({query.scan_ok})")
+            if args.verbose:
+                for row in plan:
+                    print(f"           {row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}")
+            failures += bool(problems)
+    finally:
+        cursor.close()
+        connection.close()
+
+    print(f"{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries pass")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
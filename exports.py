@@ -0,0 +1,226 @@
+from datetime import date, timedelta
+from typing import Optional
+import csv
+import io
+import logging
+import threading
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from mysql.connector import Error
+from db import open_stream_connection
+from responses import dumps
+import order_status
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Rows pulled from the server per fetchmany; memory stays at one batch
+EXPORT_FETCH_SIZE = 1000
+# Each export holds a dedicated MySQL connection for its whole duration
+EXPORT_MAX_CONCURRENT = 2
+# Server-side timeout for a client that reads slowly
+NET_WRITE_TIMEOUT_SECONDS = 600
+
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+ORDER_COLUMNS = (
+    "order_id", "user_id", "user_order_number", "order_date", "payment_date", "total_amount",
+    "status", "order_status", "razorpay_order_id", "razorpay_payment_id", "shipping_address_id",
+)
+ITEM_COLUMNS = ("product_id", "quantity", "price_at_purchase")
+CSV_COLUMNS = ORDER_COLUMNS + ITEM_COLUMNS
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def build_export_query(date_from: date, date_to: date, user_id: Optional[int]):
+    """One row per order item (orders without items get one row of NULLs), in order_date order"""
+    conditions = ["o.order_date >= %s", "o.order_date < %s"]
+    params = [date_from, date_to + timedelta(days=1)]
+    if user_id is not None:
+        conditions.append("o.user_id = %s")
+        params.append(user_id)
+    order_columns = ", ".join(f"o.{c}" for c in ORDER_COLUMNS)
+    item_columns = ", ".join(f"oi.{c}" for c in ITEM_COLUMNS)
+    # idx_orders_order_date serves the range; the order_id tie-break keeps an order's items together
+    query = f"""
+        SELECT {order_columns}, {item_columns}
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.order_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY o.order_date, o.order_id, oi.product_id
+    """
+    return query, params
+
+
+class _Export:
+    """
+    Owns the connection and the concurrency slot, which are released exactly
+    once. The response's background task may run in another thread while the
+    stream is still inside a cursor call; the connection is never closed
+    under it, the call's own thread closes it as soon as the call returns.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = None
+        self.closed = False
+        self._fetching = False
+        self._abandoned = False
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Called by the stream when it finishes or fails"""
+        with self._lock:
+            if not self._claim_close():
+                return
+        self._release()
+
+    def abandon(self):
+        """Background task: close now, or after the cursor call in flight"""
+        with self._lock:
+            if self._fetching:
+                self._abandoned = True
+                return
+            if not self._claim_close():
+                return
+        self._release()
+
+    def _claim_close(self) -> bool:
+        # Caller holds the lock
+        if self.closed:
+            return False
+        self.closed = True
+        return True
+
+    def _release(self):
+        try:
+            if self.cursor is not None:
+                self.cursor.close()
+        except Error:
+            # Unread rows after a client disconnect; closing the connection discards them
+            pass
+        finally:
+            self.connection.close()
+            _export_slots.release()
+
+    def _run(self, func, *args):
+        """Run a blocking cursor call; None once the export has been closed"""
+        with self._lock:
+            if self.closed:
+                return None
+            self._fetching = True
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._fetching = False
+                close_here = self._abandoned and self._claim_close()
+            if close_here:
+                self._release()
+
+    def _start(self, query, params):
+        self.cursor = self.connection.cursor(buffered=False)
+        self.cursor.execute(query, params)
+        return self.cursor.fetchmany(EXPORT_FETCH_SIZE)
+
+    def rows(self, query, params):
+        """Stream result rows from an unbuffered cursor, one batch at a time"""
+        batch = self._run(self._start, query, params)
+        while batch:
+            yield batch
+            batch = self._run(self.cursor.fetchmany, EXPORT_FETCH_SIZE)
+
+
+def _csv_chunks(export: _Export, query, params):
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        status_index = CSV_COLUMNS.index("order_status")
+        for batch in export.rows(query, params):
+            for row in batch:
+                row = list(row)
+                row[status_index] = order_status.status_name(row[status_index])
+                writer.writerow(row)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    except Error as e:
+        # Headers are already sent; all that is left is to cut the stream short
+        logger.error(f"Order export aborted: {e}")
+        raise
+    finally:
+        export.close()
+
+
+def _ndjson_chunks(export: _Export, query, params):
+    """One JSON object per order with its items nested; rows arrive grouped by order"""
+    order_width = len(ORDER_COLUMNS)
+    current = None
+    try:
+        for batch in export.rows(query, params):
+            lines = []
+            for row in batch:
+                if current is None or current["order_id"] != row[0]:
+                    if current is not None:
+                        lines.append(dumps(current))
+                    current = dict(zip(ORDER_COLUMNS, row[:order_width]))
+                    current["order_status"] = order_status.status_name(current["order_status"])
+                    current["items"] = []
+                if row[order_width] is not None:
+                    current["items"].append(dict(zip(ITEM_COLUMNS, row[order_width:])))
+            if lines:
+                yield b"\n".join(lines) + b"\n"
+        if current is not None:
+            yield dumps(current) + b"\n"
+    except Error as e:
+        logger.error(f"Order export aborted: {e}")
+        raise
+    finally:
+        export.close()
+
+
+@router.get("/exports/orders")
+async def export_orders(
+    date_from: date,
+    date_to: date,
+    export_format: str = Query("csv", alias="format", regex="^(csv|ndjson)$"),
+    user_id: Optional[int] = None
+):
+    """
+    Stream orders placed between date_from and date_to (inclusive) with
+    their items, as CSV (one line per item) or NDJSON (one order per
+    line), in constant memory.
+    """
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to is before date_from")
+    if not _export_slots.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Too many exports running, retry shortly")
+
+    try:
+        connection = open_stream_connection()
+        cursor = connection.cursor()
+        cursor.execute("SET SESSION net_write_timeout = %s", (NET_WRITE_TIMEOUT_SECONDS,))
+        cursor.close()
+    except Error as e:
+        _export_slots.release()
+        logger.error(f"Order export could not connect: {e}")
+        raise HTTPException(status_code=503, detail="Export unavailable")
+
+    export = _Export(connection)
+    query, params = build_export_query(date_from, date_to, user_id)
+    chunks = _csv_chunks if export_format == "csv" else _ndjson_chunks
+    filename = f"orders-{date_from.isoformat()}-{date_to.isoformat()}.{export_format}"
+    return StreamingResponse(
+        chunks(export, query, params),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        # Runs even if the client disconnects before the body is consumed
+        background=BackgroundTask(export.abandon)
+    )
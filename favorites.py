@@ -1,27 +1,194 @@
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from db import execute_query
+from mysql.connector import Error
+from cache import TTLCache
+from db import execute_read_query, get_db1, mark_written
+from responses import FastJSONResponse
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# The (user_id, product_id) primary key makes adds idempotent.
+# Schema: migrations/0005_favorites_primary_key.sql
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BATCH_SIZE = 500
+
+# user_id -> frozenset of favorited product ids. Writes invalidate only
+# this worker's copy, so the TTL bounds how long other workers and
+# instances can answer "is favorited?" from before a toggle.
+MEMBERSHIP_CACHE_TTL_SECONDS = 5
+membership_cache = TTLCache(maxsize=20000, ttl=MEMBERSHIP_CACHE_TTL_SECONDS)
+
+
 class FavoriteItem(BaseModel):
     user_id: int
     product_id: int
 
+class BulkFavoritesRequest(BaseModel):
+    user_id: int
+    add: List[int] = []
+    remove: List[int] = []
+
+
+def invalidate_favorites(user_id: int):
+    membership_cache.delete(user_id)
+    mark_written(f"user:{user_id}")
+
+
+def favorite_product_ids(user_id: int) -> frozenset:
+    """The user's favorited product ids, from the membership cache when warm"""
+    members = membership_cache.get(user_id)
+    if members is None:
+        rows = execute_read_query(
+            "SELECT product_id FROM favorites WHERE user_id = %s", (user_id,), sticky_key=f"user:{user_id}"
+        )
+        if rows is None:
+            raise HTTPException(status_code=500, detail="Failed to load favorites")
+        members = frozenset(row['product_id'] for row in rows)
+        membership_cache.set(user_id, members)
+    return members
+
+
+def apply_favorites(user_id: int, add: List[int], remove: List[int]) -> dict:
+    """Add and remove in one transaction; unknown product ids are ignored on add"""
+    add = sorted(set(add) - set(remove))
+    remove = sorted(set(remove))
+    if len(add) + len(remove) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} products per request")
+    if not add and not remove:
+        return {"added": 0, "removed": 0}
+
+    connection = get_db1()
+    if connection is None:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction()
+        added = removed = 0
+        if add:
+            placeholders = ','.join(['%s'] * len(add))
+            cursor.execute(
+                f"""
+                INSERT IGNORE INTO favorites (user_id, product_id)
+                SELECT %s, id FROM products WHERE id IN ({placeholders})
+                """,
+                [user_id] + add
+            )
+            added = cursor.rowcount
+        if remove:
+            placeholders = ','.join(['%s'] * len(remove))
+            cursor.execute(
+                f"DELETE FROM favorites WHERE user_id = %s AND product_id IN ({placeholders})",
+                [user_id] + remove
+            )
+            removed = cursor.rowcount
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        logger.error(f"Favorites update failed for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to update favorites")
+    finally:
+        cursor.close()
+        connection.close()
+    invalidate_favorites(user_id)
+    return {"added": added, "removed": removed}
+
+
 @router.post("/favorites")
 async def add_to_favorites(item: FavoriteItem):
+    """Idempotent: adding a product that is already a favorite is a no-op"""
+    result = apply_favorites(item.user_id, [item.product_id], [])
+    if not result["added"] and item.product_id not in favorite_product_ids(item.user_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    return {"message": "Item added to favorites", "favorited": True}
+
+@router.delete("/favorites/{user_id}/{product_id}")
+async def remove_from_favorites(user_id: int, product_id: int):
+    apply_favorites(user_id, [], [product_id])
+    return {"message": "Item removed from favorites", "favorited": False}
+
+@router.post("/favorites/toggle")
+async def toggle_favorite(item: FavoriteItem):
+    connection = get_db1()
+    if connection is None:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction()
+        cursor.execute(
+            "DELETE FROM favorites WHERE user_id = %s AND product_id = %s",
+            (item.user_id, item.product_id)
+        )
+        favorited = cursor.rowcount == 0
+        if favorited:
+            cursor.execute(
+                "INSERT IGNORE INTO favorites (user_id, product_id) SELECT %s, id FROM products WHERE id = %s",
+                (item.user_id, item.product_id)
+            )
+            if cursor.rowcount == 0:
+                connection.rollback()
+                raise HTTPException(status_code=404, detail="Product not found")
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        logger.error(f"Favorite toggle failed for user {item.user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to update favorites")
+    finally:
+        cursor.close()
+        connection.close()
+    invalidate_favorites(item.user_id)
+    return {"product_id": item.product_id, "favorited": favorited}
+
+@router.post("/favorites/bulk")
+async def bulk_update_favorites(payload: BulkFavoritesRequest):
+    return apply_favorites(payload.user_id, payload.add, payload.remove)
+
+@router.get("/favorites/{user_id}/contains")
+async def favorites_contain(user_id: int, product_ids: str = Query(..., description="Comma-separated product ids")):
+    """Which of `product_ids` the user has favorited, e.g. for a product grid"""
+    try:
+        ids = [int(part) for part in product_ids.split(',') if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="product_ids must be comma-separated integers")
+    if len(ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} products per request")
+    members = favorite_product_ids(user_id)
+    return {"favorites": {product_id: product_id in members for product_id in ids}}
+
+@router.get("/favorites/{user_id}")
+async def get_favorites(
+    user_id: int,
+    before_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Favorites with product summaries, newest product first; pass next_before_id for the next page"""
+    # Keyset on the primary key: (user_id, product_id) seeks straight to the page
     query = """
-        INSERT INTO favorites (user_id, product_id)
-        VALUES (%s, %s)
+        SELECT
+            f.product_id,
+            p.name,
+            p.price,
+            p.mainImageUrl,
+            p.stock,
+            p.category
+        FROM favorites f
+        JOIN products p ON p.id = f.product_id
+        WHERE f.user_id = %s
     """
-    params = (item.user_id, item.product_id)
-    execute_query(query, params)
-    return {"message": "Item added to favorites"}
+    params = [user_id]
+    if before_id is not None:
+        query += " AND f.product_id < %s"
+        params.append(before_id)
+    query += " ORDER BY f.product_id DESC LIMIT %s"
+    params.append(limit)
 
-@router.get("/favorites/{user_id}")
-async def get_favorites(user_id: int):
-    query = "SELECT * FROM favorites WHERE user_id = %s"
-    result = execute_query(query, (user_id,))
-    if not result:
-        raise HTTPException(status_code=404, detail="No favorites found")
-    return result
\ No newline at end of file
+    rows = execute_read_query(query, params, sticky_key=f"user:{user_id}")
+    if rows is None:
+        raise HTTPException(status_code=500, detail="Failed to load favorites")
+    next_before_id = rows[-1]['product_id'] if len(rows) == limit else None
+    return FastJSONResponse({"favorites": rows, "next_before_id": next_before_id})
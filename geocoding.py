@@ -0,0 +1,179 @@
+from array import array
+from bisect import bisect_left
+from typing import Optional, Tuple
+import csv
+import logging
+import threading
+
+from fastapi import APIRouter, HTTPException
+from db import get_db1
+from jobs import enqueue, job
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# CSV with at least pincode, latitude and longitude columns (e.g. the India
+# Post all-India pincode directory). Several post offices share a pincode;
+# their coordinates are averaged into a centroid.
+PINCODE_DATASET_PATH = get_settings().pincode_dataset_path
+GEOCODE_BATCH_SIZE = 500
+
+
+class PincodeLookup:
+    """
+    Pincode -> (lat, lon) centroid lookup held in three parallel arrays
+    sorted by pincode: ~16 bytes per pincode instead of a dict of tuples.
+    """
+
+    def __init__(self):
+        self.pincodes = array('I')
+        self.lats = array('d')
+        self.lons = array('d')
+
+    @classmethod
+    def from_csv(cls, path: str) -> "PincodeLookup":
+        sums = {}
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            fields = {name.lower(): name for name in (reader.fieldnames or [])}
+            pin_col = fields.get("pincode")
+            lat_col = fields.get("latitude") or fields.get("lat")
+            lon_col = fields.get("longitude") or fields.get("lon")
+            if not (pin_col and lat_col and lon_col):
+                raise ValueError(f"{path} needs pincode, latitude and longitude columns")
+            for row in reader:
+                try:
+                    pincode = int(row[pin_col])
+                    lat = float(row[lat_col])
+                    lon = float(row[lon_col])
+                except (TypeError, ValueError):
+                    # Rows with "NA" or blank coordinates are common in the source data
+                    continue
+                entry = sums.get(pincode)
+                if entry is None:
+                    sums[pincode] = [lat, lon, 1]
+                else:
+                    entry[0] += lat
+                    entry[1] += lon
+                    entry[2] += 1
+
+        lookup = cls()
+        for pincode in sorted(sums):
+            lat_sum, lon_sum, count = sums[pincode]
+            lookup.pincodes.append(pincode)
+            lookup.lats.append(lat_sum / count)
+            lookup.lons.append(lon_sum / count)
+        return lookup
+
+    def lookup(self, pincode) -> Optional[Tuple[float, float]]:
+        try:
+            key = int(str(pincode).strip())
+        except (TypeError, ValueError):
+            return None
+        i = bisect_left(self.pincodes, key)
+        if i < len(self.pincodes) and self.pincodes[i] == key:
+            return self.lats[i], self.lons[i]
+        return None
+
+    def __len__(self):
+        return len(self.pincodes)
+
+
+_lookup: Optional[PincodeLookup] = None
+_lookup_lock = threading.Lock()
+
+
+def get_pincode_lookup() -> PincodeLookup:
+    """Load the pincode dataset once; an empty lookup if it is not available"""
+    global _lookup
+    if _lookup is None:
+        with _lookup_lock:
+            if _lookup is None:
+                try:
+                    _lookup = PincodeLookup.from_csv(PINCODE_DATASET_PATH)
+                    logger.info(f"Loaded {len(_lookup)} pincode centroids from {PINCODE_DATASET_PATH}")
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Pincode dataset unavailable, geocoding disabled: {str(e)}")
+                    _lookup = PincodeLookup()
+    return _lookup
+
+
+def geocode_pincode(pincode) -> Optional[Tuple[float, float]]:
+    return get_pincode_lookup().lookup(pincode)
+
+
+@job("addresses.geocode_missing", lease_seconds=3600)
+def geocode_missing_addresses(batch_size: int = GEOCODE_BATCH_SIZE) -> dict:
+    """
+    Fill lat/lon for addresses that arrived without coordinates, in
+    id-ordered batches so each transaction stays small.
+    """
+    # Imported here: user_addresses uses this module for write-time geocoding
+    from user_addresses import invalidate_user_addresses
+
+    lookup = get_pincode_lookup()
+    stats = {"resolved": 0, "unresolved": 0}
+    if not len(lookup):
+        return stats
+
+    connection = get_db1()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+    cursor = connection.cursor(dictionary=True)
+    try:
+        last_id = 0
+        while True:
+            cursor.execute(
+                """
+                SELECT id, user_id, pincode FROM user_addresses
+                WHERE id > %s AND (lat IS NULL OR lon IS NULL)
+                ORDER BY id
+                LIMIT %s
+                """,
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+
+            updates = []
+            users = set()
+            for row in rows:
+                coords = lookup.lookup(row['pincode'])
+                if coords is None:
+                    stats["unresolved"] += 1
+                    continue
+                updates.append((coords[0], coords[1], row['id']))
+                users.add(row['user_id'])
+
+            if updates:
+                cursor.executemany(
+                    "UPDATE user_addresses SET lat = %s, lon = %s WHERE id = %s AND (lat IS NULL OR lon IS NULL)",
+                    updates
+                )
+                connection.commit()
+                stats["resolved"] += len(updates)
+                for user_id in users:
+                    invalidate_user_addresses(user_id)
+
+        logger.info(f"Geocoded addresses: {stats}")
+        return stats
+    except Exception as e:
+        connection.rollback()
+        logger.error(f"Geocoding batch failed: {str(e)}")
+        raise
+    finally:
+        cursor.close()
+        connection.close()
+
+
+@router.post("/addresses/geocode-missing")
+async def start_geocoding(batch_size: int = GEOCODE_BATCH_SIZE):
+    """Queue a job that fills missing address coordinates from the local pincode dataset"""
+    if not len(get_pincode_lookup()):
+        raise HTTPException(status_code=503, detail="Pincode dataset not loaded")
+    job_id = enqueue("addresses.geocode_missing", {"batch_size": batch_size})
+    return {"message": "Geocoding queued", "job_id": job_id}
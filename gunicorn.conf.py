@@ -0,0 +1,53 @@
+# gunicorn.conf.py
+# Production server profile: gunicorn -c gunicorn.conf.py main:app
+import os
+from settings import default_workers, get_settings, pool_size_for
+
+workers = int(os.getenv("WEB_CONCURRENCY", default_workers()))
+# Exported before get_settings() runs so each worker sizes its DB pool for
+# the real worker count
+os.environ["WEB_CONCURRENCY"] = str(workers)
+settings = get_settings()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+# UvicornWorker picks uvloop and httptools when they are installed
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Connection handling
+backlog = int(os.getenv("GUNICORN_BACKLOG", 2048))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 75))  # above typical load balancer idle timeouts
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Recycle workers periodically to contain slow leaks
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+# Peers whose X-Forwarded-For uvicorn applies to request.client. It takes
+# the leftmost entry, which the client writes, so never "*"; set the
+# platform proxy's address or CIDR. Rate limits don't depend on this:
+# they read the proxy-appended hop themselves (TRUSTED_PROXY_HOPS).
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Import the app in each worker after fork, so every worker opens its own pool
+preload_app = False
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+loglevel = settings.log_level.lower()
+
+
+def on_starting(server):
+    pool_size = settings.db_pool_size
+    server.log.info(
+        f"{workers} workers x {settings.app_instances} instances, "
+        f"{pool_size} MySQL connections per worker (+{settings.db_pool_overflow} overflow) "
+        f"({workers * settings.app_instances * pool_size} of {settings.mysql_max_connections}, "
+        f"{settings.db_reserved_connections} reserved)"
+    )
+    expected = pool_size_for(workers, settings.app_instances, settings.mysql_max_connections,
+                             settings.db_reserved_connections)
+    if pool_size > expected:
+        server.log.warning(
+            f"DB_POOL_SIZE={pool_size} exceeds the per-worker budget of {expected}; "
+            f"MySQL may refuse connections at peak"
+        )
@@ -0,0 +1,476 @@
+"""
+In-process background jobs backed by the `jobs` table.
+
+Handlers register with @job and run in worker threads started from the
+app lifespan; request handlers enqueue() work instead of doing it inline.
+A job is claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+workers across instances share the queue without double-running a job.
+Failures retry with exponential backoff until max_attempts; a worker that
+dies mid-job loses its lease and the job is queued again. Handlers may
+therefore run more than once and must be idempotent.
+
+Serverless instances run no worker threads (JOB_WORKERS=0), so nothing
+there enqueues periodic jobs such as payment reconciliation or order
+archiving, or works the queue. Deployments without a long-running
+instance must call POST /jobs/tick from an external scheduler (e.g.
+every minute); each call does one scheduler pass and then runs due jobs
+inline until its time budget is spent.
+
+The HTTP endpoints run handlers with caller-chosen arguments, so they
+require the X-Admin-Token header (require_admin) and are disabled while
+ADMIN_TOKEN is unset.
+
+Schema: migrations/0010_jobs.sql
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+import hmac
+import inspect
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from mysql.connector import Error
+from db import execute_query, get_db1
+from metrics import registry
+from responses import dumps
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+JOB_WORKERS = get_settings().job_workers
+JOB_POLL_SECONDS = get_settings().job_poll_seconds
+JOB_RETENTION_DAYS = get_settings().job_retention_days
+ADMIN_TOKEN = get_settings().admin_token
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SECONDS = 600
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 3600
+# How often the scheduler enqueues due periodic jobs and reaps expired leases
+SCHEDULER_TICK_SECONDS = 30
+MAX_ERROR_LENGTH = 2000
+
+JOB_DURATION_BUCKETS = (0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0, 1800.0, 3600.0)
+
+registry.counter("jobs_total", "Finished job attempts by name and outcome")
+registry.histogram("job_duration_seconds", "Job run time", JOB_DURATION_BUCKETS)
+
+
+class JobSpec(NamedTuple):
+    func: Callable[..., Any]
+    max_attempts: int
+    lease_seconds: int
+
+
+class Schedule(NamedTuple):
+    name: str
+    every_seconds: int
+    payload: dict
+
+
+_handlers: Dict[str, JobSpec] = {}
+_schedules: List[Schedule] = []
+_stop = threading.Event()
+_wake = threading.Event()
+_threads: List[threading.Thread] = []
+
+
+def job(name: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, lease_seconds: int = DEFAULT_LEASE_SECONDS):
+    """Register a function as the handler for `name`; it is called with the payload as keyword arguments"""
+    def register(func):
+        if name in _handlers:
+            raise ValueError(f"Job {name} is already registered")
+        _handlers[name] = JobSpec(func, max_attempts, lease_seconds)
+        return func
+    return register
+
+
+def schedule(name: str, every_seconds: int, payload: Optional[dict] = None):
+    """Enqueue `name` once per `every_seconds` period, however many instances are running"""
+    _schedules.append(Schedule(name, every_seconds, payload or {}))
+
+
+def _insert(cursor, name: str, payload: Optional[dict], delay_seconds: float, dedupe_key: Optional[str]):
+    spec = _handlers.get(name)
+    cursor.execute(
+        """
+        INSERT IGNORE INTO jobs (name, payload, max_attempts, lease_seconds, run_at, dedupe_key)
+        VALUES (%s, %s, %s, %s, NOW(3) + INTERVAL %s MICROSECOND, %s)
+        """,
+        (
+            name,
+            dumps(payload or {}).decode("utf-8"),
+            spec.max_attempts if spec else DEFAULT_MAX_ATTEMPTS,
+            spec.lease_seconds if spec else DEFAULT_LEASE_SECONDS,
+            int(delay_seconds * 1_000_000),
+            dedupe_key,
+        )
+    )
+    return cursor.lastrowid if cursor.rowcount == 1 else None
+
+
+def enqueue(
+    name: str,
+    payload: Optional[dict] = None,
+    delay_seconds: float = 0,
+    cursor=None,
+    dedupe_key: Optional[str] = None
+) -> Optional[int]:
+    """
+    Queue a job and return its id (None when dedupe_key already exists).
+    Pass the caller's cursor to enqueue inside its transaction, so the job
+    exists exactly when the caller's writes commit.
+    """
+    if cursor is not None:
+        return _insert(cursor, name, payload, delay_seconds, dedupe_key)
+
+    connection = get_db1()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+    own_cursor = connection.cursor()
+    try:
+        job_id = _insert(own_cursor, name, payload, delay_seconds, dedupe_key)
+        connection.commit()
+    finally:
+        own_cursor.close()
+        connection.close()
+    if not delay_seconds:
+        _wake.set()
+    return job_id
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so failed jobs don't retry in lockstep"""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _claim(worker_id: str) -> Optional[dict]:
+    connection = get_db1()
+    if connection is None:
+        return None
+    cursor = connection.cursor(dictionary=True)
+    try:
+        connection.start_transaction()
+        cursor.execute(
+            """
+            SELECT id, name, payload, attempts, max_attempts FROM jobs
+            WHERE status = 'queued' AND run_at <= NOW(3)
+            ORDER BY run_at
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+            """
+        )
+        claimed = cursor.fetchone()
+        if claimed is not None:
+            cursor.execute(
+                """
+                UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = %s, locked_at = NOW(3)
+                WHERE id = %s
+                """,
+                (worker_id, claimed['id'])
+            )
+            claimed['attempts'] += 1
+        connection.commit()
+        return claimed
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _finish(job_id: int, worker_id: str, query: str, params: tuple):
+    """Record the outcome, unless the lease expired and another worker owns the job now"""
+    connection = get_db1()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"{query} WHERE id = %s AND locked_by = %s AND status = 'running'",
+                       params + (job_id, worker_id))
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def run_job(claimed: dict, worker_id: str):
+    name = claimed['name']
+    spec = _handlers.get(name)
+    started = time.perf_counter()
+    try:
+        if spec is None:
+            # Enqueued by a newer deploy; leave it for an instance that knows it
+            raise LookupError(f"No handler registered for job {name}")
+        spec.func(**json.loads(claimed['payload']))
+    except Exception as e:
+        elapsed = time.perf_counter() - started
+        error = f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH]
+        if claimed['attempts'] >= claimed['max_attempts']:
+            logger.error(f"Job {claimed['id']} ({name}) failed for good after {claimed['attempts']} attempts: {error}")
+            outcome = "failed"
+            _finish(claimed['id'], worker_id,
+                    "UPDATE jobs SET status = 'failed', locked_by = NULL, last_error = %s", (error,))
+        else:
+            delay = retry_delay(claimed['attempts'])
+            logger.warning(f"Job {claimed['id']} ({name}) attempt {claimed['attempts']} failed, retrying in {delay:.0f}s: {error}")
+            outcome = "retry"
+            _finish(claimed['id'], worker_id,
+                    """
+                    UPDATE jobs SET status = 'queued', locked_by = NULL, last_error = %s,
+                        run_at = NOW(3) + INTERVAL %s MICROSECOND
+                    """,
+                    (error, int(delay * 1_000_000)))
+    else:
+        elapsed = time.perf_counter() - started
+        logger.info(f"Job {claimed['id']} ({name}) done in {elapsed:.2f}s")
+        outcome = "done"
+        _finish(claimed['id'], worker_id, "UPDATE jobs SET status = 'done', locked_by = NULL", ())
+    registry.inc("jobs_total", (("name", name), ("outcome", outcome)))
+    registry.observe("job_duration_seconds", (("name", name),), elapsed)
+
+
+def _work(worker_id: str):
+    while not _stop.is_set():
+        try:
+            claimed = _claim(worker_id)
+        except Exception as e:
+            logger.warning(f"Job claim failed: {str(e)}")
+            claimed = None
+        if claimed is None:
+            _wake.wait(JOB_POLL_SECONDS)
+            _wake.clear()
+            continue
+        try:
+            run_job(claimed, worker_id)
+        except Exception as e:
+            # The outcome could not be recorded; the lease reaper will requeue the job
+            logger.error(f"Job {claimed['id']} ({claimed['name']}) outcome not recorded: {str(e)}")
+
+
+def reap_expired_leases() -> int:
+    """Requeue jobs whose worker died or hung past the lease; fail those out of attempts"""
+    connection = get_db1()
+    if connection is None:
+        return 0
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            UPDATE jobs
+            SET status = IF(attempts >= max_attempts, 'failed', 'queued'),
+                locked_by = NULL,
+                last_error = 'Lease expired'
+            WHERE status = 'running' AND locked_at < NOW(3) - INTERVAL lease_seconds SECOND
+            """
+        )
+        connection.commit()
+        if cursor.rowcount:
+            logger.warning(f"Reclaimed {cursor.rowcount} jobs with expired leases")
+        return cursor.rowcount
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _schedule_pass(last_slots: Dict[str, int]):
+    """Enqueue periodic jobs due in the current period and reap expired leases"""
+    for entry in _schedules:
+        slot = int(time.time() // entry.every_seconds)
+        if last_slots.get(entry.name) == slot:
+            continue
+        try:
+            enqueue(entry.name, entry.payload, dedupe_key=f"{entry.name}@{slot}")
+            last_slots[entry.name] = slot
+        except Exception as e:
+            logger.warning(f"Scheduling {entry.name} failed: {str(e)}")
+    try:
+        reap_expired_leases()
+    except Exception as e:
+        logger.warning(f"Lease reaper failed: {str(e)}")
+
+
+def _schedule_loop():
+    last_slots: Dict[str, int] = {}
+    while True:
+        _schedule_pass(last_slots)
+        if _stop.wait(SCHEDULER_TICK_SECONDS):
+            return
+
+
+def run_due_jobs(max_seconds: float) -> int:
+    """
+    One scheduler pass, then claim and run due jobs in this thread until
+    the queue is empty or `max_seconds` have passed; returns how many ran.
+    A job still running when the invocation is killed loses its lease and
+    is retried.
+    """
+    _schedule_pass({})
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:tick"
+    deadline = time.monotonic() + max_seconds
+    ran = 0
+    while time.monotonic() < deadline:
+        claimed = _claim(worker_id)
+        if claimed is None:
+            break
+        run_job(claimed, worker_id)
+        ran += 1
+    return ran
+
+
+def start_job_runner():
+    if JOB_WORKERS <= 0 or any(thread.is_alive() for thread in _threads):
+        return
+    _stop.clear()
+    _threads.clear()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    for index in range(JOB_WORKERS):
+        name = f"job-worker-{index}"
+        _threads.append(threading.Thread(target=_work, args=(f"{prefix}:{name}",), name=name, daemon=True))
+    _threads.append(threading.Thread(target=_schedule_loop, name="job-scheduler", daemon=True))
+    for thread in _threads:
+        thread.start()
+    logger.info(f"Started {JOB_WORKERS} job workers for {sorted(_handlers)}")
+
+
+def stop_job_runner(timeout: float = 10.0):
+    """Stop claiming new jobs and give running ones `timeout` seconds to finish"""
+    _stop.set()
+    _wake.set()
+    deadline = time.monotonic() + timeout
+    for thread in _threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+    still_running = [thread.name for thread in _threads if thread.is_alive()]
+    if still_running:
+        logger.warning(f"Jobs still running at shutdown, their leases will expire: {still_running}")
+
+
+@job("jobs.purge_finished")
+def purge_finished_jobs(retention_days: int = JOB_RETENTION_DAYS, batch_size: int = 1000):
+    connection = get_db1()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+    cursor = connection.cursor()
+    try:
+        deleted = 0
+        while True:
+            cursor.execute(
+                """
+                DELETE FROM jobs
+                WHERE status IN ('done', 'failed') AND run_at < NOW(3) - INTERVAL %s DAY
+                LIMIT %s
+                """,
+                (retention_days, batch_size)
+            )
+            connection.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+        logger.info(f"Purged {deleted} finished jobs older than {retention_days} days")
+    finally:
+        cursor.close()
+        connection.close()
+
+
+schedule("jobs.purge_finished", 24 * 3600)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency for operator endpoints: X-Admin-Token must match ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+class EnqueueJobRequest(BaseModel):
+    name: str
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    delay_seconds: float = Field(0, ge=0)
+
+
+class JobStatus(BaseModel):
+    id: int
+    name: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+
+@router.post("/jobs", dependencies=[Depends(require_admin)])
+async def enqueue_job(request: EnqueueJobRequest):
+    """Queue a registered job, e.g. a backfill or a rollup rebuild"""
+    spec = _handlers.get(request.name)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {request.name}")
+    try:
+        inspect.signature(spec.func).bind(**request.payload)
+    except TypeError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid payload for {request.name}: {e}")
+    try:
+        job_id = enqueue(request.name, request.payload, request.delay_seconds)
+    except (Error, RuntimeError) as e:
+        logger.error(f"Enqueue of {request.name} failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to enqueue job")
+    return {"job_id": job_id}
+
+
+@router.post("/jobs/tick", dependencies=[Depends(require_admin)])
+async def tick_jobs(max_seconds: float = Query(20, gt=0, le=600)):
+    """Scheduler and worker pass for deployments without job threads; call it from cron"""
+    try:
+        ran = await run_in_threadpool(run_due_jobs, max_seconds)
+    except (Error, RuntimeError) as e:
+        logger.error(f"Job tick failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Job tick failed")
+    return {"ran": ran}
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus, dependencies=[Depends(require_admin)])
+async def get_job(job_id: int):
+    # Primary: callers poll right after enqueueing
+    rows = execute_query(
+        """
+        SELECT id, name, status, attempts, max_attempts, run_at, last_error, created_at, updated_at
+        FROM jobs WHERE id = %s
+        """,
+        (job_id,)
+    )
+    if rows is None:
+        raise HTTPException(status_code=500, detail="Failed to load job")
+    if not rows:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return rows[0]
+
+
+@router.post("/jobs/{job_id}/retry", dependencies=[Depends(require_admin)])
+async def retry_job(job_id: int):
+    """Give a failed job a fresh set of attempts"""
+    updated = execute_query(
+        """
+        UPDATE jobs SET status = 'queued', attempts = 0, run_at = NOW(3), last_error = NULL
+        WHERE id = %s AND status = 'failed'
+        """,
+        (job_id,)
+    )
+    if updated is None:
+        raise HTTPException(status_code=500, detail="Failed to update job")
+    if updated != 1:
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    _wake.set()
+    return {"job_id": job_id, "status": "queued"}
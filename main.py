@@ -1,20 +1,79 @@
 # main.py
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from upload import router as upload_router
 from cart import router as cart_router
 from favorites import router as favorites_router
 from orders import router as orders_router
 from user_addresses import router as user_addresses_router  # Import your user addresses router
-import uvicorn
 from payments import router as payments_router  # Import your payments router
 from user import user_router
 from agent.agent import router as agent_router
+from geocoding import router as geocoding_router, get_pincode_lookup
+from exports import router as exports_router
+from analytics import router as analytics_router
+from archive import router as archive_router
+from jobs import router as jobs_router, start_job_runner, stop_job_runner
+from metrics import MetricsMiddleware, router as metrics_router, registry
+from compression import CompressionMiddleware
+from responses import FastJSONResponse
+from query_trace import router as query_trace_router
 from fastapi import Request
+from db import close_pool, init_pool, init_replica_pool, replica_enabled
+from catalog import start_catalog_poller, stop_catalog_poller
+from settings import configure_logging
+from mysql.connector import Error
 import logging
 
+logger = logging.getLogger(__name__)
+
+import_seconds = time.perf_counter() - _import_started
+
+registry.gauge("app_import_seconds", "Time to import the application modules")
+registry.gauge("app_startup_seconds", "Time spent in startup hooks (pool warm-up, cache preload)")
+
+
+def warm_up():
+    """Blocking startup work: open the DB pools, load in-memory lookups, start the background threads"""
+    try:
+        init_pool()
+    except Error as e:
+        # Requests will retry the pool; don't keep the process from starting
+        logger.error(f"MySQL pool warm-up failed: {e}")
+    if replica_enabled():
+        try:
+            init_replica_pool()
+        except Error as e:
+            # Reads fall back to the primary until the replica answers
+            logger.error(f"MySQL replica pool warm-up failed: {e}")
+    get_pincode_lookup()
+    # Its first refresh also builds the demanded-products feed
+    start_catalog_poller()
+    start_job_runner()
 
-app = FastAPI(docs_url="/docs")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    started = time.perf_counter()
+    await run_in_threadpool(warm_up)
+    startup_seconds = time.perf_counter() - started
+    registry.set_gauge("app_import_seconds", (), import_seconds)
+    registry.set_gauge("app_startup_seconds", (), startup_seconds)
+    logger.info(f"Startup complete: imports {import_seconds:.3f}s, warm-up {startup_seconds:.3f}s")
+    yield
+    stop_catalog_poller()
+    await run_in_threadpool(stop_job_runner)
+    # Server has stopped accepting requests; let in-flight ones return their connections
+    await run_in_threadpool(close_pool)
+
+
+app = FastAPI(docs_url="/docs", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 origins = [
     "*",  # Allow all origins
@@ -36,6 +95,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Inside metrics, so response sizes are recorded as sent on the wire
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+
 
 @app.get("/")
 def read_root():
@@ -50,8 +115,24 @@ app.include_router(payments_router, prefix="/api")
 app.include_router(user_router)
 app.include_router(user_addresses_router)  # Include user addresses router
 app.include_router(agent_router)
+app.include_router(geocoding_router)
+app.include_router(exports_router)
+app.include_router(analytics_router)
+app.include_router(archive_router)
+app.include_router(jobs_router)
+app.include_router(metrics_router)
+app.include_router(query_trace_router)
 
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8001)
+    # Development server; production runs gunicorn with gunicorn.conf.py
+    import uvicorn
+    from settings import get_settings
+    settings = get_settings()
+    uvicorn.run(
+        "main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=settings.web_concurrency
+    )
@@ -0,0 +1,195 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+import threading
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+router = APIRouter()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestStats:
+    __slots__ = ("db_time", "query_count", "fingerprints", "wrote", "scope")
+
+    def __init__(self, scope=None):
+        self.db_time = 0.0
+        self.query_count = 0
+        # Set on commit; later reads in the same request stay on the primary
+        self.wrote = False
+        # Statement fingerprint -> executions in this request
+        self.fingerprints = {}
+        self.scope = scope
+
+    def route(self) -> str:
+        route = self.scope.get("route") if self.scope else None
+        return route.path if route else "unmatched"
+
+
+# Per-request accumulator; the db layer adds to it while a request is active
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def record_db_time(elapsed: float, is_query: bool = True):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_time += elapsed
+        if is_query:
+            stats.query_count += 1
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (help, buckets, labels -> Histogram)
+        self.histograms: Dict[str, Tuple[str, tuple, Dict[tuple, Histogram]]] = {}
+        # name -> (help, labels -> value)
+        self.counters: Dict[str, Tuple[str, Dict[tuple, float]]] = {}
+        self.gauges: Dict[str, Tuple[str, Dict[tuple, float]]] = {}
+
+    def histogram(self, name: str, help_text: str, buckets):
+        self.histograms[name] = (help_text, buckets, {})
+
+    def counter(self, name: str, help_text: str):
+        self.counters[name] = (help_text, {})
+
+    def gauge(self, name: str, help_text: str):
+        self.gauges[name] = (help_text, {})
+
+    def observe(self, name: str, labels: tuple, value: float):
+        _, buckets, series = self.histograms[name]
+        with self._lock:
+            hist = series.get(labels)
+            if hist is None:
+                hist = series[labels] = Histogram(buckets)
+            hist.observe(value)
+
+    def inc(self, name: str, labels: tuple = (), amount: float = 1):
+        series = self.counters[name][1]
+        with self._lock:
+            series[labels] = series.get(labels, 0) + amount
+
+    def set_gauge(self, name: str, labels: tuple, value: float):
+        self.gauges[name][1][labels] = value
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (help_text, series) in self.counters.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, (help_text, series) in self.gauges.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, (help_text, buckets, series) in self.histograms.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, hist in series.items():
+                    cumulative = 0
+                    for bound, count in zip(buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_bound(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_bound(bound) -> str:
+    return str(float(bound)) if isinstance(bound, float) else str(bound)
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{k}="{_escape_label(v)}"' for k, v in labels)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+registry.counter("http_requests_total", "Requests by method, route and status code")
+registry.histogram("http_request_duration_seconds", "Total request latency", LATENCY_BUCKETS)
+registry.histogram("http_request_db_seconds", "Time spent in database calls per request", LATENCY_BUCKETS)
+registry.histogram("http_request_python_seconds", "Request latency excluding database time", LATENCY_BUCKETS)
+registry.histogram("http_request_queries", "Database queries issued per request", QUERY_COUNT_BUCKETS)
+registry.histogram("http_response_size_bytes", "Response body size", SIZE_BUCKETS)
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware task hop) recording latency,
+    DB vs Python time, query count and body size per route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        body_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, body_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            labels = (("method", scope["method"]), ("route", stats.route()))
+            registry.inc("http_requests_total", labels + (("status", status_code),))
+            registry.observe("http_request_duration_seconds", labels, elapsed)
+            registry.observe("http_request_db_seconds", labels, stats.db_time)
+            registry.observe("http_request_python_seconds", labels, max(elapsed - stats.db_time, 0.0))
+            registry.observe("http_request_queries", labels, stats.query_count)
+            registry.observe("http_response_size_bytes", labels, body_size)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of the in-process metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
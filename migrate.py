@@ -0,0 +1,192 @@
+"""
+Versioned schema migrations.
+
+Scripts live in migrations/ as NNNN_description.sql and are applied in
+version order, each exactly once; applied versions are recorded in
+schema_migrations. Run it once per deploy, before the new code starts:
+
+    python migrate.py             # apply pending migrations
+    python migrate.py status      # list applied and pending versions
+    python migrate.py fake 0003   # record a version as applied without running it
+"""
+from pathlib import Path
+from typing import List, NamedTuple
+import argparse
+import hashlib
+import logging
+import re
+import sys
+
+import mysql.connector
+from mysql.connector import Error, errorcode
+from db import connection_config
+from settings import configure_logging
+
+logger = logging.getLogger("migrate")
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+LOCK_NAME = "schema_migrations"
+LOCK_TIMEOUT_SECONDS = 60
+
+# Re-creating an index or column that a database already has (e.g. added by
+# hand before migrations existed) is skipped rather than failing the run
+ALREADY_APPLIED_ERRORS = (errorcode.ER_DUP_KEYNAME, errorcode.ER_DUP_FIELDNAME)
+
+_FILENAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+class Migration(NamedTuple):
+    version: str
+    name: str
+    path: Path
+    checksum: str
+
+
+def discover_migrations() -> List[Migration]:
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        match = _FILENAME.match(path.name)
+        if not match:
+            raise ValueError(f"Unexpected migration file name: {path.name}")
+        checksum = hashlib.sha256(path.read_bytes()).hexdigest()
+        migrations.append(Migration(match.group(1), match.group(2), path, checksum))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration versions in migrations/")
+    return migrations
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a script on statement-ending semicolons, dropping -- comments"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = []
+    current = []
+    for line in lines:
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statement = "\n".join(current).strip().rstrip(";").strip()
+            if statement:
+                statements.append(statement)
+            current = []
+    tail = "\n".join(current).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(16) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_migrations(cursor) -> dict:
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {version: checksum for version, checksum in cursor.fetchall()}
+
+
+def record(cursor, migration: Migration):
+    cursor.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+        (migration.version, migration.name, migration.checksum)
+    )
+
+
+def apply(connection, migration: Migration):
+    """
+    MySQL commits DDL implicitly, so a script that fails half way is not
+    rolled back: fix the script or the schema, then re-run.
+    """
+    cursor = connection.cursor()
+    try:
+        for statement in split_statements(migration.path.read_text(encoding="utf-8")):
+            try:
+                cursor.execute(statement)
+            except Error as e:
+                if e.errno in ALREADY_APPLIED_ERRORS:
+                    logger.warning(f"{migration.version}: skipped, already in place: {e.msg}")
+                    continue
+                raise
+        record(cursor, migration)
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def run(command: str, fake_version: str = None) -> int:
+    migrations = discover_migrations()
+    try:
+        connection = mysql.connector.connect(**connection_config())
+    except Error as e:
+        logger.error(f"Cannot connect to MySQL: {e}")
+        return 1
+    cursor = connection.cursor()
+    try:
+        # Several instances deploying at once must not race each other
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT_SECONDS))
+        if cursor.fetchone()[0] != 1:
+            logger.error("Another migration run holds the lock")
+            return 1
+        try:
+            ensure_migrations_table(cursor)
+            applied = applied_migrations(cursor)
+
+            for migration in migrations:
+                if migration.version in applied and applied[migration.version] != migration.checksum:
+                    logger.warning(f"{migration.version}_{migration.name} changed after it was applied")
+
+            pending = [m for m in migrations if m.version not in applied]
+
+            if command == "status":
+                for migration in migrations:
+                    state = "applied" if migration.version in applied else "pending"
+                    print(f"{migration.version}  {state:8s} {migration.name}")
+                return 0
+
+            if command == "fake":
+                migration = next((m for m in pending if m.version == fake_version), None)
+                if migration is None:
+                    logger.error(f"No pending migration {fake_version}")
+                    return 1
+                record(cursor, migration)
+                connection.commit()
+                logger.info(f"Recorded {migration.version}_{migration.name} as applied")
+                return 0
+
+            if not pending:
+                logger.info("Schema is up to date")
+                return 0
+            for migration in pending:
+                logger.info(f"Applying {migration.version}_{migration.name}")
+                apply(connection, migration)
+            logger.info(f"Applied {len(pending)} migrations")
+            return 0
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    except Error as e:
+        logger.error(f"Migration failed: {e}")
+        return 1
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument("command", nargs="?", default="up", choices=("up", "status", "fake"))
+    parser.add_argument("version", nargs="?", help="version for 'fake', e.g. 0003")
+    args = parser.parse_args()
+    if args.command == "fake" and not args.version:
+        parser.error("fake needs a version")
+    configure_logging()
+    sys.exit(run(args.command, args.version))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+-- Base tables, as the application uses them. IF NOT EXISTS keeps this a
+-- no-op on databases created before migrations were introduced.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NULL,
+    mobile_number VARCHAR(20) NULL,
+    password VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_verified BOOLEAN DEFAULT FALSE,
+    token VARCHAR(512) NULL,
+    token_expiry DATETIME NULL,
+    otp_code VARCHAR(10) NULL,
+    otp_created_at DATETIME NULL
+);
+
+CREATE TABLE IF NOT EXISTS agent (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NULL,
+    mobile_number VARCHAR(20) NULL,
+    password VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_verified BOOLEAN DEFAULT FALSE,
+    token VARCHAR(512) NULL,
+    token_expiry DATETIME NULL,
+    otp_code VARCHAR(10) NULL,
+    otp_created_at DATETIME NULL
+);
+
+CREATE TABLE IF NOT EXISTS user_addresses (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    full_name VARCHAR(255) NOT NULL,
+    mobile_number VARCHAR(20) NOT NULL,
+    pincode VARCHAR(10) NOT NULL,
+    line1 VARCHAR(255) NOT NULL,
+    landmark VARCHAR(255) NULL,
+    city VARCHAR(100) NOT NULL,
+    state VARCHAR(100) NOT NULL,
+    country VARCHAR(100) NOT NULL DEFAULT 'India',
+    is_default BOOLEAN NOT NULL DEFAULT FALSE,
+    lat DOUBLE NULL,
+    lon DOUBLE NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    price FLOAT NOT NULL,
+    stock INT NOT NULL,
+    category VARCHAR(255),
+    imageUrls JSON,
+    mainImageUrl VARCHAR(255),
+    demanded BOOLEAN,
+    keywords VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'active'
+);
+
+CREATE TABLE IF NOT EXISTS cart (
+    user_id INT NOT NULL,
+    id INT NOT NULL,
+    quantity INT NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    user_order_number INT NULL,
+    order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    payment_date TIMESTAMP NULL,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    status VARCHAR(20) DEFAULT 'Processing',
+    razorpay_order_id VARCHAR(255) NULL,
+    razorpay_payment_id VARCHAR(255) NULL,
+    shipping_address_id INT NULL,
+    order_status INT DEFAULT 1,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    price_at_purchase DECIMAL(10, 2) NOT NULL,
+    assigned_agent_id INT NULL,
+    PRIMARY KEY (order_id, product_id),
+    FOREIGN KEY (order_id) REFERENCES orders(order_id),
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+CREATE TABLE IF NOT EXISTS favorites (
+    user_id INT NOT NULL,
+    product_id INT NOT NULL
+);
@@ -0,0 +1,12 @@
+-- Audit trail written by order_status.transition_orders
+
+CREATE TABLE IF NOT EXISTS order_status_history (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    from_status INT NULL,
+    to_status INT NOT NULL,
+    agent_id INT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_order_status_history_order (order_id, changed_at),
+    FOREIGN KEY (order_id) REFERENCES orders(order_id)
+);
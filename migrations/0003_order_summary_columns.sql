@@ -0,0 +1,11 @@
+-- Order summary columns, written once at checkout so dispatch listings
+-- don't re-aggregate order_items on every read. Fill existing rows with
+-- orders.backfill_order_summaries(). One statement per column, so a
+-- column that already exists is skipped without dropping the rest.
+
+ALTER TABLE orders ADD COLUMN summary_product_name VARCHAR(255) NULL;
+ALTER TABLE orders ADD COLUMN summary_image_url VARCHAR(255) NULL;
+ALTER TABLE orders ADD COLUMN item_count INT NOT NULL DEFAULT 0;
+ALTER TABLE orders ADD COLUMN address_snapshot VARCHAR(512) NULL;
+ALTER TABLE orders ADD COLUMN assigned_agent_id INT NULL;
+ALTER TABLE orders ADD INDEX idx_orders_assigned_agent (assigned_agent_id, order_status, order_id);
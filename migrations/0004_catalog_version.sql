@@ -0,0 +1,10 @@
+-- Single-row counter bumped in the same transaction as every catalog
+-- write; backs the ETags on catalog reads
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO catalog_version (id, version) VALUES (1, 0);
@@ -0,0 +1,31 @@
+-- Rebuild favorites with a (user_id, product_id) primary key so adds are
+-- idempotent, keeping one row per pair. The old table is kept as
+-- favorites_old; drop it once the rebuild has been checked.
+--
+-- Safe to re-run after a partial failure: the copy and the swap only
+-- happen while favorites has no primary key, and a re-run after the swap
+-- just drops the empty favorites_new it recreated.
+
+SET @rebuilt = (
+    SELECT COUNT(*) > 0 FROM information_schema.table_constraints
+    WHERE table_schema = DATABASE() AND table_name = 'favorites' AND constraint_type = 'PRIMARY KEY'
+);
+
+CREATE TABLE IF NOT EXISTS favorites_new (
+    user_id INT NOT NULL,
+    product_id INT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, product_id)
+);
+
+SET @copy = IF(@rebuilt, 'DO 0',
+    'INSERT IGNORE INTO favorites_new (user_id, product_id) SELECT user_id, product_id FROM favorites');
+PREPARE step FROM @copy;
+EXECUTE step;
+DEALLOCATE PREPARE step;
+
+SET @swap = IF(@rebuilt, 'DROP TABLE favorites_new',
+    'RENAME TABLE favorites TO favorites_old, favorites_new TO favorites');
+PREPARE step FROM @swap;
+EXECUTE step;
+DEALLOCATE PREPARE step;
@@ -0,0 +1,21 @@
+-- Indexes for the hot queries in explain_check.HOT_QUERIES
+
+-- Order history, newest first
+CREATE INDEX idx_orders_user_date ON orders (user_id, order_date);
+-- Next user_order_number at checkout
+CREATE INDEX idx_orders_user_number ON orders (user_id, user_order_number);
+-- Agent-side item lookups
+CREATE INDEX idx_order_items_assigned_agent ON order_items (assigned_agent_id);
+
+-- Catalog browsing
+CREATE INDEX idx_products_category ON products (category);
+CREATE INDEX idx_products_demanded ON products (demanded);
+
+-- Address book and default address
+CREATE INDEX idx_user_addresses_user_default ON user_addresses (user_id, is_default);
+
+-- Login by email or mobile number
+CREATE INDEX idx_users_email ON users (email);
+CREATE INDEX idx_users_mobile ON users (mobile_number);
+CREATE INDEX idx_agent_email ON agent (email);
+CREATE INDEX idx_agent_mobile ON agent (mobile_number);
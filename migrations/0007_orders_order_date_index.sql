@@ -0,0 +1,3 @@
+-- Date-range scans for the order export
+
+CREATE INDEX idx_orders_order_date ON orders (order_date, order_id);
@@ -0,0 +1,34 @@
+-- Sales rollups maintained by analytics.record_paid_order when a payment
+-- is verified; rebuild a range from raw orders with analytics.rebuild_rollups
+
+CREATE TABLE IF NOT EXISTS sales_hourly (
+    bucket DATETIME PRIMARY KEY,
+    orders INT NOT NULL DEFAULT 0,
+    units INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day DATE PRIMARY KEY,
+    orders INT NOT NULL DEFAULT 0,
+    units INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS product_sales_daily (
+    day DATE NOT NULL,
+    product_id INT NOT NULL,
+    units INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id),
+    INDEX idx_product_sales_daily_product (product_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS city_sales_daily (
+    day DATE NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    state VARCHAR(100) NOT NULL,
+    orders INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, city, state)
+);
@@ -0,0 +1,16 @@
+-- Cold storage for delivered orders moved out by archive.archive_delivered_orders.
+-- LIKE copies columns and indexes (not foreign keys); archived_at is appended
+-- last. A column added to orders, order_items or order_status_history later
+-- must be added to its archive table in the same migration.
+
+CREATE TABLE IF NOT EXISTS orders_archive LIKE orders;
+ALTER TABLE orders_archive ADD COLUMN archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS order_items_archive LIKE order_items;
+ALTER TABLE order_items_archive ADD COLUMN archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS order_status_history_archive LIKE order_status_history;
+ALTER TABLE order_status_history_archive ADD COLUMN archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- Finds archival candidates without scanning the hot table
+CREATE INDEX idx_orders_status_date ON orders (order_status, order_date);
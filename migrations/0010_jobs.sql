@@ -0,0 +1,25 @@
+-- Persistent queue for jobs.py: deferred work, retries with backoff and
+-- scheduled runs. Times are DATETIME(3) in the server clock so every
+-- instance agrees on what is due.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    payload JSON NOT NULL,
+    status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    -- A running job not finished within its lease is taken back by the reaper
+    lease_seconds INT NOT NULL DEFAULT 600,
+    run_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    locked_by VARCHAR(100) NULL,
+    locked_at DATETIME(3) NULL,
+    last_error TEXT NULL,
+    -- Set for scheduled runs, so each period is enqueued once across instances
+    dedupe_key VARCHAR(191) NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_jobs_dedupe_key (dedupe_key),
+    -- Claiming the oldest due job, the lease reaper and the purge
+    INDEX idx_jobs_status_run_at (status, run_at)
+);
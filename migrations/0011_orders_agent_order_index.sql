@@ -0,0 +1,5 @@
+-- Agent order lists without a status filter: equality on the agent, then
+-- order_id DESC straight off the index. idx_orders_assigned_agent has
+-- order_status between the two, so it can only serve this with a filesort.
+
+CREATE INDEX idx_orders_agent_order ON orders (assigned_agent_id, order_id);
@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Listings filtered to one status (the agent map) are served in order by
+# idx_orders_assigned_agent (assigned_agent_id, order_status, order_id).
+# All-status lists are served by idx_orders_agent_order (assigned_agent_id,
+# order_id), which walks order_id DESC without a filesort; several statuses
+# at once fall back to a sort of that agent's matching rows.
+# Product name/image come from the summary columns written at checkout.
+
+# Projection name -> SQL expression
+AGENT_ORDER_FIELDS: Dict[str, str] = {
+    "id": "o.order_id",
+    "description": "CONCAT('Order #', o.order_id)",
+    "mainImageUrl": "o.summary_image_url",
+    "product_name": "o.summary_product_name",
+    "item_count": "o.item_count",
+    "address": "o.address_snapshot",
+    "line1": "ua.line1",
+    "city": "ua.city",
+    "state": "ua.state",
+    "pincode": "ua.pincode",
+    "lat": "ua.lat",
+    "lon": "ua.lon",
+    "user_name": "u.name",
+    "order_status": "o.order_status",
+    "order_date": "o.order_date",
+    "total_amount": "o.total_amount",
+}
+
+# Address components are still available through `fields=`, but listings
+# ship only the snapshot string by default
+MAP_FIELDS = (
+    "id", "description", "mainImageUrl", "product_name",
+    "address", "lat", "lon", "user_name",
+)
+ORDER_LIST_FIELDS = MAP_FIELDS + ("order_status",)
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(fields: Optional[str], default: Sequence[str]) -> List[str]:
+    """Resolve a comma-separated `fields` parameter against the known projection"""
+    if not fields:
+        return list(default)
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in AGENT_ORDER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in requested:
+        # The id is needed for keyset pagination
+        requested.insert(0, "id")
+    return requested
+
+
+def parse_statuses(status_param: Optional[str]) -> Optional[List[int]]:
+    if not status_param:
+        return None
+    try:
+        return [int(s) for s in status_param.split(',') if s.strip()]
+    except ValueError:
+        raise ValueError("status must be a comma-separated list of integers")
+
+
+def build_agent_orders_query(
+    agent_id: int,
+    fields: Sequence[str],
+    statuses: Optional[Sequence[int]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    before_id: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+) -> Tuple[str, list]:
+    """
+    Build the listing query for orders assigned to an agent.
+
+    Results are ordered newest first and paginated with a keyset on
+    order_id (`before_id`), so deep pages cost the same as the first one.
+    Joins are only added when a projected field needs them.
+    """
+    select_list = ",\n            ".join(f"{AGENT_ORDER_FIELDS[f]} AS {f}" for f in fields)
+
+    joins = []
+    if any(AGENT_ORDER_FIELDS[f].startswith("ua.") for f in fields):
+        joins.append("LEFT JOIN user_addresses ua ON o.shipping_address_id = ua.id")
+    if any(AGENT_ORDER_FIELDS[f].startswith("u.") for f in fields):
+        joins.append("JOIN users u ON o.user_id = u.id")
+
+    conditions = ["o.assigned_agent_id = %s"]
+    params: list = [agent_id]
+    if statuses:
+        conditions.append(f"o.order_status IN ({','.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+    if date_from:
+        conditions.append("o.order_date >= %s")
+        params.append(date_from)
+    if date_to:
+        # Inclusive of the whole `date_to` day
+        conditions.append("o.order_date < %s")
+        params.append(date_to + timedelta(days=1))
+    if before_id:
+        conditions.append("o.order_id < %s")
+        params.append(before_id)
+
+    query = f"""
+        SELECT
+            {select_list}
+        FROM orders o
+        {' '.join(joins)}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY o.order_id DESC
+        LIMIT %s
+    """
+    params.append(limit)
+    return query, params
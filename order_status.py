@@ -0,0 +1,111 @@
+from typing import Dict, FrozenSet, List, Optional
+import logging
+
+from db import in_list
+
+logger = logging.getLogger(__name__)
+
+# Order lifecycle states stored in orders.order_status
+CREATED = 1
+ASSIGNED = 2
+DELIVERED = 3
+CANCELLED = 4
+
+STATUS_NAMES = {
+    CREATED: "created",
+    ASSIGNED: "assigned",
+    DELIVERED: "delivered",
+    CANCELLED: "cancelled",
+}
+
+# Allowed transitions: current status -> statuses it may move to
+ALLOWED_TRANSITIONS: Dict[int, FrozenSet[int]] = {
+    CREATED: frozenset({ASSIGNED, CANCELLED}),
+    ASSIGNED: frozenset({ASSIGNED, DELIVERED, CANCELLED}),
+    DELIVERED: frozenset(),
+    CANCELLED: frozenset(),
+}
+
+# Schema: migrations/0002_order_status_history.sql
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def status_name(status_code: Optional[int]) -> Optional[str]:
+    return STATUS_NAMES.get(status_code)
+
+
+def parse_status(value) -> int:
+    """Accept either a status code or its name and return the code"""
+    if isinstance(value, int) and value in STATUS_NAMES:
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        for code, name in STATUS_NAMES.items():
+            if name == lowered:
+                return code
+        if lowered.isdigit() and int(lowered) in STATUS_NAMES:
+            return int(lowered)
+    raise InvalidTransition(f"Unknown order status: {value}")
+
+
+def sources_for(to_status: int) -> List[int]:
+    """Statuses an order may be in to move to `to_status`"""
+    return sorted(s for s, targets in ALLOWED_TRANSITIONS.items() if to_status in targets)
+
+
+def transition_orders(
+    cursor,
+    order_ids: List[int],
+    to_status: int,
+    agent_id: Optional[int] = None,
+    only_assigned_to: Optional[int] = None
+) -> List[int]:
+    """
+    Move a batch of orders to `to_status` with set-based statements.
+
+    Only orders whose current status allows the transition (and, when
+    `only_assigned_to` is given, that are assigned to that agent) are
+    updated. `agent_id` is recorded in the status history. Must run inside
+    the caller's transaction; returns the ids that moved.
+    """
+    if to_status not in STATUS_NAMES:
+        raise InvalidTransition(f"Unknown order status: {to_status}")
+    order_ids = sorted(set(order_ids))
+    from_statuses = sources_for(to_status)
+    if not order_ids or not from_statuses:
+        return []
+
+    # Padded id lists keep the number of distinct statement texts logarithmic
+    id_placeholders, id_params = in_list(order_ids)
+    status_placeholders = ','.join(['%s'] * len(from_statuses))
+    guard = f"o.order_id IN ({id_placeholders}) AND o.order_status IN ({status_placeholders})"
+    params = id_params + from_statuses
+    if only_assigned_to is not None:
+        guard += " AND o.assigned_agent_id = %s"
+        params.append(only_assigned_to)
+
+    # Lock the eligible rows so the history and the update see the same set
+    cursor.execute(f"SELECT o.order_id, o.order_status FROM orders o WHERE {guard} FOR UPDATE", params)
+    eligible = cursor.fetchall()
+    if not eligible:
+        return []
+
+    moved_ids = [row['order_id'] if isinstance(row, dict) else row[0] for row in eligible]
+    moved_placeholders, moved_params = in_list(moved_ids)
+    cursor.execute(
+        f"""
+        INSERT INTO order_status_history (order_id, from_status, to_status, agent_id)
+        SELECT order_id, order_status, %s, %s FROM orders
+        WHERE order_id IN ({moved_placeholders})
+        """,
+        [to_status, agent_id] + moved_params
+    )
+    cursor.execute(
+        f"UPDATE orders SET order_status = %s WHERE order_id IN ({moved_placeholders})",
+        [to_status] + moved_params
+    )
+    logger.info(f"Moved {len(moved_ids)} orders to {status_name(to_status)}")
+    return moved_ids
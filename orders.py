@@ -1,68 +1,45 @@
-from fastapi import APIRouter, HTTPException, Depends, Header, status, Body
+from fastapi import APIRouter, HTTPException, Depends, Header, status, Body, Query
 from pydantic import BaseModel
-from typing import List, Optional
-from db import execute_query, get_db1
-import razorpay
-from payments import razorpay_client
-import os
+from typing import List, Optional, Union
+from db import execute_query, get_db1, get_read_db, in_list, mark_written
+from jobs import job
+import order_status
+import order_queries
+from payments import get_razorpay_client, razorpay_errors
+from ratelimit import RateLimiter, per_minute, per_second
+from responses import FastJSONResponse
+from settings import get_settings
 import json
-from dotenv import load_dotenv
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 router = APIRouter()
 
 # Security configurations
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
+SECRET_KEY = get_settings().secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Table creation functions
-# def create_orders_table():
-#     query = """
-#     CREATE TABLE IF NOT EXISTS orders (
-#         order_id INT AUTO_INCREMENT PRIMARY KEY,
-#         user_id INT NOT NULL,
-#         order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-#         payment_date TIMESTAMP NULL,
-#         total_amount DECIMAL(10, 2) NOT NULL,
-#         status VARCHAR(20) DEFAULT 'Processing',
-#         razorpay_order_id VARCHAR(255) NULL,
-#         razorpay_payment_id VARCHAR(255) NULL,
-#         shipping_address_id INT NULL,
-#         order_status INT DEFAULT 1,
-#         FOREIGN KEY (user_id) REFERENCES users(id)
-#     );
-#     """
-#     execute_query(query)
-
-# def create_order_items_table():
-#     query = """
-#     CREATE TABLE IF NOT EXISTS order_items (
-#         order_id INT NOT NULL,
-#         product_id INT NOT NULL,
-#         quantity INT NOT NULL,
-#         price_at_purchase DECIMAL(10, 2) NOT NULL,
-#         PRIMARY KEY (order_id, product_id),
-#         FOREIGN KEY (order_id) REFERENCES orders(order_id),
-#         FOREIGN KEY (product_id) REFERENCES products(id)
-#     );
-#     """
-#     execute_query(query)
-
-# # Create tables on startup
-# create_orders_table()
-# create_order_items_table()
+# Checkout holds a connection through a multi-statement transaction
+create_order_limiter = RateLimiter("orders-public", per_ip=per_minute(30), per_account=per_minute(10),
+                                   per_route=per_second(50, burst=100))
+
+# Schema: migrations/ (orders, order_items, summary columns and indexes)
+
+# Archived orders keep their numbers, so numbering continues past them.
+# Each MAX is an index lookup on idx_orders_user_number (copied to the archive).
+NEXT_USER_ORDER_NUMBER_QUERY = """
+    SELECT GREATEST(
+        COALESCE((SELECT MAX(user_order_number) FROM orders WHERE user_id = %s), 0),
+        COALESCE((SELECT MAX(user_order_number) FROM orders_archive WHERE user_id = %s), 0)
+    ) + 1 AS next_order_num
+"""
 
 # Pydantic models
 
@@ -70,6 +47,11 @@ class AssignOrdersRequest(BaseModel):
     agent_id: int
     order_ids: List[int]
 
+class BulkStatusRequest(BaseModel):
+    order_ids: List[int]
+    status: Union[int, str]
+    agent_id: Optional[int] = None
+
 class OrderItem(BaseModel):
     product_id: int
     quantity: int
@@ -98,6 +80,9 @@ class PublicCreateOrderRequest(BaseModel):
     items: List[OrderItem]
     shipping_address_id: Optional[int] = None
 
+def format_address(address: dict) -> str:
+    return f"{address.get('line1', '')}, {address.get('city', '')}, {address.get('state', '')} {address.get('pincode', '')}"
+
 # Authentication functions
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
@@ -122,10 +107,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     return {"id": user_id}
 
 # Order endpoints
-@router.post("/orders/public", response_model=OrderResponse)
+@router.post("/orders/public", response_model=OrderResponse, dependencies=[Depends(create_order_limiter)])
 async def create_order_public(
     order_request: PublicCreateOrderRequest
 ):
+    create_order_limiter.check_account(order_request.user_id)
     connection = None
     cursor = None
     user_id = order_request.user_id
@@ -141,9 +127,10 @@ async def create_order_public(
             )
 
         # Validate shipping address exists and belongs to user
+        address_snapshot = None
         if order_request.shipping_address_id:
             address_query = """
-                SELECT id FROM user_addresses 
+                SELECT id, line1, city, state, pincode FROM user_addresses 
                 WHERE id = %s AND user_id = %s
             """
             address = execute_query(address_query, (order_request.shipping_address_id, user_id))
@@ -152,17 +139,18 @@ async def create_order_public(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid shipping address"
                 )
+            address_snapshot = format_address(address[0])
 
         # Get product prices and availability
         product_ids = tuple(item.product_id for item in order_request.items)
-        placeholders = ','.join(['%s'] * len(product_ids))
+        placeholders, id_params = in_list(product_ids)
         price_query = f"""
-            SELECT id, price, name, stock 
+            SELECT id, price, name, mainImageUrl, stock 
             FROM products 
             WHERE id IN ({placeholders}) 
             AND status = 'active'
         """
-        products = execute_query(price_query, product_ids)
+        products = execute_query(price_query, id_params)
 
         # Verify all products exist and are available
         if len(products) != len(product_ids):
@@ -207,21 +195,25 @@ async def create_order_public(
         connection.start_transaction()
 
         # Get the next user_order_number for this user
-        cursor.execute(
-            "SELECT COALESCE(MAX(user_order_number), 0) + 1 AS next_order_num "
-            "FROM orders WHERE user_id = %s",
-            (user_id,)
-        )
+        cursor.execute(NEXT_USER_ORDER_NUMBER_QUERY, (user_id, user_id))
         next_order_num = cursor.fetchone()['next_order_num']
 
-        # Insert into orders table with shipping_address_id
+        # Representative item for listings: lowest product id in the order
+        first_product = min(products, key=lambda p: p['id'])
+
+        # Insert into orders table with shipping_address_id and listing summary
         cursor.execute(
             """
             INSERT INTO orders 
-            (user_id, total_amount, status, shipping_address_id, user_order_number, order_status) 
-            VALUES (%s, %s, %s, %s, %s, %s)
+            (user_id, total_amount, status, shipping_address_id, user_order_number, order_status,
+             summary_product_name, summary_image_url, item_count, address_snapshot) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
-            (user_id, total_amount, 'Created', order_request.shipping_address_id, next_order_num, 1)
+            (
+                user_id, total_amount, 'Created', order_request.shipping_address_id, next_order_num,
+                order_status.CREATED, first_product['name'], first_product['mainImageUrl'],
+                len(order_request.items), address_snapshot
+            )
         )
         order_id = cursor.lastrowid
 
@@ -244,7 +236,7 @@ async def create_order_public(
             })
 
         # Create Razorpay order
-        razorpay_order = razorpay_client.order.create({
+        razorpay_order = get_razorpay_client().order.create({
             'amount': int(total_amount * 100),  # Convert to paise
             'currency': 'INR',
             'receipt': f"order_{order_id}",
@@ -267,6 +259,7 @@ async def create_order_public(
         )
 
         connection.commit()
+        mark_written(f"user:{user_id}")
 
         response_data = {
             "status": "success",
@@ -277,13 +270,13 @@ async def create_order_public(
             "currency": "INR",
             "items": order_items,
             "shipping_address_id": order_request.shipping_address_id,
-            "order_status": 1,
+            "order_status": order_status.CREATED,
             "message": "Order created successfully"
         }
         logger.info(f"Order created successfully: {response_data}")
         return response_data
 
-    except razorpay.errors.BadRequestError as e:
+    except razorpay_errors().BadRequestError as e:
         if connection:
             connection.rollback()
         logger.error(f"Razorpay error: {str(e)}")
@@ -305,29 +298,35 @@ async def create_order_public(
         if connection and connection.is_connected():
             connection.close()
             
+@job("orders.renumber_user_orders", lease_seconds=3600)
 def migrate_existing_orders():
     connection = get_db1()
     cursor = connection.cursor(dictionary=True)
     
     try:
-        # Get all user IDs with orders
-        cursor.execute("SELECT DISTINCT user_id FROM orders")
+        # Get all user IDs with orders, hot or archived
+        cursor.execute("SELECT user_id FROM orders UNION SELECT user_id FROM orders_archive")
         users = cursor.fetchall()
         
         for user in users:
             user_id = user['user_id']
             
-            # Get all orders for this user ordered by creation date
+            # Get all orders for this user ordered by creation date, across both tables
             cursor.execute(
-                "SELECT order_id FROM orders WHERE user_id = %s ORDER BY order_date ASC",
-                (user_id,)
+                """
+                SELECT order_id, order_date, 'orders' AS source FROM orders WHERE user_id = %s
+                UNION ALL
+                SELECT order_id, order_date, 'orders_archive' AS source FROM orders_archive WHERE user_id = %s
+                ORDER BY order_date ASC, order_id ASC
+                """,
+                (user_id, user_id)
             )
             orders = cursor.fetchall()
             
-            # Update each order with sequential user_order_number
+            # Update each order with sequential user_order_number, in whichever table holds it
             for index, order in enumerate(orders, start=1):
                 cursor.execute(
-                    "UPDATE orders SET user_order_number = %s WHERE order_id = %s",
+                    f"UPDATE {order['source']} SET user_order_number = %s WHERE order_id = %s",
                     (index, order['order_id'])
                 )
         
@@ -344,23 +343,63 @@ def migrate_existing_orders():
         if connection and connection.is_connected():
             connection.close()
 
-# Run the migration (call this once)
-# migrate_existing_orders()
-            
-@router.get("/orders/user/{user_id}", response_model=List[dict])
-async def get_orders_by_user_id(user_id: int):
+@job("orders.backfill_summaries", lease_seconds=3600)
+def backfill_order_summaries(batch_size: int = 1000):
+    """
+    Fill the listing summary columns for orders created before they existed.
+    Works through order_id ranges so each batch is a short transaction.
+    """
+    connection = get_db1()
+    cursor = connection.cursor(dictionary=True)
+
     try:
-        # Verify user exists
-        user_exists = execute_query("SELECT id FROM users WHERE id = %s", (user_id,))
-        if not user_exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
+        cursor.execute("SELECT COALESCE(MIN(order_id), 0) AS lo, COALESCE(MAX(order_id), 0) AS hi FROM orders")
+        bounds = cursor.fetchone()
+        updated = 0
+        start = bounds['lo']
+        while start and start <= bounds['hi']:
+            end = start + batch_size - 1
+            cursor.execute(
+                """
+                UPDATE orders o
+                LEFT JOIN user_addresses ua ON o.shipping_address_id = ua.id
+                SET
+                    o.summary_product_name = (
+                        SELECT p.name FROM order_items oi JOIN products p ON oi.product_id = p.id
+                        WHERE oi.order_id = o.order_id ORDER BY oi.product_id LIMIT 1
+                    ),
+                    o.summary_image_url = (
+                        SELECT p.mainImageUrl FROM order_items oi JOIN products p ON oi.product_id = p.id
+                        WHERE oi.order_id = o.order_id ORDER BY oi.product_id LIMIT 1
+                    ),
+                    o.item_count = (SELECT COUNT(*) FROM order_items oi WHERE oi.order_id = o.order_id),
+                    o.assigned_agent_id = (
+                        SELECT MAX(oi.assigned_agent_id) FROM order_items oi WHERE oi.order_id = o.order_id
+                    ),
+                    o.address_snapshot = CASE WHEN ua.id IS NULL THEN NULL
+                        ELSE CONCAT(ua.line1, ', ', ua.city, ', ', ua.state, ' ', ua.pincode) END
+                WHERE o.order_id BETWEEN %s AND %s
+                """,
+                (start, end)
             )
-        
-        # Include user_order_number in the query
-        orders_query = """
-        SELECT 
+            updated += cursor.rowcount
+            connection.commit()
+            start = end + 1
+
+        logger.info(f"Backfilled order summaries for {updated} orders")
+        return updated
+
+    except Exception as e:
+        connection.rollback()
+        logger.error(f"Order summary backfill failed: {str(e)}")
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if connection and connection.is_connected():
+            connection.close()
+            
+ORDER_HISTORY_COLUMNS = """
             order_id,
             user_id,
             user_order_number,
@@ -371,36 +410,80 @@ async def get_orders_by_user_id(user_id: int):
             razorpay_order_id,
             razorpay_payment_id,
             shipping_address_id,
-            order_status
-        FROM orders
-        WHERE user_id = %s 
-        ORDER BY order_date DESC
-        """
-        orders = execute_query(orders_query, (user_id,)) or []
+            order_status"""
+# Order ids per items query; keeps the IN list bounded for long histories
+ORDER_ITEMS_CHUNK = 500
+
+@router.get("/orders/user/{user_id}", response_model=List[dict])
+async def get_orders_by_user_id(user_id: int, include_archived: bool = True):
+    """
+    A user's orders, newest first, with their items. Delivered orders moved
+    to the archive tables are merged in unless include_archived is false.
+    """
+    db = get_read_db(f"user:{user_id}")
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    cursor = db.cursor(dictionary=True)
+    try:
+        # Verify user exists
+        cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
+        if not cursor.fetchall():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+
+        sources = [("orders", "order_items")]
+        if include_archived:
+            sources.append(("orders_archive", "order_items_archive"))
+
+        orders_query = " UNION ALL ".join(
+            f"SELECT {ORDER_HISTORY_COLUMNS} FROM {orders_table} WHERE user_id = %s"
+            for orders_table, _ in sources
+        ) + " ORDER BY order_date DESC"
+        cursor.execute(orders_query, [user_id] * len(sources))
+        orders = cursor.fetchall()
+
+        # All items in one query per chunk of orders instead of one per order
+        items_by_order = {order['order_id']: [] for order in orders}
+        order_ids = list(items_by_order)
+        for i in range(0, len(order_ids), ORDER_ITEMS_CHUNK):
+            chunk = order_ids[i:i + ORDER_ITEMS_CHUNK]
+            placeholders = ','.join(['%s'] * len(chunk))
+            items_query = " UNION ALL ".join(
+                f"""
+                SELECT
+                    oi.order_id,
+                    oi.product_id,
+                    oi.quantity,
+                    oi.price_at_purchase as price,
+                    p.name,
+                    p.mainImageUrl
+                FROM {items_table} oi
+                JOIN products p ON oi.product_id = p.id
+                WHERE oi.order_id IN ({placeholders})
+                """
+                for _, items_table in sources
+            )
+            cursor.execute(items_query, chunk * len(sources))
+            for item in cursor.fetchall():
+                items_by_order[item.pop('order_id')].append(item)
 
-        # Get items for each order
         for order in orders:
-            items_query = """
-            SELECT 
-                oi.product_id, 
-                oi.quantity, 
-                oi.price_at_purchase as price,
-                p.name, 
-                p.mainImageUrl
-            FROM order_items oi
-            JOIN products p ON oi.product_id = p.id
-            WHERE oi.order_id = %s
-            """
-            order['items'] = execute_query(items_query, (order['order_id'],)) or []
-        
-        return orders
-        
+            order['items'] = items_by_order[order['order_id']]
+        return FastJSONResponse(orders)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching orders: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error fetching orders"
         )
+    finally:
+        cursor.close()
+        db.close()
         
 @router.get("/verify-token")
 async def verify_token(token: str = Depends(oauth2_scheme)):
@@ -438,7 +521,7 @@ async def confirm_razorpay_payment(
     
     try:
         # Verify payment signature
-        razorpay_client.utility.verify_payment_signature({
+        get_razorpay_client().utility.verify_payment_signature({
             'razorpay_order_id': confirmation.razorpay_order_id,
             'razorpay_payment_id': confirmation.razorpay_payment_id,
             'razorpay_signature': confirmation.razorpay_signature
@@ -492,7 +575,7 @@ async def confirm_razorpay_payment(
              }
          }
         
-    except razorpay.errors.SignatureVerificationError as e:
+    except razorpay_errors().SignatureVerificationError as e:
         if connection:
             connection.rollback()
         logger.error(f"Payment signature verification failed: {str(e)}")
@@ -517,7 +600,7 @@ async def confirm_razorpay_payment(
 
 @router.get("/orders/all")
 async def get_all_orders():
-    db = get_db1()
+    db = get_read_db("dispatch")
     if db is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
     cursor = db.cursor(dictionary=True)
@@ -526,79 +609,134 @@ async def get_all_orders():
             SELECT 
                 o.order_id as id,
                 CONCAT('Order #', o.order_id) as description,
-                MIN(p.mainImageUrl) as mainImageUrl,
-                MIN(p.name) as product_name,
-                a.line1, a.city, a.state, a.pincode,
-                MAX(oi.assigned_agent_id) as assigned_agent_id
+                o.summary_image_url as mainImageUrl,
+                o.summary_product_name as product_name,
+                o.address_snapshot as address,
+                o.assigned_agent_id
             FROM orders o
-            JOIN order_items oi ON o.order_id = oi.order_id
-            JOIN products p ON oi.product_id = p.id
-            LEFT JOIN user_addresses a ON o.shipping_address_id = a.id
-            GROUP BY o.order_id, a.line1, a.city, a.state, a.pincode
-            HAVING assigned_agent_id IS NULL
+            WHERE o.assigned_agent_id IS NULL
         """)
         orders = cursor.fetchall()
-        # Format address as a string
-        for order in orders:
-            order["address"] = f"{order.get('line1', '')}, {order.get('city', '')}, {order.get('state', '')} {order.get('pincode', '')}"
-        return {"orders": orders}
+        return FastJSONResponse({"orders": orders})
     finally:
         cursor.close()
+        db.close()
 
 @router.post("/orders/assign")
 async def assign_orders_to_agent(payload: AssignOrdersRequest):
     db = get_db1()
     if db is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = db.cursor()
+    cursor = db.cursor(dictionary=True)
     try:
-        # Update all order_items for the selected orders
-        format_strings = ','.join(['%s'] * len(payload.order_ids))
-        query = f"""
-            UPDATE order_items
-            SET assigned_agent_id = %s
-            WHERE order_id IN ({format_strings})
-        """
-        cursor.execute(query, [payload.agent_id] + payload.order_ids)
-
-        # Update order_status to 2 for assigned orders
-        query_orders = f"""
-            UPDATE orders
-            SET order_status = 2
-            WHERE order_id IN ({format_strings})
-        """
-        cursor.execute(query_orders, payload.order_ids)
+        db.start_transaction()
+        # Only orders that may still be (re)assigned move; delivered/cancelled are skipped
+        assigned_ids = order_status.transition_orders(
+            cursor, payload.order_ids, order_status.ASSIGNED, agent_id=payload.agent_id
+        )
+        if assigned_ids:
+            format_strings, id_params = in_list(assigned_ids)
+            cursor.execute(
+                f"""
+                UPDATE order_items
+                SET assigned_agent_id = %s
+                WHERE order_id IN ({format_strings})
+                """,
+                [payload.agent_id] + id_params
+            )
+            cursor.execute(
+                f"UPDATE orders SET assigned_agent_id = %s WHERE order_id IN ({format_strings})",
+                [payload.agent_id] + id_params
+            )
+        db.commit()
+        mark_written("dispatch")
+        mark_written(f"agent:{payload.agent_id}")
+        skipped_ids = sorted(set(payload.order_ids) - set(assigned_ids))
+        return {
+            "success": True,
+            "message": "Orders assigned to agent and status updated.",
+            "assigned_order_ids": assigned_ids,
+            "skipped_order_ids": skipped_ids
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        db.close()
+
+@router.post("/orders/status/bulk")
+async def bulk_transition_orders(payload: BulkStatusRequest):
+    """
+    Move many orders to a new status in one transaction, e.g. an agent
+    completing a batch of drops. Orders not allowed to make the transition
+    (or not assigned to `agent_id`, when given) are reported as skipped.
+    """
+    try:
+        to_status = order_status.parse_status(payload.status)
+    except order_status.InvalidTransition as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if to_status == order_status.ASSIGNED:
+        raise HTTPException(status_code=400, detail="Use /orders/assign to assign orders")
+    if not payload.order_ids:
+        return {"success": True, "updated_order_ids": [], "skipped_order_ids": []}
 
+    db = get_db1()
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    cursor = db.cursor(dictionary=True)
+    try:
+        db.start_transaction()
+        updated_ids = order_status.transition_orders(
+            cursor, payload.order_ids, to_status,
+            agent_id=payload.agent_id, only_assigned_to=payload.agent_id
+        )
         db.commit()
-        return {"success": True, "message": "Orders assigned to agent and status updated."}
+        mark_written("dispatch")
+        if payload.agent_id is not None:
+            mark_written(f"agent:{payload.agent_id}")
+        return {
+            "success": True,
+            "status": order_status.status_name(to_status),
+            "updated_order_ids": updated_ids,
+            "skipped_order_ids": sorted(set(payload.order_ids) - set(updated_ids))
+        }
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
+        db.close()
 
 @router.put("/orders/{order_id}/deliver")
 async def mark_order_delivered(order_id: int):
     db = get_db1()
     if db is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = db.cursor()
+    cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute(
-            "UPDATE orders SET order_status = 3 WHERE order_id = %s",
-            (order_id,)
-        )
+        db.start_transaction()
+        moved = order_status.transition_orders(cursor, [order_id], order_status.DELIVERED)
         db.commit()
-        return {"success": True, "message": "Order marked as delivered.", "order_id": order_id}
+        mark_written("dispatch")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
+        db.close()
+    if not moved:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Order not found or cannot be marked as delivered from its current status"
+        )
+    return {"success": True, "message": "Order marked as delivered.", "order_id": order_id}
 
 @router.get("/orders/assigned")
 async def get_assigned_orders():
-    db = get_db1()
+    db = get_read_db("dispatch")
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database connection failed")
     cursor = db.cursor(dictionary=True)
     try:
         cursor.execute("""
@@ -607,98 +745,94 @@ async def get_assigned_orders():
                 a.name as agent_name,
                 o.order_id as id,
                 CONCAT('Order #', o.order_id) as description,
-                MIN(p.mainImageUrl) as mainImageUrl,
-                MIN(p.name) as product_name,
-                ua.line1, ua.city, ua.state, ua.pincode
-            FROM order_items oi
-            JOIN orders o ON oi.order_id = o.order_id
-            JOIN agent a ON oi.assigned_agent_id = a.id
-            JOIN products p ON oi.product_id = p.id
-            LEFT JOIN user_addresses ua ON o.shipping_address_id = ua.id
-            WHERE oi.assigned_agent_id IS NOT NULL
-            GROUP BY a.id, o.order_id, ua.line1, ua.city, ua.state, ua.pincode
+                o.summary_image_url as mainImageUrl,
+                o.summary_product_name as product_name,
+                o.address_snapshot as address
+            FROM orders o
+            JOIN agent a ON o.assigned_agent_id = a.id
             ORDER BY a.name, o.order_id DESC
         """)
         rows = cursor.fetchall()
         # Group by agent
         agents = {}
         for row in rows:
-            agent_id = row["agent_id"]
+            agent_id = row.pop("agent_id")
+            agent_name = row.pop("agent_name")
             if agent_id not in agents:
                 agents[agent_id] = {
                     "agent_id": agent_id,
-                    "agent_name": row["agent_name"],
+                    "agent_name": agent_name,
                     "orders": []
                 }
-            row["address"] = f"{row.get('line1', '')}, {row.get('city', '')}, {row.get('state', '')} {row.get('pincode', '')}"
-            agents[agent_id]["orders"].append({
-                "id": row["id"],
-                "description": row["description"],
-                "mainImageUrl": row["mainImageUrl"],
-                "product_name": row["product_name"],
-                "address": row["address"]
-            })
-        return list(agents.values())
+            agents[agent_id]["orders"].append(row)
+        return FastJSONResponse(list(agents.values()))
     finally:
         cursor.close()
-
-@router.get("/orders/agent/map/{agent_id}")
-async def get_orders_by_agent(agent_id: int):
-    db = get_db1()
+        db.close()
+
+def fetch_agent_orders(
+    agent_id: int,
+    default_fields,
+    default_statuses: Optional[List[int]] = None,
+    status_filter: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fields: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = order_queries.DEFAULT_PAGE_SIZE
+):
+    try:
+        projection = order_queries.parse_fields(fields, default_fields)
+        statuses = order_queries.parse_statuses(status_filter) or default_statuses
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query, params = order_queries.build_agent_orders_query(
+        agent_id, projection, statuses=statuses, date_from=date_from,
+        date_to=date_to, before_id=before_id, limit=limit
+    )
+    db = get_read_db(f"agent:{agent_id}")
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database connection failed")
     cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute("""
-            SELECT
-                o.order_id as id,
-                CONCAT('Order #', o.order_id) as description,
-                MIN(p.mainImageUrl) as mainImageUrl,
-                MIN(p.name) as product_name,
-                ua.line1, ua.city, ua.state, ua.pincode,
-                ua.lat, ua.lon, 
-                u.name as user_name
-            FROM order_items oi
-            JOIN orders o ON oi.order_id = o.order_id
-            JOIN products p ON oi.product_id = p.id
-            LEFT JOIN user_addresses ua ON o.shipping_address_id = ua.id
-            JOIN users u ON o.user_id = u.id
-            WHERE oi.assigned_agent_id = %s AND o.order_status = 2
-            GROUP BY o.order_id, ua.line1, ua.city, ua.state, ua.pincode, ua.lat, ua.lon, u.name
-            ORDER BY o.order_id DESC
-        """, (agent_id,))
+        cursor.execute(query, params)
         orders = cursor.fetchall()
-        for order in orders:
-            order["address"] = f"{order.get('line1', '')}, {order.get('city', '')}, {order.get('state', '')} {order.get('pincode', '')}"
-        return {"orders": orders}
     finally:
         cursor.close()
+        db.close()
+
+    next_before_id = orders[-1]["id"] if len(orders) == limit else None
+    return {"orders": orders, "next_before_id": next_before_id}
+
+@router.get("/orders/agent/map/{agent_id}")
+async def get_agent_map_orders(
+    agent_id: int,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fields: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(order_queries.DEFAULT_PAGE_SIZE, ge=1, le=order_queries.MAX_PAGE_SIZE)
+):
+    """Orders currently out for delivery with an agent, for the map view"""
+    return FastJSONResponse(fetch_agent_orders(
+        agent_id, order_queries.MAP_FIELDS, [order_status.ASSIGNED],
+        status_filter, date_from, date_to, fields, before_id, limit
+    ))
 
 @router.get("/orders/agent/order-list/{agent_id}")
-async def get_orders_by_agent(agent_id: int):
-    db = get_db1()
-    cursor = db.cursor(dictionary=True)
-    try:
-        cursor.execute("""
-            SELECT
-                o.order_id as id,
-                CONCAT('Order #', o.order_id) as description,
-                MIN(p.mainImageUrl) as mainImageUrl,
-                MIN(p.name) as product_name,
-                ua.line1, ua.city, ua.state, ua.pincode,
-                ua.lat, ua.lon, 
-                u.name as user_name,
-                o.order_status
-            FROM order_items oi
-            JOIN orders o ON oi.order_id = o.order_id
-            JOIN products p ON oi.product_id = p.id
-            LEFT JOIN user_addresses ua ON o.shipping_address_id = ua.id
-            JOIN users u ON o.user_id = u.id
-            WHERE oi.assigned_agent_id = %s 
-            GROUP BY o.order_id, o.order_status, ua.line1, ua.city, ua.state, ua.pincode, ua.lat, ua.lon, u.name
-            ORDER BY o.order_id DESC
-        """, (agent_id,))
-        orders = cursor.fetchall()
-        for order in orders:
-            order["address"] = f"{order.get('line1', '')}, {order.get('city', '')}, {order.get('state', '')} {order.get('pincode', '')}"
-        return {"orders": orders}
-    finally:
-        cursor.close()
\ No newline at end of file
+async def get_agent_order_list(
+    agent_id: int,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fields: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(order_queries.DEFAULT_PAGE_SIZE, ge=1, le=order_queries.MAX_PAGE_SIZE)
+):
+    """Full order history of an agent, any status"""
+    return FastJSONResponse(fetch_agent_orders(
+        agent_id, order_queries.ORDER_LIST_FIELDS, None,
+        status_filter, date_from, date_to, fields, before_id, limit
+    ))
@@ -1,23 +1,45 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-import razorpay
-import os
-from dotenv import load_dotenv
 from datetime import datetime
-from db import get_db1, execute_query  # Assuming you have a db.py with these utilities
+import logging
+import threading
+from db import get_db1, execute_query, mark_written  # Assuming you have a db.py with these utilities
+from analytics import record_paid_order
+from jobs import enqueue, job
+from settings import get_settings
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize Razorpay client
-if not all([os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET")]):
-    raise RuntimeError("Missing Razorpay credentials in environment variables")
+# Orders are created with payment_capture=1; capture normally follows authorization within minutes
+RECONCILE_DELAY_SECONDS = 30
 
-razorpay_client = razorpay.Client(auth=(
-    os.getenv("RAZORPAY_KEY_ID"),
-    os.getenv("RAZORPAY_KEY_SECRET")
-))
+_razorpay_client = None
+_razorpay_lock = threading.Lock()
+
+def get_razorpay_client():
+    """
+    Build the Razorpay client on first use. The SDK (and `requests` under it)
+    is imported here rather than at module import to keep cold starts short.
+    """
+    global _razorpay_client
+    if _razorpay_client is None:
+        with _razorpay_lock:
+            if _razorpay_client is None:
+                settings = get_settings()
+                if not all([settings.razorpay_key_id, settings.razorpay_key_secret]):
+                    raise RuntimeError("Missing Razorpay credentials in environment variables")
+                import razorpay
+                _razorpay_client = razorpay.Client(auth=(
+                    settings.razorpay_key_id,
+                    settings.razorpay_key_secret
+                ))
+    return _razorpay_client
+
+def razorpay_errors():
+    import razorpay.errors
+    return razorpay.errors
 
 class CreateRazorpayOrderRequest(BaseModel):
     amount: int
@@ -31,10 +53,63 @@ class VerifyPaymentRequest(BaseModel):
     razorpay_signature: str
     order_id: int  # Add order_id to link with your database
 
+def mark_order_paid(cursor, order_id: int, razorpay_order_id: str, razorpay_payment_id: str) -> bool:
+    """
+    Mark the order paid and add it to the rollups, in the caller's
+    transaction. The status guard makes a duplicate confirmation a no-op,
+    so each order is counted exactly once; returns whether this call paid it.
+    """
+    paid_at = datetime.now()
+    cursor.execute(
+        """UPDATE orders 
+           SET status = 'Paid', 
+               razorpay_payment_id = %s,
+               payment_date = %s
+           WHERE order_id = %s AND razorpay_order_id = %s AND status <> 'Paid'""",
+        (razorpay_payment_id, paid_at, order_id, razorpay_order_id)
+    )
+    if cursor.rowcount != 1:
+        return False
+    record_paid_order(cursor, order_id, paid_at)
+    return True
+
+
+@job("payments.reconcile", max_attempts=8)
+def reconcile_payment(order_id: int, razorpay_payment_id: str):
+    """Settle an order whose payment was authorized but not yet captured when the client verified it"""
+    payment = get_razorpay_client().payment.fetch(razorpay_payment_id)
+    if payment['status'] == 'failed':
+        logger.warning(f"Payment {razorpay_payment_id} for order {order_id} failed, not reconciling")
+        return
+    if payment['status'] != 'captured':
+        # Raising schedules the next attempt with backoff
+        raise RuntimeError(f"Payment {razorpay_payment_id} is still {payment['status']}")
+
+    connection = get_db1()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+    cursor = connection.cursor(dictionary=True)
+    try:
+        paid_by = None
+        if mark_order_paid(cursor, order_id, payment['order_id'], razorpay_payment_id):
+            cursor.execute("SELECT user_id FROM orders WHERE order_id = %s", (order_id,))
+            paid_by = cursor.fetchone()['user_id']
+            logger.info(f"Reconciled captured payment {razorpay_payment_id} for order {order_id}")
+        connection.commit()
+        if paid_by is not None:
+            mark_written(f"user:{paid_by}")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        connection.close()
+
+
 @router.post("/create-razorpay-order")
 async def create_razorpay_order(request: CreateRazorpayOrderRequest):
     try:
-        is_test_mode = os.getenv("ENVIRONMENT", "production") == "development"
+        is_test_mode = get_settings().environment == "development"
         amount = 100 if is_test_mode else request.amount
         
         order_data = {
@@ -49,7 +124,7 @@ async def create_razorpay_order(request: CreateRazorpayOrderRequest):
             }
         }
         
-        order = razorpay_client.order.create(data=order_data)
+        order = get_razorpay_client().order.create(data=order_data)
         
         # Update order in database with Razorpay order ID
         execute_query(
@@ -61,7 +136,7 @@ async def create_razorpay_order(request: CreateRazorpayOrderRequest):
             "id": order["id"],
             "amount": order["amount"],
             "currency": order["currency"],
-            "key": os.getenv("RAZORPAY_KEY_ID"),
+            "key": get_settings().razorpay_key_id,
             "is_test_mode": is_test_mode
         }
     except Exception as e:
@@ -82,6 +157,7 @@ async def verify_payment(request: VerifyPaymentRequest):
             'razorpay_payment_id': request.razorpay_payment_id,
             'razorpay_signature': request.razorpay_signature
         }
+        razorpay_client = get_razorpay_client()
         razorpay_client.utility.verify_payment_signature(params_dict)
         
         # 2. Get database connection
@@ -107,17 +183,18 @@ async def verify_payment(request: VerifyPaymentRequest):
         
         # 6. Verify payment status is captured
         if payment['status'] != 'captured':
+            if payment['status'] == 'authorized':
+                # Capture is on its way; settle the order in the background when it lands
+                enqueue(
+                    "payments.reconcile",
+                    {"order_id": request.order_id, "razorpay_payment_id": request.razorpay_payment_id},
+                    delay_seconds=RECONCILE_DELAY_SECONDS,
+                    dedupe_key=f"payments.reconcile@{request.razorpay_payment_id}"
+                )
             raise HTTPException(status_code=400, detail="Payment not captured yet")
         
         # 7. Update order status in database
-        cursor.execute(
-            """UPDATE orders 
-               SET status = 'Paid', 
-                   razorpay_payment_id = %s,
-                   payment_date = %s
-               WHERE order_id = %s""",
-            (request.razorpay_payment_id, datetime.now(), request.order_id)
-        )
+        mark_order_paid(cursor, request.order_id, request.razorpay_order_id, request.razorpay_payment_id)
         
         # 8. Get order items for response
         cursor.execute(
@@ -130,6 +207,7 @@ async def verify_payment(request: VerifyPaymentRequest):
         items = cursor.fetchall()
         
         connection.commit()
+        mark_written(f"user:{order['user_id']}")
         
         return {
             "status": "success",
@@ -143,7 +221,7 @@ async def verify_payment(request: VerifyPaymentRequest):
             }
         }
         
-    except razorpay.errors.SignatureVerificationError as e:
+    except razorpay_errors().SignatureVerificationError as e:
         if connection:
             connection.rollback()
         raise HTTPException(status_code=400, detail="Invalid payment signature")
@@ -0,0 +1,133 @@
+from collections import deque
+from functools import lru_cache
+from typing import Dict
+import logging
+import re
+import threading
+
+from fastapi import APIRouter
+from metrics import current_request_stats, registry
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("slow_query")
+
+router = APIRouter()
+
+SLOW_QUERY_MS = get_settings().slow_query_ms
+# Same fingerprint this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = get_settings().n_plus_one_threshold
+LATENCY_SAMPLES = 1024
+
+_COMMENT = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_IN_LIST = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """
+    Normalize a statement so that calls differing only in literals, bound
+    parameters, IN-list length or formatting share one fingerprint.
+    """
+    text = _COMMENT.sub(" ", sql)
+    text = _STRING.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _WHITESPACE.sub(" ", text).strip().lower()
+    return _IN_LIST.sub("in (...)", text)
+
+
+def redact_params(params) -> str:
+    """Describe bound parameters by type only, never by value"""
+    if not params:
+        return "[]"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "[" + ", ".join(type(v).__name__ for v in params) + "]"
+
+
+class FingerprintStats:
+    __slots__ = ("calls", "errors", "total_time", "max_time", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+_stats: Dict[str, FingerprintStats] = {}
+_lock = threading.Lock()
+
+registry.counter("db_queries_total", "Database statements executed")
+registry.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS")
+registry.counter("db_n_plus_one_total", "Requests repeating one statement fingerprint N_PLUS_ONE_THRESHOLD times")
+
+
+def record_query(sql: str, params, elapsed: float, failed: bool = False):
+    fp = fingerprint(sql)
+    with _lock:
+        entry = _stats.get(fp)
+        if entry is None:
+            entry = _stats[fp] = FingerprintStats()
+        entry.calls += 1
+        entry.errors += failed
+        entry.total_time += elapsed
+        entry.max_time = max(entry.max_time, elapsed)
+        entry.samples.append(elapsed)
+    registry.inc("db_queries_total")
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        registry.inc("db_slow_queries_total")
+        slow_query_logger.warning(
+            f"Slow query {elapsed * 1000:.1f}ms: {fp} params={redact_params(params)}"
+        )
+
+    request_stats = current_request_stats()
+    if request_stats is not None:
+        counts = request_stats.fingerprints
+        counts[fp] = counts.get(fp, 0) + 1
+        if counts[fp] == N_PLUS_ONE_THRESHOLD:
+            route = request_stats.route()
+            registry.inc("db_n_plus_one_total", (("route", route),))
+            logger.warning(
+                f"Possible N+1 in {route}: statement issued {N_PLUS_ONE_THRESHOLD}+ times: {fp}"
+            )
+
+
+def snapshot(limit: int = 50):
+    """Fingerprints ordered by total time spent"""
+    with _lock:
+        items = sorted(_stats.items(), key=lambda kv: kv[1].total_time, reverse=True)[:limit]
+        return [
+            {
+                "fingerprint": fp,
+                "calls": s.calls,
+                "errors": s.errors,
+                "total_ms": round(s.total_time * 1000, 3),
+                "mean_ms": round(s.total_time * 1000 / s.calls, 3) if s.calls else 0.0,
+                "p50_ms": round(s.percentile(50) * 1000, 3),
+                "p95_ms": round(s.percentile(95) * 1000, 3),
+                "p99_ms": round(s.percentile(99) * 1000, 3),
+                "max_ms": round(s.max_time * 1000, 3),
+            }
+            for fp, s in items
+        ]
+
+
+@router.get("/metrics/queries")
+async def get_query_stats(limit: int = 50):
+    """Per-fingerprint call counts and latency percentiles"""
+    return {"slow_query_ms": SLOW_QUERY_MS, "queries": snapshot(limit)}
@@ -0,0 +1,200 @@
+"""
+Token-bucket rate limiting and load shedding for the expensive public
+endpoints: logins (bcrypt), OTP requests and checkout.
+
+Each route gets a RateLimiter used as a dependency, which sheds load and
+checks the per-IP and whole-route buckets before the handler runs. The
+handler calls check_account() once the body names the account, before
+any password hashing or database work.
+
+Per-IP buckets key on the address the nearest trusted proxy saw (see
+client_ip); set TRUSTED_PROXY_HOPS to the number of proxies in front of
+the app, or leave it at 0 when clients connect directly.
+
+Buckets live in process memory unless RATE_LIMIT_REDIS_URL is set, in
+which case every worker and instance shares them (needs the `redis`
+package). If Redis is unreachable requests are let through rather than
+locking everyone out.
+"""
+from functools import lru_cache
+from typing import NamedTuple, Optional
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+
+from fastapi import HTTPException, Request
+from cache import TTLCache
+from db import pool_wait_seconds
+from metrics import registry
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = get_settings().rate_limit_enabled
+SHED_POOL_WAIT_SECONDS = get_settings().shed_pool_wait_ms / 1000
+TRUSTED_PROXY_HOPS = get_settings().trusted_proxy_hops
+# Idle buckets are dropped after this; every limit below refills well within it
+BUCKET_TTL_SECONDS = 3600
+MAX_BUCKETS = 100_000
+
+registry.counter("rate_limited_total", "Requests rejected by a rate limit, by route and bucket scope")
+registry.counter("load_shed_total", "Requests rejected because the database pool is saturated")
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens added per second
+    burst: int   # bucket capacity
+
+
+def per_second(count: float, burst: Optional[int] = None) -> Limit:
+    return Limit(count, burst or max(int(count), 1))
+
+
+def per_minute(count: float, burst: Optional[int] = None) -> Limit:
+    return Limit(count / 60, burst or max(int(count), 1))
+
+
+class MemoryBackend:
+    """Buckets for this process only; each worker enforces the limit on its own"""
+
+    def __init__(self):
+        self._buckets = TTLCache(maxsize=MAX_BUCKETS, ttl=BUCKET_TTL_SECONDS)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> float:
+        """Take `cost` tokens; 0 when allowed, otherwise seconds until they would be available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+            if tokens >= cost:
+                self._buckets.set(key, (tokens - cost, now))
+                return 0.0
+            self._buckets.set(key, (tokens, now))
+        return (cost - tokens) / limit.rate
+
+
+# Refill and take in one round trip, on the Redis clock so instances agree
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every process that points at the same Redis"""
+
+    def __init__(self, url: str):
+        import redis
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> float:
+        try:
+            return float(self._take(keys=[key], args=[limit.rate, limit.burst, cost]))
+        except self._errors as e:
+            logger.warning(f"Rate limit backend unavailable, allowing request: {e}")
+            return 0.0
+
+
+@lru_cache()
+def get_backend():
+    url = get_settings().rate_limit_redis_url
+    if url:
+        try:
+            return RedisBackend(url)
+        except ImportError:
+            logger.error("RATE_LIMIT_REDIS_URL is set but the redis package is not installed; using per-process buckets")
+    return MemoryBackend()
+
+
+def client_ip(request: Request) -> str:
+    """
+    Each trusted proxy appends the address it received the request from to
+    X-Forwarded-For, so the client is TRUSTED_PROXY_HOPS entries from the
+    right. Entries further left are whatever the client sent and are never
+    used, so rotating the header doesn't buy a fresh bucket.
+    """
+    if TRUSTED_PROXY_HOPS > 0:
+        hops = [
+            hop.strip()
+            for header in request.headers.getlist("x-forwarded-for")
+            for hop in header.split(",")
+            if hop.strip()
+        ]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+def shed_load(route: str):
+    """
+    Turn requests away while connection acquisition is slow. The rejected
+    share grows with how far the wait is past the threshold, so the
+    shedder eases off as the pool recovers instead of flapping.
+    """
+    if SHED_POOL_WAIT_SECONDS <= 0:
+        return
+    excess = pool_wait_seconds() / SHED_POOL_WAIT_SECONDS - 1
+    if excess > 0 and random.random() < excess:
+        registry.inc("load_shed_total", (("route", route),))
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        route: str,
+        per_ip: Limit,
+        per_account: Optional[Limit] = None,
+        per_route: Optional[Limit] = None
+    ):
+        self.route = route
+        self.per_ip = per_ip
+        self.per_account = per_account
+        self.per_route = per_route
+
+    def __call__(self, request: Request):
+        shed_load(self.route)
+        self._take("ip", client_ip(request), self.per_ip)
+        if self.per_route:
+            self._take("route", "all", self.per_route)
+
+    def check_account(self, account):
+        """Limit attempts against one account (email, mobile number or user id) from any IP"""
+        if self.per_account and account:
+            # Hashed so shared backends don't hold emails and phone numbers
+            digest = hashlib.sha256(str(account).strip().lower().encode("utf-8")).hexdigest()[:24]
+            self._take("account", digest, self.per_account)
+
+    def _take(self, scope: str, identity: str, limit: Limit):
+        if not RATE_LIMIT_ENABLED:
+            return
+        wait = get_backend().take(f"ratelimit:{self.route}:{scope}:{identity}", limit)
+        if wait > 0:
+            registry.inc("rate_limited_total", (("route", self.route), ("scope", scope)))
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, retry later",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
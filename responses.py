@@ -0,0 +1,48 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value):
+    """Types MySQL rows carry that JSON has no native form for"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        # TIME columns come back as timedelta
+        return value.total_seconds()
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "dict"):
+        # pydantic models
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # OPT_NON_STR_KEYS: rows grouped by integer ids serialize like json.dumps would
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response serialized with orjson. Returning one directly from a
+    handler also skips FastAPI's jsonable_encoder pass, which dominates the
+    cost of large row lists.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,32 @@
+# serverless.py
+"""
+AWS Lambda / API Gateway entry point: ``serverless.handler``.
+
+Everything expensive happens once per container, during the init phase:
+importing the app, opening the (single-connection) MySQL pool and loading
+the in-memory lookups. Warm invocations reuse all of it; the pool pings
+its connection on checkout and reconnects if the runtime was frozen long
+enough for MySQL to drop it.
+
+Mangum runs the ASGI lifespan on every invocation when lifespan is
+enabled, so it is turned off here and the startup work is done at import.
+"""
+import time
+_init_started = time.perf_counter()
+
+from mangum import Mangum
+from main import app, import_seconds, warm_up
+from metrics import registry
+from settings import configure_logging
+import logging
+
+logger = logging.getLogger(__name__)
+
+configure_logging()
+warm_up()
+init_seconds = time.perf_counter() - _init_started
+registry.set_gauge("app_import_seconds", (), import_seconds)
+registry.set_gauge("app_startup_seconds", (), init_seconds)
+logger.info(f"Serverless init complete in {init_seconds:.3f}s")
+
+handler = Mangum(app, lifespan="off")
@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+import logging
+import os
+
+
+@dataclass(frozen=True)
+class Settings:
+    secret_key: str
+    admin_token: Optional[str]
+    razorpay_key_id: Optional[str]
+    razorpay_key_secret: Optional[str]
+    environment: str
+    log_level: str
+    db_host: Optional[str]
+    db_user: Optional[str]
+    db_pass: Optional[str]
+    db_name: Optional[str]
+    db_port: int
+    db_pool_size: int
+    db_pool_overflow: int
+    db_statement_cache_size: int
+    pincode_dataset_path: str
+    slow_query_ms: float
+    n_plus_one_threshold: int
+    serverless: bool
+    host: str
+    port: int
+    web_concurrency: int
+    app_instances: int
+    mysql_max_connections: int
+    db_reserved_connections: int
+    db_replica_host: Optional[str]
+    db_replica_port: int
+    db_replica_user: Optional[str]
+    db_replica_pass: Optional[str]
+    replica_max_lag_seconds: float
+    replica_lag_check_seconds: float
+    read_your_writes_seconds: float
+    compression_min_size: int
+    catalog_poll_seconds: float
+    catalog_max_age: int
+    catalog_stale_while_revalidate: int
+    archive_after_days: int
+    job_workers: int
+    job_poll_seconds: float
+    job_retention_days: int
+    rate_limit_enabled: bool
+    rate_limit_redis_url: Optional[str]
+    trusted_proxy_hops: int
+    shed_pool_wait_ms: float
+
+
+# mysql.connector refuses pools larger than this
+MAX_POOL_SIZE = 32
+# Past this, extra connections per worker mostly sit idle
+DEFAULT_POOL_CAP = 10
+
+
+def default_workers() -> int:
+    return min((os.cpu_count() or 1) * 2 + 1, 8)
+
+
+def pool_size_for(workers: int, instances: int, max_connections: int, reserved: int) -> int:
+    """
+    Split the MySQL connection budget across every worker process of every
+    instance, keeping `reserved` connections free for admin, migrations and
+    background jobs.
+    """
+    budget = max(max_connections - reserved, 1)
+    per_worker = budget // max(workers * instances, 1)
+    return max(1, min(per_worker, DEFAULT_POOL_CAP, MAX_POOL_SIZE))
+
+
+def overflow_for(workers: int, instances: int, reserved: int) -> int:
+    """
+    Unpooled connections a worker may open while its pool is exhausted:
+    half of the reserved connections, split across every worker process,
+    so bursts can't eat the rest of the reserve or exceed max_connections.
+    """
+    return reserved // 2 // max(workers * instances, 1)
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """Read configuration once: .env (if python-dotenv is installed) then the process environment"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    # Lambda-style runtimes serve one request at a time per container
+    serverless = bool(os.getenv("SERVERLESS") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+    web_concurrency = int(os.getenv("WEB_CONCURRENCY", 1))
+    app_instances = int(os.getenv("APP_INSTANCES", 1))
+    mysql_max_connections = int(os.getenv("MYSQL_MAX_CONNECTIONS", 151))
+    db_reserved_connections = int(os.getenv("DB_RESERVED_CONNECTIONS", 10))
+    if os.getenv("DB_POOL_SIZE"):
+        db_pool_size = min(int(os.getenv("DB_POOL_SIZE")), MAX_POOL_SIZE)
+    elif serverless:
+        db_pool_size = 1
+    else:
+        db_pool_size = pool_size_for(
+            web_concurrency, app_instances, mysql_max_connections, db_reserved_connections
+        )
+
+    return Settings(
+        secret_key=os.getenv("SECRET_KEY", "your-very-secure-secret-key"),
+        # Shared secret for operator endpoints (jobs, archival); unset disables them
+        admin_token=os.getenv("ADMIN_TOKEN"),
+        razorpay_key_id=os.getenv("RAZORPAY_KEY_ID"),
+        razorpay_key_secret=os.getenv("RAZORPAY_KEY_SECRET"),
+        environment=os.getenv("ENVIRONMENT", "production"),
+        log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        db_host=os.getenv("DB_HOST"),
+        db_user=os.getenv("DB_USER"),
+        db_pass=os.getenv("DB_PASS"),
+        db_name=os.getenv("DB_NAME"),
+        db_port=int(os.getenv("DB_PORT", 56105)),
+        db_pool_size=db_pool_size,
+        db_pool_overflow=int(os.getenv(
+            "DB_POOL_OVERFLOW", overflow_for(web_concurrency, app_instances, db_reserved_connections)
+        )),
+        # Prepared statements per pooled connection; 0 disables them
+        db_statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", 64)),
+        pincode_dataset_path=os.getenv("PINCODE_DATASET_PATH", "data/pincodes.csv"),
+        slow_query_ms=float(os.getenv("SLOW_QUERY_MS", "200")),
+        n_plus_one_threshold=int(os.getenv("N_PLUS_ONE_THRESHOLD", "5")),
+        serverless=serverless,
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", 8001)),
+        web_concurrency=web_concurrency,
+        app_instances=app_instances,
+        mysql_max_connections=mysql_max_connections,
+        db_reserved_connections=db_reserved_connections,
+        # Replica credentials default to the primary's
+        db_replica_host=os.getenv("DB_REPLICA_HOST"),
+        db_replica_port=int(os.getenv("DB_REPLICA_PORT") or os.getenv("DB_PORT", 56105)),
+        db_replica_user=os.getenv("DB_REPLICA_USER") or os.getenv("DB_USER"),
+        db_replica_pass=os.getenv("DB_REPLICA_PASS") or os.getenv("DB_PASS"),
+        replica_max_lag_seconds=float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2")),
+        replica_lag_check_seconds=float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "5")),
+        read_your_writes_seconds=float(os.getenv("READ_YOUR_WRITES_SECONDS", "10")),
+        # Below this many bytes compression costs more than it saves
+        compression_min_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+        catalog_poll_seconds=float(os.getenv("CATALOG_POLL_SECONDS", "2")),
+        catalog_max_age=int(os.getenv("CATALOG_MAX_AGE", 60)),
+        catalog_stale_while_revalidate=int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", 300)),
+        # Delivered orders older than this move to the archive tables
+        archive_after_days=int(os.getenv("ARCHIVE_AFTER_DAYS", 180)),
+        # Frozen serverless containers can't run background threads; 0 disables the runner,
+        # and periodic jobs then only run when something calls POST /jobs/tick (with ADMIN_TOKEN)
+        job_workers=int(os.getenv("JOB_WORKERS", 0 if serverless else 2)),
+        job_poll_seconds=float(os.getenv("JOB_POLL_SECONDS", "1")),
+        job_retention_days=int(os.getenv("JOB_RETENTION_DAYS", 7)),
+        rate_limit_enabled=os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no"),
+        # Shares buckets across workers and instances; per-process buckets without it
+        rate_limit_redis_url=os.getenv("RATE_LIMIT_REDIS_URL"),
+        # Proxies in front of the app that append to X-Forwarded-For; 0 uses the peer address
+        trusted_proxy_hops=int(os.getenv("TRUSTED_PROXY_HOPS", 0)),
+        # 0 disables load shedding
+        shed_pool_wait_ms=float(os.getenv("SHED_POOL_WAIT_MS", "250")),
+    )
+
+
+def configure_logging():
+    """Configure the root logger once, at application startup"""
+    logging.basicConfig(level=getattr(logging, get_settings().log_level, logging.INFO))
@@ -0,0 +1,52 @@
+"""
+Request coalescing for hot identical reads.
+
+While a lookup for a key is in flight, later callers with the same key
+await that lookup instead of issuing their own query, so a burst of
+identical GETs costs one round trip per worker. The lookup runs in the
+threadpool, off the event loop, as its own task: a caller that goes away
+does not cancel it for the others.
+
+Results are shared between callers and must be treated as read-only.
+Keys must capture everything the result depends on, including the
+catalog version for catalog reads.
+"""
+from typing import Any, Callable, Dict, Hashable
+import asyncio
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+registry.counter("singleflight_requests_total", "Coalescable reads by group and whether they ran the query")
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Any], *args) -> Any:
+        """Run func(*args) in the threadpool, or join the call already running for `key`"""
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(run_in_threadpool(func, *args))
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+            role = "leader"
+        else:
+            role = "coalesced"
+        registry.inc("singleflight_requests_total", (("group", self.name), ("role", role)))
+        return await asyncio.shield(call)
+
+    def _forget(self, key: Hashable, done: asyncio.Future):
+        if self._calls.get(key) is done:
+            del self._calls[key]
+        # Retrieve the exception so a call whose callers all left doesn't log "never retrieved"
+        if not done.cancelled() and done.exception() is not None:
+            logger.debug(f"Coalesced {self.name} read failed: {done.exception()}")
+
+    def __len__(self):
+        return len(self._calls)
@@ -1,29 +1,24 @@
-from fastapi import APIRouter, HTTPException, Query, Form, Body
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Form, Body, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import List, NamedTuple, Optional, Tuple
 from pydantic import BaseModel
-from db import execute_query
+from db import execute_read_query, get_db1, get_read_db
+from catalog import (
+    bump_catalog_version, catalog_bytes_response, catalog_response, catalog_validators, not_modified,
+    on_catalog_change, validators_for
+)
+from mysql.connector import Error
+from responses import dumps
+from singleflight import SingleFlight
 import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# SQL query to create the products table
-# create_table_query = """
-# CREATE TABLE IF NOT EXISTS products (
-#     id INT AUTO_INCREMENT PRIMARY KEY,
-#     name VARCHAR(255) NOT NULL,
-#     description TEXT,
-#     price FLOAT NOT NULL,
-#     stock INT NOT NULL,
-#     category VARCHAR(255),
-#     imageUrls JSON,
-#     mainImageUrl VARCHAR(255),
-#     demanded BOOLEAN,
-#     keywords VARCHAR(255)
-# )
-# """
-
-# # Execute the create table query
-# execute_query(create_table_query)
+# Schema: migrations/ (products, catalog_version)
 
 class Product(BaseModel):
     name: str
@@ -40,44 +35,149 @@ class ReplaceDemandedProduct(BaseModel):
     oldProductId: int
     newProductId: int
 
-@router.get("/products/{product_id}")
-async def get_product(product_id: int):
-    query = "SELECT * FROM products WHERE id = %s"
-    result = execute_query(query, (product_id,))
+def write_catalog(statements):
+    """Apply product writes and bump the catalog version in one transaction"""
+    connection = get_db1()
+    if connection is None:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction()
+        for query, params in statements:
+            cursor.execute(query, params)
+        bump_catalog_version(cursor)
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        logger.error(f"Catalog write failed: {e}")
+        raise HTTPException(status_code=500, detail="Catalog update failed")
+    finally:
+        cursor.close()
+        connection.close()
+
+# Catalog versions are part of every key: a caller never joins a read that
+# started before a catalog write its validators already reflect
+_catalog_reads = SingleFlight("catalog")
+
+def _load_product(product_id: int):
+    result = execute_read_query("SELECT * FROM products WHERE id = %s", (product_id,))
     if not result:
-        raise HTTPException(status_code=404, detail="Product not found")
+        return None
     product = result[0]
     product['imageUrls'] = json.loads(product['imageUrls'])
     return product
 
-@router.get("/products")
-async def get_products(category: Optional[str] = None, keywords: Optional[str] = None):
+def _load_products(category: Optional[str], keywords: Optional[str]):
     if keywords:
         keyword_list = keywords.split(',')
         keyword_conditions = " OR ".join([f"keywords LIKE %s" for _ in keyword_list])
         query = f"SELECT * FROM products WHERE {keyword_conditions}"
         params = tuple(f"%{keyword.strip()}%" for keyword in keyword_list)
-        result = execute_query(query, params)
+        return execute_read_query(query, params)
     elif category:
-        query = "SELECT * FROM products WHERE category = %s"
-        result = execute_query(query, (category,))
-    else:
-        query = "SELECT * FROM products"
-        result = execute_query(query)
+        return execute_read_query("SELECT * FROM products WHERE category = %s", (category,))
+    return execute_read_query("SELECT * FROM products")
+
+@router.get("/products/{product_id}")
+async def get_product(product_id: int, request: Request):
+    validators = await catalog_validators()
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    product = await _catalog_reads.do(("product", product_id, validators), _load_product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return catalog_response(product, validators)
+
+@router.get("/products")
+async def get_products(request: Request, category: Optional[str] = None, keywords: Optional[str] = None):
+    validators = await catalog_validators()
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    result = await _catalog_reads.do(
+        ("products", category, keywords, validators), _load_products, category, keywords
+    )
     
     if not result:
         raise HTTPException(status_code=404, detail="No products found")
-    return result
+    return catalog_response(result, validators)
 
-@router.get("/demanded-products")
-async def get_demanded_products():
-    query = "SELECT * FROM products WHERE demanded = TRUE"
-    result = execute_query(query)
-    if not result:
-        return []
-    for product in result:
+# --- Homepage feed ---
+#
+# The demanded products, serialized once per catalog version and served
+# from memory. Rebuilt by the catalog poller when any instance changes the
+# catalog, and right away in the instance that changed the demanded set.
+
+class DemandedFeed(NamedTuple):
+    version: int
+    validators: Optional[Tuple[str, Optional[str]]]
+    body: bytes
+    count: int
+
+_demanded_feed: Optional[DemandedFeed] = None
+_feed_lock = threading.Lock()
+
+def _read_demanded_feed(connection) -> Optional[DemandedFeed]:
+    """Version first, then rows, on one connection: the ETag is never newer than the body"""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT version, updated_at FROM catalog_version WHERE id = 1")
+        version = cursor.fetchone()
+        cursor.execute("SELECT * FROM products WHERE demanded = TRUE ORDER BY id")
+        products = cursor.fetchall()
+    except Error as e:
+        logger.error(f"Demanded feed rebuild failed, keeping the previous feed: {e}")
+        return None
+    finally:
+        cursor.close()
+        connection.close()
+    for product in products:
         product['imageUrls'] = json.loads(product['imageUrls'])
-    return result
+    if version is None:
+        return DemandedFeed(-1, None, dumps(products), len(products))
+    return DemandedFeed(
+        version['version'],
+        validators_for(version['version'], version['updated_at']),
+        dumps(products),
+        len(products)
+    )
+
+def rebuild_demanded_feed(primary: bool = False) -> Optional[DemandedFeed]:
+    """
+    Build the feed and swap it in with a single assignment, so readers see
+    the old feed or the new one, never a mix. `primary` reads past replica
+    lag, for the instance that just wrote.
+    """
+    global _demanded_feed
+    with _feed_lock:
+        connection = get_db1() if primary else get_read_db()
+        if connection is None:
+            return _demanded_feed
+        feed = _read_demanded_feed(connection)
+        # A lagging replica must not roll back a feed built from the primary
+        if feed is not None and (_demanded_feed is None or feed.version >= _demanded_feed.version):
+            _demanded_feed = feed
+            logger.info(f"Demanded feed rebuilt: {feed.count} products at catalog version {feed.version}")
+        return _demanded_feed
+
+on_catalog_change(rebuild_demanded_feed)
+
+@router.get("/demanded-products")
+async def get_demanded_products(request: Request):
+    # Memory only while the poller runs; a stalled poller's refresh (and so the
+    # rebuild) runs in the threadpool
+    await catalog_validators()
+    feed = _demanded_feed
+    if feed is None:
+        # Nothing built yet: startup could not reach the database
+        feed = await run_in_threadpool(rebuild_demanded_feed)
+        if feed is None:
+            raise HTTPException(status_code=503, detail="Demanded products unavailable")
+    cached = not_modified(request, feed.validators)
+    if cached:
+        return cached
+    return catalog_bytes_response(feed.body, feed.validators)
 
 @router.post("/upload")
 async def upload_product_data(product: Product):
@@ -86,13 +186,15 @@ async def upload_product_data(product: Product):
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
     """
     params = (product.name, product.description, product.price, product.stock, product.category, json.dumps(product.imageUrls), product.mainImageUrl, product.demanded, product.keywords)
-    execute_query(query, params)
+    write_catalog([(query, params)])
+    if product.demanded:
+        await run_in_threadpool(rebuild_demanded_feed, True)
     return {"message": "Product data uploaded successfully"}
 
 @router.post("/replace-demanded-product")
 async def replace_demanded_product(replace_data: ReplaceDemandedProduct):
     query1 = "UPDATE products SET demanded = FALSE WHERE id = %s"
     query2 = "UPDATE products SET demanded = TRUE WHERE id = %s"
-    execute_query(query1, (replace_data.oldProductId,))
-    execute_query(query2, (replace_data.newProductId,))
+    write_catalog([(query1, (replace_data.oldProductId,)), (query2, (replace_data.newProductId,))])
+    await run_in_threadpool(rebuild_demanded_feed, True)
     return {"message": "Product replacement successful"}
\ No newline at end of file
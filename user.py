@@ -2,34 +2,33 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from db import get_db1
+from ratelimit import RateLimiter, per_minute, per_second
 from pydantic import BaseModel
 import random
 import string
 import mysql.connector
-import boto3
-import os
-from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import logging
 from typing import Optional
 import bcrypt
-
-logging.basicConfig(level=logging.DEBUG)
-
-load_dotenv()
+from settings import get_settings
 
 # Security configurations
-SECRET_KEY = os.getenv("SECRET_KEY", "your-very-secure-secret-key")
+SECRET_KEY = get_settings().secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days in minutes
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 user_router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Password checks cost a bcrypt hash each; the OTP is only 4 digits
+login_limiter = RateLimiter("login", per_ip=per_minute(10), per_account=per_minute(5),
+                            per_route=per_second(20, burst=40))
+send_otp_limiter = RateLimiter("send-otp", per_ip=per_minute(5), per_account=per_minute(0.3, burst=3))
+otp_login_limiter = RateLimiter("otp-login", per_ip=per_minute(10), per_account=per_minute(5))
+
 class Token(BaseModel):
     token: str  # Changed from access_token to token
     token_type: str
@@ -61,12 +60,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         
         # Verify token against database
         db = get_db1()
+        if db is None:
+            raise HTTPException(status_code=500, detail="Database connection failed")
         cursor = db.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT * FROM users WHERE id = %s AND token = %s AND token_expiry > %s",
-            (user_id, token, datetime.utcnow())
-        )
-        user = cursor.fetchone()
+        try:
+            cursor.execute(
+                "SELECT * FROM users WHERE id = %s AND token = %s AND token_expiry > %s",
+                (user_id, token, datetime.utcnow())
+            )
+            user = cursor.fetchone()
+        finally:
+            cursor.close()
+            db.close()
         if not user:
             raise credentials_exception
             
@@ -89,6 +94,7 @@ def store_token_in_db(user_id: int, token: str):
         raise e
     finally:
         cursor.close()
+        db.close()
 
 def invalidate_token(user_id: int):
     db = get_db1()
@@ -104,6 +110,7 @@ def invalidate_token(user_id: int):
         raise e
     finally:
         cursor.close()
+        db.close()
 
 class UserRegistration(BaseModel):
     name: str
@@ -143,6 +150,12 @@ def format_mobile_number(mobile_number: str):
         return f"+91{mobile_number}"
     return mobile_number
 
+def login_identity(email: Optional[str], mobile_number: Optional[str]) -> Optional[str]:
+    """The account a login or OTP attempt counts against"""
+    if email:
+        return email
+    return format_mobile_number(mobile_number) if mobile_number else None
+
 def verify_password(plain_password: str, hashed_password: str):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
@@ -232,9 +245,13 @@ async def register_user(user: UserRegistration):
         db.rollback()
         logger.error(f"Unexpected error during registration: {str(e)}")
         raise HTTPException(status_code=500, detail="Registration failed due to unexpected error")
+    finally:
+        cursor.close()
+        db.close()
         
-@user_router.post("/login", response_model=Token)
+@user_router.post("/login", response_model=Token, dependencies=[Depends(login_limiter)])
 async def login_user(login_data: UserLogin):
+    login_limiter.check_account(login_identity(login_data.email, login_data.mobile_number))
     db = get_db1()
     if db is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -290,15 +307,11 @@ async def login_user(login_data: UserLogin):
         raise HTTPException(status_code=500, detail="Login failed")
     finally:
         cursor.close()
+        db.close()
 
-@user_router.post("/send-otp")
+@user_router.post("/send-otp", dependencies=[Depends(send_otp_limiter)])
 async def send_otp(otp_request: SendOTPRequest):
-    db = get_db1()
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = db.cursor(dictionary=True)
-    
+    send_otp_limiter.check_account(login_identity(otp_request.email, otp_request.mobile_number))
     # Generate OTP
     otp = HARDCODED_OTP  # Use hardcoded OTP for testing
     otp_expiry = datetime.now() + timedelta(minutes=5)
@@ -328,63 +341,66 @@ async def verify_otp(verify_request: VerifyOTPRequest):
         "verified": True
     }
     
-@user_router.post("/otp-login")
+@user_router.post("/otp-login", dependencies=[Depends(otp_login_limiter)])
 async def otp_login(login_request: OTPLoginRequest):
+    otp_login_limiter.check_account(login_identity(login_request.email, login_request.mobile_number))
     db = get_db1()
     if db is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
     
     cursor = db.cursor(dictionary=True)
     
-    # Find user by email or mobile
-    if login_request.email:
-        cursor.execute("SELECT * FROM users WHERE email = %s", (login_request.email,))
-    elif login_request.mobile_number:
-        formatted_mobile = format_mobile_number(login_request.mobile_number)
-        cursor.execute("SELECT * FROM users WHERE mobile_number = %s", (formatted_mobile,))
-    else:
-        raise HTTPException(status_code=400, detail="Either email or mobile number is required")
+    try:
+        # Find user by email or mobile
+        if login_request.email:
+            cursor.execute("SELECT * FROM users WHERE email = %s", (login_request.email,))
+        elif login_request.mobile_number:
+            formatted_mobile = format_mobile_number(login_request.mobile_number)
+            cursor.execute("SELECT * FROM users WHERE mobile_number = %s", (formatted_mobile,))
+        else:
+            raise HTTPException(status_code=400, detail="Either email or mobile number is required")
     
-    user = cursor.fetchone()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+        user = cursor.fetchone()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
     
-    # Check OTP
-    if not user['otp_code'] or user['otp_code'] != login_request.otp:
-        raise HTTPException(status_code=401, detail="Invalid OTP")
+        # Check OTP
+        if not user['otp_code'] or user['otp_code'] != login_request.otp:
+            raise HTTPException(status_code=401, detail="Invalid OTP")
     
-    # Check if OTP is expired
-    if user['otp_created_at'] and user['otp_created_at'] < datetime.now():
-        raise HTTPException(status_code=401, detail="OTP expired")
+        # Check if OTP is expired
+        if user['otp_created_at'] and user['otp_created_at'] < datetime.now():
+            raise HTTPException(status_code=401, detail="OTP expired")
     
-    # Clear OTP after successful verification
-    try:
-        # Generate and store token
-        token = create_access_token(str(user['id']))
-        store_token_in_db(user['id'], token)
+        # Clear OTP after successful verification
+        try:
+            # Generate and store token
+            token = create_access_token(str(user['id']))
+            store_token_in_db(user['id'], token)
 
-        cursor.execute(
-            "UPDATE users SET otp_code = NULL, otp_created_at = NULL WHERE id = %s",
-            (user['id'],)
-        )
-        db.commit()
+            cursor.execute(
+                "UPDATE users SET otp_code = NULL, otp_created_at = NULL WHERE id = %s",
+                (user['id'],)
+            )
+            db.commit()
         
-        return {
-            "message": "Login successful",
-            "access_token": token,
-            "token_type": "bearer",
-            "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-            "user_id": user['id'],
-            "user_name": user['name'],
-            "email": user['email'],
-            "mobile_number": user['mobile_number']
-        }
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to login with OTP: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to login with OTP")
+            return {
+                "message": "Login successful",
+                "access_token": token,
+                "token_type": "bearer",
+                "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+                "user_id": user['id'],
+                "user_name": user['name'],
+                "email": user['email'],
+                "mobile_number": user['mobile_number']
+            }
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to login with OTP: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to login with OTP")
     finally:
         cursor.close()
+        db.close()
     
 @user_router.post("/logout")
 async def logout(current_user: dict = Depends(get_current_user)):
@@ -409,6 +425,11 @@ async def get_user_details(user_id: int):
         user['created_at'] = user['created_at'].isoformat() if user['created_at'] else None
         user['is_verified'] = bool(user['is_verified'])
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching user details: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to fetch user details")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to fetch user details")
+    finally:
+        cursor.close()
+        db.close()
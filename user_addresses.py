@@ -2,9 +2,45 @@ from fastapi import APIRouter, HTTPException, Depends, status, Query
 from pydantic import BaseModel
 from typing import Optional, List
 from db import get_db1
+from cache import TTLCache
+from geocoding import geocode_pincode
 
 router = APIRouter()
 
+# idx_user_addresses_user_default (user_id, is_default) backs the per-user
+# and default-address lookups: migrations/0006_hot_query_indexes.sql
+
+ADDRESS_COLUMNS = (
+    "id, user_id, full_name, mobile_number, pincode, line1, landmark, "
+    "city, state, country, is_default, lat, lon"
+)
+
+# Per-user address lists and default address. Mutations invalidate only this
+# worker's copy, so the TTL bounds how long other workers and instances can
+# serve a changed, deleted or no-longer-default address.
+ADDRESS_CACHE_TTL_SECONDS = 5
+address_cache = TTLCache(maxsize=20000, ttl=ADDRESS_CACHE_TTL_SECONDS)
+
+def invalidate_user_addresses(user_id: int):
+    address_cache.delete(("all", user_id), ("default", user_id))
+
+def fill_coordinates(address: "CreateAddress"):
+    """Use the pincode centroid when the client sent no coordinates"""
+    if address.lat is None or address.lon is None:
+        coords = geocode_pincode(address.pincode)
+        if coords:
+            address.lat, address.lon = coords
+
+def make_default(cursor, user_id: int, address_id: int):
+    """Flip the default flag in one statement, touching only the old and new default rows"""
+    cursor.execute(
+        """
+        UPDATE user_addresses SET is_default = (id = %s)
+        WHERE user_id = %s AND (is_default = 1 OR id = %s)
+        """,
+        (address_id, user_id, address_id)
+    )
+
 class UserAddresses(BaseModel):
     id: int  
     user_id: int
@@ -51,12 +87,7 @@ async def add_user_address(address: CreateAddress):
     cursor = db.cursor(dictionary=True)
 
     try:
-        # If is_default is True, unset previous defaults for this user
-        if address.is_default:
-            cursor.execute(
-                "UPDATE user_addresses SET is_default=0 WHERE user_id=%s", (address.user_id,)
-            )
-
+        fill_coordinates(address)
         cursor.execute("""
             INSERT INTO user_addresses 
             (user_id, full_name, mobile_number, pincode, line1, landmark, city, state, country, is_default, lat, lon)
@@ -64,34 +95,84 @@ async def add_user_address(address: CreateAddress):
         """, (
             address.user_id, address.full_name, address.mobile_number, address.pincode,
             address.line1, address.landmark, address.city, address.state,
-            address.country, int(address.is_default), address.lat, address.lon
+            address.country, 0, address.lat, address.lon
         ))
+        new_id = cursor.lastrowid
+        # If is_default is True, move the default to the new address
+        if address.is_default:
+            make_default(cursor, address.user_id, new_id)
         db.commit()
+        invalidate_user_addresses(address.user_id)
 
-        cursor.execute("SELECT * FROM user_addresses WHERE id = LAST_INSERT_ID()")
+        cursor.execute(f"SELECT {ADDRESS_COLUMNS} FROM user_addresses WHERE id = %s", (new_id,))
         new_address = cursor.fetchone()
 
         return new_address
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error adding address: {str(e)}")
+    finally:
+        cursor.close()
+        db.close()
     
 @router.get("/user/addresses/{user_id}", response_model=List[UserAddresses])
 async def get_user_addresses(user_id: int):
     """
     Get all addresses for a user.
     """
+    cached = address_cache.get(("all", user_id))
+    if cached is not None:
+        return cached
+
     db = get_db1()
     if db is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
     
     cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM user_addresses WHERE user_id = %s", (user_id,))
+        cursor.execute(f"SELECT {ADDRESS_COLUMNS} FROM user_addresses WHERE user_id = %s", (user_id,))
         addresses = cursor.fetchall()
+        address_cache.set(("all", user_id), addresses)
         return addresses
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching addresses: {str(e)}")
+    finally:
+        cursor.close()
+        db.close()
+
+@router.get("/user/addresses/{user_id}/default", response_model=UserAddresses)
+async def get_default_address(user_id: int):
+    """
+    Get only the default address for a user, as used during checkout.
+    """
+    cached = address_cache.get(("default", user_id))
+    if cached is None:
+        # Reuse a cached full list before going to the database
+        all_addresses = address_cache.get(("all", user_id))
+        if all_addresses is not None:
+            cached = next((a for a in all_addresses if a['is_default']), None)
+        else:
+            db = get_db1()
+            if db is None:
+                raise HTTPException(status_code=500, detail="Database connection failed")
+            cursor = db.cursor(dictionary=True)
+            try:
+                cursor.execute(
+                    f"SELECT {ADDRESS_COLUMNS} FROM user_addresses WHERE user_id = %s AND is_default = 1 LIMIT 1",
+                    (user_id,)
+                )
+                cached = cursor.fetchone()
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error fetching default address: {str(e)}")
+            finally:
+                cursor.close()
+                db.close()
+        if cached is not None:
+            address_cache.set(("default", user_id), cached)
+
+    if cached is None:
+        raise HTTPException(status_code=404, detail="No default address")
+    return cached
     
 @router.put("/addresses/set-default")
 async def set_default_address(payload: SetDefaultAddressRequest):
@@ -110,15 +191,18 @@ async def set_default_address(payload: SetDefaultAddressRequest):
             raise HTTPException(status_code=404, detail="Address not found")
         user_id = result['user_id']
 
-        # Unset all previous defaults for this user
-        cursor.execute("UPDATE user_addresses SET is_default=0 WHERE user_id=%s", (user_id,))
-        # Set the selected address as default
-        cursor.execute("UPDATE user_addresses SET is_default=1 WHERE id=%s", (payload.address_id,))
+        make_default(cursor, user_id, payload.address_id)
         db.commit()
+        invalidate_user_addresses(user_id)
         return {"success": True}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error setting default address: {str(e)}")
+    finally:
+        cursor.close()
+        db.close()
     
 @router.delete("/user/addresses/{address_id}")
 async def delete_user_address(address_id: int):
@@ -130,16 +214,22 @@ async def delete_user_address(address_id: int):
         raise HTTPException(status_code=500, detail="Database connection failed")
     cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM user_addresses WHERE id=%s", (address_id,))
+        cursor.execute("SELECT user_id FROM user_addresses WHERE id=%s", (address_id,))
         address = cursor.fetchone()
         if not address:
             raise HTTPException(status_code=404, detail="Address not found")
         cursor.execute("DELETE FROM user_addresses WHERE id=%s", (address_id,))
         db.commit()
+        invalidate_user_addresses(address['user_id'])
         return {"success": True, "message": "Address deleted"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error deleting address: {str(e)}")
+    finally:
+        cursor.close()
+        db.close()
 
 @router.put("/user/addresses/{address_id}", response_model=UserAddresses)
 async def update_user_address(address_id: int, address: CreateAddress):
@@ -151,15 +241,11 @@ async def update_user_address(address_id: int, address: CreateAddress):
         raise HTTPException(status_code=500, detail="Database connection failed")
     cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM user_addresses WHERE id=%s", (address_id,))
+        cursor.execute("SELECT user_id, is_default FROM user_addresses WHERE id=%s", (address_id,))
         existing = cursor.fetchone()
         if not existing:
             raise HTTPException(status_code=404, detail="Address not found")
-        # If is_default is True, unset previous defaults for this user
-        if address.is_default:
-            cursor.execute(
-                "UPDATE user_addresses SET is_default=0 WHERE user_id=%s", (address.user_id,)
-            )
+        fill_coordinates(address)
         cursor.execute("""
             UPDATE user_addresses SET
                 full_name=%s,
@@ -170,23 +256,34 @@ async def update_user_address(address_id: int, address: CreateAddress):
                 city=%s,
                 state=%s,
                 country=%s,
-                is_default=%s,
                 lat=%s,
                 lon=%s
             WHERE id=%s
         """, (
             address.full_name, address.mobile_number, address.pincode,
             address.line1, address.landmark, address.city, address.state,
-            address.country, int(address.is_default), address.lat, address.lon,
+            address.country, address.lat, address.lon,
             address_id
         ))
+        # If is_default is True, move the default to this address; an
+        # explicit False clears it
+        if address.is_default:
+            make_default(cursor, existing['user_id'], address_id)
+        elif existing['is_default']:
+            cursor.execute("UPDATE user_addresses SET is_default=0 WHERE id=%s", (address_id,))
         db.commit()
-        cursor.execute("SELECT * FROM user_addresses WHERE id=%s", (address_id,))
+        invalidate_user_addresses(existing['user_id'])
+        cursor.execute(f"SELECT {ADDRESS_COLUMNS} FROM user_addresses WHERE id=%s", (address_id,))
         updated = cursor.fetchone()
         return updated
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error updating address: {str(e)}")
+    finally:
+        cursor.close()
+        db.close()
     
 @router.get("/addresses/{address_id}", response_model=UserAddresses)
 async def get_address(address_id: int):
@@ -199,10 +296,15 @@ async def get_address(address_id: int):
     
     cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM user_addresses WHERE id = %s", (address_id,))
+        cursor.execute(f"SELECT {ADDRESS_COLUMNS} FROM user_addresses WHERE id = %s", (address_id,))
         address = cursor.fetchone()
         if not address:
             raise HTTPException(status_code=404, detail="Address not found")
         return address
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching address: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error fetching address: {str(e)}")
+    finally:
+        cursor.close()
+        db.close()